@@ -0,0 +1,62 @@
+"""Recovery of run_batch from a worker process that dies.
+
+Runs SCENARIOS scenarios over 2 processes with at most 2 runs in flight, where
+scenario 1 kills the worker process that receives it (os._exit when it is
+unpickled, as a worker killed by the OOM killer). Asserts that the pool is
+restarted: scenario 1 gives a failed BatchResult and the other scenarios
+succeed.
+
+usage:
+    python benchmarks/batch_worker_crash.py <path of .epw file> <path of .uwg file> [days]
+
+Requires concurrent.futures (python 3).
+"""
+from __future__ import division, print_function
+
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from uwg import run_batch
+
+# Number of scenarios, and index of the one that kills its worker
+SCENARIOS = 8
+CRASH = 1
+
+# Simulated days of each scenario, unless given
+DAYS = 1
+
+
+class Crash(dict):
+    """Scenario that ends the process that unpickles it."""
+
+    def __reduce__(self):
+        return (os._exit, (1,))
+
+
+def main(epw, uwg_param_file, days=DAYS):
+    scenarios = [{"nDay": days} for i in range(SCENARIOS)]
+    scenarios[CRASH] = Crash(nDay=days)
+
+    start = time.time()
+    results = sorted(run_batch(scenarios, epw, uwg_param_file, processes=2, max_in_flight=2),
+                     key=lambda result: result.index)
+    assert [result.index for result in results] == list(range(SCENARIOS)), "Runs are missing from the batch."
+    for result in results:
+        if result.index == CRASH:
+            assert not result.ok, "Scenario {} did not fail.".format(CRASH)
+        else:
+            assert result.ok, "Scenario {} failed:\n{}".format(result.index, result.error)
+        print(result)
+    print("{} of {} scenarios succeeded in {:.2f} s, after the death of the worker of scenario {}.".format(
+        SCENARIOS - 1, SCENARIOS, time.time() - start, CRASH))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else DAYS)
@@ -0,0 +1,73 @@
+"""Regression check of the numpy backend against uwg.simulate.
+
+NumpyBackend holds its own copy of the physics of uwg.simulate (BEMCalc,
+UCModel, the element surface fluxes and conduction). This check simulates a
+short period with both backends and asserts that the recorded CHANNELS agree
+within NumpyBackend.TOLERANCE, so that a change of the python physics that is
+not carried over to the numpy backend is caught. The run times of both
+backends are also reported.
+
+usage:
+    python benchmarks/numpy_backend.py <path of .epw file> <path of .uwg file> [days]
+
+Requires numpy.
+"""
+from __future__ import division, print_function
+
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from uwg import uwg
+from uwg.npbackend import NumpyBackend
+
+# Recorded channels compared (see NumpyBackend.TOLERANCE)
+CHANNELS = ("UCM.canTemp", "UCM.Tdp", "UCM.canRHum", "UCM.canWind")
+
+# Simulated days, unless given
+DAYS = 3
+
+DIFF_MSG = "{} of the numpy backend differs from uwg.simulate by {:.3g} at hour {} (tolerance {:.3g})."
+
+
+def simulate(epw, uwg_param_file, days, backend):
+    """Simulated uwg of days from the start date of the .uwg file, and its run time (s)."""
+    epwDir, epwFileName = os.path.split(os.path.abspath(epw))
+    uwgParamDir, uwgParamFileName = os.path.split(os.path.abspath(uwg_param_file))
+    model = uwg(epwFileName, uwgParamFileName, epwDir, uwgParamDir, backend=backend)
+    model.recordChannels = ["UCM.canWind"]
+    model.read_epw()
+    model.set_input()
+    model.nDay = days
+    model.init_BEM_obj()
+    model.init_input_obj()
+    model.hvac_autosize()
+    start = time.time()
+    model.simulate()
+    return model, time.time() - start
+
+
+def main(epw, uwg_param_file, days=DAYS):
+    reference, t_python = simulate(epw, uwg_param_file, days, "python")
+    model, t_numpy = simulate(epw, uwg_param_file, days, "numpy")
+
+    for name in CHANNELS:
+        diffs = [abs(a - b) for a, b in zip(reference.recorder[name], model.recorder[name])]
+        assert len(diffs) == reference.recorder.N, "{} was not recorded for every hour.".format(name)
+        hour = max(range(len(diffs)), key=diffs.__getitem__)
+        assert diffs[hour] <= NumpyBackend.TOLERANCE, \
+            DIFF_MSG.format(name, diffs[hour], hour, NumpyBackend.TOLERANCE)
+        print("{:12s} max difference {:.3g}".format(name, diffs[hour]))
+
+    print("{} days: python {:.2f} s, numpy {:.2f} s. The backends agree within {:.3g}.".format(
+        days, t_python, t_numpy, NumpyBackend.TOLERANCE))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    main(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else DAYS)
@@ -0,0 +1,96 @@
+"""Memory regression benchmark of the uwg outputs.
+
+Simulates 1, 30 and 365 days from January 1st, each in a fresh process, and
+asserts that the peak resident memory (RSS) of the 30 and 365 day runs exceeds
+the peak of the 1 day run by at most MAX_GROWTH_MB. The outputs are kept in
+the columns of the Recorder and UCM.windProf holds one value per RSM level, so
+the memory of a run only grows with its weather, forcing rows and output
+columns (about 13 MB for a year at dtSim 300 s). Before, the hourly UCM copies
+and the ever growing UCM.windProf took about 120 MB more for a year.
+
+usage:
+    python benchmarks/recorder_memory.py <path of .epw file> <path of .uwg file>
+
+Requires the resource module (not available on Windows).
+"""
+from __future__ import division, print_function
+
+import os
+import sys
+import subprocess
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Simulated days of the runs
+DAYS = (1, 30, 365)
+
+# Max growth of the peak RSS over the 1 day run (MB)
+MAX_GROWTH_MB = 32.
+
+RESOURCE_MSG = "The memory benchmark requires the resource module (not available on this platform)."
+GROWTH_MSG = "Peak RSS of the {} day run is {:.1f} MB above the 1 day run (max {:.1f} MB)."
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process (MB)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024.*1024.) if sys.platform == "darwin" else peak / 1024.
+
+
+def simulate(epw, uwg_param_file, days):
+    """Simulate days from January 1st, and return the peak RSS of the process (MB)."""
+    sys.path.insert(0, ROOT)
+    from uwg import uwg
+
+    epwDir, epwFileName = os.path.split(os.path.abspath(epw))
+    uwgParamDir, uwgParamFileName = os.path.split(os.path.abspath(uwg_param_file))
+    model = uwg(epwFileName, uwgParamFileName, epwDir, uwgParamDir)
+    model.Month = 1
+    model.Day = 1
+    model.nDay = days
+    model.read_epw()
+    model.set_input()
+    model.init_BEM_obj()
+    model.init_input_obj()
+    model.hvac_autosize()
+    model.simulate()
+    return peak_rss_mb()
+
+
+def main(epw, uwg_param_file):
+    peaks = {}
+    for days in DAYS:
+        out = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--run", epw,
+                                       uwg_param_file, str(days)])
+        peaks[days] = float(out.decode("utf-8").strip().splitlines()[-1])
+        print("{:4d} days: peak RSS {:.1f} MB".format(days, peaks[days]))
+
+    for days in DAYS[1:]:
+        growth = peaks[days] - peaks[DAYS[0]]
+        assert growth <= MAX_GROWTH_MB, GROWTH_MSG.format(days, growth, MAX_GROWTH_MB)
+    print("Peak RSS is bounded: at most {:.1f} MB above the 1 day run.".format(
+        max(peaks[days] - peaks[DAYS[0]] for days in DAYS[1:])))
+
+
+if __name__ == "__main__":
+    if resource is None:
+        raise ImportError(RESOURCE_MSG)
+    if len(sys.argv) == 5 and sys.argv[1] == "--run":
+        # A run of main, in its own process. The simulation prints are sent to
+        # stderr so that the last line of stdout is the peak RSS.
+        stdout = sys.stdout
+        sys.stdout = sys.stderr
+        peak = simulate(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.stdout = stdout
+        print(peak)
+    elif len(sys.argv) == 3:
+        main(sys.argv[1], sys.argv[2])
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -743,13 +743,12 @@ class BuildingTypes(object):
     def __init__(self, readDOE_file_path):
         """Class that contains all of the accepted building typologies and contruction years"""
 
-        # load up all of the building characteristcs from the urban weather generator pickle file.
-        if not os.path.exists(readDOE_file_path):
-            raise Exception("readDOE.pkl file: '{}' does not exist.".format(readDOE_file_path))
-        readDOE_file = open(readDOE_file_path, 'rb') # open pickle file in binary form
-        self.refDOE = cPickle.load(readDOE_file)
-        self.refBEM = cPickle.load(readDOE_file)
-        readDOE_file.close()
+        # index the building characteristcs of the urban weather generator pickle file.
+        # reference buildings are only read when they are requested.
+        from uwg.refstore import load_store
+        self.refStore = load_store(readDOE_file_path)
+        self.refDOE = self.refStore.refDOE
+        self.refBEM = self.refStore.refBEM
 
         # dictionary to go from building programs to numbers understood by the uwg.
         self.bldgtype = {
@@ -4,6 +4,7 @@ __version__ = '5.3.2'
 
 from .simparam import SimParam
 from .weather import Weather
+from .epw import EPWData
 from .building import Building
 from .material import Material
 from .element import Element
@@ -18,10 +19,21 @@ from .solarcalcs import SolarCalcs
 
 from .readDOE import readDOE
 from .infracalcs import infracalcs
+from .conduction import conduction
 from .urbflux import urbflux
+from .npbackend import NumpyBackend
+from .recorder import Recorder
+from .refstore import DOEStore
+from .uwgparams import UWGParams
+from .checkpoint import Checkpoint
+from .spinup import SpinUpCache
 
 from .uwg import uwg
 from .uwg import procMat
+from .uwg import discretize
+from .batch import run_batch, BatchResult
+from .segments import run_segmented
+from .districts import Districts, run_districts
 
 
 __all__ = [
@@ -38,6 +50,18 @@ __all__ = [
     "simparam",
     "UCMDef",
     "urbflux",
+    "conduction",
     "weather",
+    "epw",
     "RSMDef",
+    "npbackend",
+    "recorder",
+    "refstore",
+    "uwgparams",
+    "checkpoint",
+    "spinup",
+    "batch",
+    "ruralrun",
+    "segments",
+    "districts",
     ]
@@ -0,0 +1,319 @@
+"""Ensemble runner: many uwg scenarios over a process pool.
+
+run_batch morphs one or more rural EPW files for a list of scenarios, each a
+.uwg file or a dictionary of parameters overriding a base .uwg file, i.e.
+{"bldDensity": 0.4, "alb_road": 0.2}. Runs are spread over a pool of worker
+processes and their results are yielded as they complete.
+
+Each worker reads the EPW files, the .uwg files and the DOE reference store
+once (see epw.load_epw_columns, uwgparams.load_params and refstore.load_store).
+The weather columns of the EPW files are published once in shared memory and
+the workers read them without copies (see sharedforcing). The runs of a worker share the weather, forcing and solar geometry of their
+simulation period (see uwg.rerun). At most max_in_flight runs are submitted at
+a time, so memory does not grow with the number of scenarios. A failed run
+gives a BatchResult with its error and does not stop the batch. If a worker
+process dies (i.e. killed or out of memory), the pool is restarted and the runs
+that were in flight are rerun one at a time; a run whose worker dies again
+gives a failed BatchResult.
+"""
+from __future__ import division, print_function
+
+import os
+import sys
+import time
+import traceback
+from itertools import islice
+
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures.process import BrokenProcessPool
+except ImportError:
+    ProcessPoolExecutor = None
+
+from .uwg import uwg
+from .epw import load_epw_columns
+from .uwgparams import load_params
+from .refstore import load_store
+from .checkpoint import Checkpoint
+from . import sharedforcing
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+# Simulated days between the checkpoints of a run
+CHECKPOINT_DAYS = 7
+
+# Folder of the checkpoints, in destination_dir or the folder of the EPW file,
+# unless checkpoint_dir is given
+CHECKPOINT_FOLDER = ".uwg_checkpoints"
+
+# Parameters that a scenario can override (see uwg.RERUN_GROUPS)
+PARAMETERS = frozenset(name for group, names in uwg.RERUN_GROUPS for name in names)
+
+PARAM_MSG = "'{}' can not be set by a batch scenario. Parameters are listed in uwg.RERUN_GROUPS."
+SCENARIO_MSG = "A batch scenario must be the path of a .uwg file or a dictionary of parameters. Got {}."
+BASE_MSG = "Scenarios of parameters need the base .uwg file (uwg_param_file)."
+WORKER_MSG = "The worker process of the run died twice (i.e. killed, out of memory or crashed)."
+POOL_MSG = "run_batch with more than one process requires concurrent.futures (python 3)."
+
+
+class BatchResult(object):
+    """
+    Outcome of one run of a batch.
+
+    properties
+        index       # index of the scenario in the list given to run_batch
+        epw         # path of the rural EPW file
+        scenario    # .uwg file path or dictionary of parameters of the run
+        outputs     # dictionary of recorded channel to array('d') column (see Recorder)
+        levels      # dictionary of profile channel to number of levels
+        newPathName # path of the morphed EPW file, if written
+        error       # traceback of the failure of the run, None if it succeeded
+        elapsed     # run time in the worker (s)
+    """
+
+    def __init__(self, index, epw, scenario, outputs=None, levels=None, newPathName=None, error=None,
+                 elapsed=0.):
+        self.index = index
+        self.epw = epw
+        self.scenario = scenario
+        self.outputs = outputs
+        self.levels = levels
+        self.newPathName = newPathName
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return "BatchResult: scenario {} on {}, {}".format(
+            self.index, os.path.basename(self.epw), "failed" if self.error else "{:.2f} s".format(self.elapsed))
+
+    @property
+    def ok(self):
+        """True if the run succeeded."""
+        return self.error is None
+
+
+def run_batch(scenarios, epw, uwg_param_file=None, channels=None, write_epw=False, destination_dir=None,
+              processes=None, max_in_flight=None, checkpoint_dir=None, checkpoint_days=CHECKPOINT_DAYS,
+              backend="python", shared_weather=True, rural_reuse=True):
+    """
+    Run scenarios over a process pool, yielding a BatchResult per run as runs
+    complete (not in the order of the scenarios).
+
+    args:
+        scenarios: list of .uwg file paths and dictionaries of uwg parameters
+            (see PARAMETERS) overriding the base .uwg file
+        epw: path of the rural EPW file, or list of paths to run every
+            scenario on each of them
+        uwg_param_file: path of the base .uwg file of dictionary scenarios
+        channels: output channels recorded in addition to the EPW channels
+            (see uwg.recordChannels)
+        write_epw: write the morphed EPW of each run, as
+            <epw name>_<scenario index>_UWG.epw in destination_dir
+        destination_dir: folder of the morphed EPW files (default: the folder
+            of the rural EPW)
+        processes: number of worker processes (default: number of cpus, 1 to
+            run in this process)
+        max_in_flight: max number of runs submitted at a time (default: twice
+            the number of processes)
+        checkpoint_dir: folder of the checkpoints of the runs (see
+            uwg.resume). A run that is interrupted (i.e. its worker or the
+            batch is killed) is resumed from its last checkpoint by the next
+            batch with the same checkpoint_dir, and the checkpoint of a run is
+            removed when it succeeds. Default: CHECKPOINT_FOLDER in
+            destination_dir or the folder of the EPW file. False takes no
+            checkpoint.
+        checkpoint_days: simulated days between the checkpoints of a run
+        backend: simulation backend of the runs (see uwg.BACKENDS)
+        shared_weather: publish the weather columns of the EPW files in shared
+            memory for the workers (python 3.8), instead of reading them in
+            each worker
+        rural_reuse: replay the rural reference model of the runs of a worker
+            with the same period and rural inputs (see uwg.ruralReuse)
+    """
+    epws = [epw] if isinstance(epw, str) else list(epw)
+    options = (uwg_param_file, channels, write_epw, destination_dir, checkpoint_dir,
+               checkpoint_days, backend, rural_reuse)
+    tasks = ((index, path, scenario, options) for path in epws for index, scenario in enumerate(scenarios))
+
+    if processes == 1:
+        _init_worker(epws, uwg_param_file)
+        for task in tasks:
+            yield _run(task)
+        return
+
+    if ProcessPoolExecutor is None:
+        raise ImportError(POOL_MSG)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if max_in_flight is None:
+        max_in_flight = 2 * processes
+    blocks = []
+    executor = None
+    try:
+        if shared_weather:
+            blocks = sharedforcing.publish(epws)
+        initargs = (epws, uwg_param_file, [(b.path, b.spec) for b in blocks])
+        executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs)
+        tasks = iter(tasks)
+        pending = {}
+        # Runs in flight when a worker died, rerun one at a time so that a run
+        # that kills its worker again is told apart from the others
+        suspects = []
+        rerun = set()
+        while True:
+            if suspects:
+                new = [suspects.pop(0)] if not pending else []
+                rerun.update(task[:2] for task in new)
+            else:
+                new = list(islice(tasks, max_in_flight - len(pending)))
+            lost = []
+            for task in new:
+                try:
+                    pending[executor.submit(_run, task)] = task
+                except BrokenProcessPool:
+                    lost.append(task)
+            if not pending and not lost:
+                break
+
+            for result in _completed(pending, lost):
+                yield result
+            if lost:
+                # The pool is broken: collect its other runs, and start a new one
+                while pending:
+                    for result in _completed(pending, lost):
+                        yield result
+                _shutdown(executor)
+                executor = ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs)
+                for task in lost:
+                    if task[:2] in rerun:
+                        yield BatchResult(task[0], task[1], task[2], error=WORKER_MSG)
+                    else:
+                        suspects.append(task)
+    finally:
+        if executor is not None:
+            _shutdown(executor)
+        for block in blocks:
+            block.close()
+
+
+def _shutdown(executor):
+    # Stop the pool once its running runs are done. The runs not started are
+    # cancelled (python 3.9), i.e. when the caller stops iterating run_batch.
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        executor.shutdown(wait=True)
+
+
+def _completed(pending, lost):
+    # Wait for runs to complete, and give their results. The runs lost by a
+    # break of the pool (a worker died) are appended to lost.
+    done, not_done = wait(list(pending), return_when=FIRST_COMPLETED)
+    for future in done:
+        task = pending.pop(future)
+        try:
+            yield future.result()
+        except BrokenProcessPool:
+            lost.append(task)
+        except Exception:
+            yield BatchResult(task[0], task[1], task[2], error=traceback.format_exc())
+
+
+def _init_worker(epws, uwg_param_file, shared=()):
+    # Read the shared inputs once in each worker
+    sharedforcing.attach(shared)
+    for path in epws:
+        load_epw_columns(path)
+    if uwg_param_file is not None:
+        load_params(uwg_param_file)
+    load_store(os.path.join(uwg.CURRENT_PATH, "refdata", "readDOE.pkl"))
+
+
+# Simulation period objects, weather and forcing of the last run of this
+# process, given to the next run (see uwg.init_input_obj)
+_period = [None]
+
+
+def _run(task):
+    # Run one scenario, catching its errors
+    index, path, scenario, options = task
+    start = time.time()
+    try:
+        model = _model(index, path, scenario, options)
+        outputs = dict((name, model.recorder[name]) for name in model.recorder.columns)
+        return BatchResult(index, path, scenario, outputs, dict(model.recorder.levels),
+                           model.newPathName if options[2] else None, None, time.time() - start)
+    except Exception:
+        return BatchResult(index, path, scenario, error=traceback.format_exc(), elapsed=time.time() - start)
+
+
+def _model(index, path, scenario, options):
+    # Simulated uwg of one scenario
+    uwg_param_file, channels, write_epw, destination_dir, checkpoint_dir, checkpoint_days, backend, \
+        rural_reuse = options
+    if isinstance(scenario, dict):
+        if uwg_param_file is None:
+            raise Exception(BASE_MSG)
+        param_file, overrides = uwg_param_file, scenario
+    elif isinstance(scenario, str):
+        param_file, overrides = scenario, {}
+    else:
+        raise Exception(SCENARIO_MSG.format(type(scenario)))
+    for name in overrides:
+        if name not in PARAMETERS:
+            raise Exception(PARAM_MSG.format(name))
+
+    epwDir, epwFileName = os.path.split(os.path.abspath(path))
+    uwgParamDir, uwgParamFileName = os.path.split(os.path.abspath(param_file))
+    destinationFileName = "{}_{}_UWG.epw".format(os.path.splitext(epwFileName)[0], index)
+    model = uwg(epwFileName, uwgParamFileName, epwDir, uwgParamDir, destination_dir or epwDir,
+                destinationFileName, backend)
+    model.recordChannels = channels
+    model.ruralReuse = rural_reuse and backend == "python"
+
+    # Parameters set before set_input override the .uwg file
+    for name, value in overrides.items():
+        setattr(model, name, value)
+    model.read_epw()
+    model.set_input()
+
+    checkpoint = None
+    if checkpoint_dir is not False and backend == "python":
+        checkpoint_dir = checkpoint_dir or os.path.join(destination_dir or epwDir, CHECKPOINT_FOLDER)
+        try:
+            os.makedirs(checkpoint_dir)
+        except OSError:
+            # Made by another worker
+            if not os.path.isdir(checkpoint_dir):
+                raise
+        model.checkpointDays = checkpoint_days
+        model.checkpointPath = os.path.join(
+            checkpoint_dir, "{}_{}{}".format(os.path.splitext(epwFileName)[0], index, ".ckp"))
+        if os.path.exists(model.checkpointPath):
+            checkpoint = Checkpoint.load(model.checkpointPath)
+
+    if _period[0] is not None:
+        model._period, model.weather, model.forcIP = _period[0]
+    model.init_BEM_obj()
+    model.init_input_obj()
+    model.hvac_autosize()
+    if checkpoint is not None and checkpoint.key != model.checkpoint_key():
+        # Checkpoint of another scenario that had this index
+        checkpoint = None
+    model.simulate(checkpoint)
+    _period[0] = (model._period, model.weather, model.forcIP)
+
+    if model.checkpointPath is not None and os.path.exists(model.checkpointPath):
+        os.remove(model.checkpointPath)
+    if write_epw:
+        model.write_epw()
+    return model
@@ -0,0 +1,129 @@
+"""Checkpoints of the uwg simulation state.
+
+A Checkpoint holds the state that simulate carries from one time step to the
+next: the attributes of the forcing, UCM, UBL, RSM, USM, rural, road, SimParam
+and SolarCalcs objects, of each BEMDef with its Building and Elements, and the
+outputs recorded so far. uwg.resume continues a run from a Checkpoint with the
+same results as the uninterrupted run.
+
+Only the values that change during a run are kept: references between the
+model objects, loggers, the layer properties of the Elements, the calendar and
+the solar geometry are rebuilt by initializing the uwg as for simulate.
+"""
+import hashlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .utilities import PICKLE_PROTOCOL, write_atomic
+
+
+# Attributes that are constant during a run, shared or rebuilt by the uwg
+SKIP = frozenset((
+    "logger",
+    "_factors",             # Element conduction factor cache
+    "layerThickness",       # Element layer properties
+    "layerThermalCond",
+    "layerVolHeat",
+    "_calendar",            # SimParam calendar
+    "geometry",             # SolarCalcs solar geometry
+    "_geometryKey",
+    "_geometryStart",
+    ))
+
+
+class Checkpoint(object):
+    """
+    Simulation state of a uwg after time step `step`.
+
+    args:
+        step: last simulated time step
+        n: number of print steps recorded
+        key: digest of the inputs of the run (see uwg.checkpoint_key)
+        data: pickled state (see capture)
+
+    properties
+        step        # last simulated time step
+        n           # number of print steps recorded
+        key         # digest of the inputs of the run
+        data        # pickled state of the model objects and of the recorder
+    """
+
+    MAGIC = b"UWGCKP01\n"
+    PROTOCOL = PICKLE_PROTOCOL
+
+    FILE_MSG = "'{}' is not a uwg checkpoint file."
+
+    def __init__(self, step, n, key, data):
+        self.step = step
+        self.n = n
+        self.key = key
+        self.data = data
+
+    def __repr__(self):
+        return "Checkpoint: step {}, {} print steps, {} bytes".format(self.step, self.n, len(self.data))
+
+    @classmethod
+    def capture(cls, model, step, n):
+        """Checkpoint of a uwg being simulated, after time step `step`."""
+        state = dict((name, _state(obj)) for name, obj in model_objects(model))
+        state["recorder"] = model.recorder.state()
+        return cls(step, n, model.checkpoint_key(), pickle.dumps(state, cls.PROTOCOL))
+
+    def restore(self, model):
+        """
+        Set the state of the model objects and of the recorder of a uwg that
+        has been initialized for simulate.
+        """
+        state = pickle.loads(self.data)
+        for name, obj in model_objects(model):
+            for attr, value in state[name].items():
+                setattr(obj, attr, value)
+        model.recorder.restore(state["recorder"])
+
+    def save(self, path):
+        """Write the checkpoint to a file. The file is replaced at once."""
+        header = pickle.dumps((self.step, self.n, self.key), self.PROTOCOL)
+        write_atomic(path, (self.MAGIC, pickle.dumps(len(header), self.PROTOCOL), header, self.data))
+
+    @classmethod
+    def load(cls, path):
+        """Checkpoint written by save."""
+        with open(path, "rb") as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise Exception(cls.FILE_MSG.format(path))
+            size = pickle.load(f)
+            step, n, key = pickle.loads(f.read(size))
+            return cls(step, n, key, f.read())
+
+
+def model_objects(model):
+    """(name, object) of the model objects of a uwg that hold simulation state."""
+    objects = [("forc", model.forc), ("UCM", model.UCM), ("UBL", model.UBL), ("RSM", model.RSM),
+               ("USM", model.USM), ("rural", model.rural), ("road", model.UCM.road),
+               ("simTime", model.simTime), ("solar", model.solar)]
+    for i, bem in enumerate(model.BEM):
+        objects.extend((("BEM{}".format(i), bem), ("BEM{}.building".format(i), bem.building),
+                        ("BEM{}.mass".format(i), bem.mass), ("BEM{}.wall".format(i), bem.wall),
+                        ("BEM{}.roof".format(i), bem.roof)))
+    return objects
+
+
+def digest(values):
+    """md5 digest of the repr of values."""
+    return hashlib.md5(repr(values).encode("utf-8")).hexdigest()
+
+
+def _state(obj):
+    # Attributes of a model object, without the references to other objects
+    # and the attributes in SKIP
+    return dict((attr, value) for attr, value in vars(obj).items()
+                if attr not in SKIP and not _is_object(value))
+
+
+def _is_object(value):
+    if isinstance(value, (list, tuple)):
+        return len(value) > 0 and hasattr(value[0], "__dict__")
+    return hasattr(value, "__dict__")
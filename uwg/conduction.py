@@ -0,0 +1,111 @@
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many elements the per-call overhead of numpy outweighs the stacked
+# solve, and each element is solved with its own Element.Conduction.
+MIN_BATCH = 30
+
+
+def conduction(elements, dt, flx1, bc, temp2, flx2):
+    """
+    Batched Element.Conduction: update the layer temperatures of several
+    elements with a single tridiagonal solve.
+
+    The layer systems are stacked into a padded array (identity rows below the
+    last layer of shorter elements) and eliminated in the same order as
+    Element.invert, so each element gets the same result as its own Conduction.
+    Without numpy (i.e IronPython), or for fewer than MIN_BATCH elements, each
+    element is solved in turn.
+
+    args:
+        elements: list of Element objects
+        dt: simulation time step (s)
+        flx1: list of net heat flux on the outer surface of each element
+        bc: list of boundary condition parameters (1 or 2) of each element
+        temp2: deep soil temperature (used for bc 2)
+        flx2: list of heat flux at the inner surface of each element (used for bc 1)
+    returns:
+        list of the new layerTemp of each element (also set on the elements)
+    """
+    if np is None or len(elements) < MIN_BATCH:
+        for k in range(len(elements)):
+            elements[k].layerTemp = elements[k].Conduction(dt, flx1[k], bc[k], temp2, flx2[k])
+        return [e.layerTemp for e in elements]
+
+    fexp = 0.5                  # explicit coefficient
+    ne = len(elements)
+    factors = tuple(elements[k].ConductionFactors(dt, bc[k]) for k in range(ne))
+    tcp, hcpdt, za0, za1, za2, bc2, pad, fill, num = _stack_factors(factors, bc)
+    nz = za1.shape[0]
+    last = np.array(num) - 1
+    cols = np.arange(ne)
+
+    # Layer temperatures as (layer, element) array, padded with zeros
+    t = np.array([elements[k].layerTemp + fill[k] for k in range(ne)]).T
+
+    zy = np.empty((nz, ne))
+    zy[0] = hcpdt[0]*t[0] - fexp*tcp[1]*(t[0]-t[1]) + np.array(flx1, dtype=float)
+    zy[1:] = hcpdt[1:nz] * t[1:nz] + fexp * \
+        (tcp[1:nz]*t[:nz-1] - tcp[1:nz]*t[1:nz] - tcp[2:]*t[1:nz] + tcp[2:]*t[2:])
+
+    # Inner boundary: heat flux (bc 1) or deep temperature (bc 2)
+    zy_flx = hcpdt[last, cols]*t[last, cols] + fexp*tcp[last, cols]*(t[last-1, cols]-t[last, cols]) + \
+        np.array(flx2, dtype=float)
+    zy[last, cols] = np.where(bc2, temp2, zy_flx)
+    zy[pad] = 0.
+
+    # Back-substitution of Element.invert, for all elements at once
+    for i in range(nz-2, -1, -1):
+        zy[i] -= za2[i] * zy[i+1]/za1[i+1]
+
+    for i in range(1, nz):
+        zy[i] -= za0[i] * zy[i-1]/za1[i-1]
+
+    zx = (zy / za1).T.tolist()
+
+    for k in range(ne):
+        elements[k].layerTemp = zx[k][:num[k]]
+    return [e.layerTemp for e in elements]
+
+
+# Stacked factors of the last batches (the elements and the roads of
+# districts.Districts alternate), most recent first, reused while every element
+# returns the same (cached) factors from Element.ConductionFactors
+_stacked = []
+MAX_STACKED = 2
+
+
+def _stack_factors(factors, bc):
+    """Padded (layer, element) arrays of the Element.ConductionFactors of a batch.
+    Rows below the last layer of shorter elements are identity rows.
+    """
+    for key, stacked in _stacked:
+        if len(key) == len(factors) and all(key[k] is factors[k] for k in range(len(factors))):
+            return stacked
+
+    ne = len(factors)
+    num = [len(f[0]) for f in factors]
+    nz = max(num)
+    fill = [[0.] * (nz + 1 - n) for n in num]
+
+    tcp = np.array([factors[k][0] + fill[k] for k in range(ne)]).T
+    hcpdt = np.array([factors[k][1] + fill[k] for k in range(ne)]).T
+    za0 = np.array([factors[k][2] + fill[k][1:] for k in range(ne)]).T
+    za1 = np.array([factors[k][3] + [1.] * (nz - num[k]) for k in range(ne)]).T
+    za2 = np.array([factors[k][4] + fill[k][1:] for k in range(ne)]).T
+    bc2 = np.array([abs(b - 2.) < 1e-10 for b in bc])
+    pad = np.arange(nz)[:, None] >= np.array(num)[None, :]
+
+    stacked = (tcp, hcpdt, za0, za1, za2, bc2, pad, fill, num)
+    _stacked.insert(0, (factors, stacked))
+    del _stacked[MAX_STACKED:]
+    return stacked
@@ -0,0 +1,248 @@
+"""Districts of a city simulated together, sharing one rural model.
+
+A city study splits the city into districts (neighbourhoods) with their own
+buildings, canyon geometry and boundary layer, which all morph the same rural
+EPW. run_districts simulates them in one time loop (Districts): the forcing, the
+calendar, the solar angles and the rural reference model (rural element and
+RSMDef.VDM) are advanced once per time step for all districts, and the layer
+temperatures of the elements of all districts are updated by one batched
+conduction solve (see conduction). Each district has its own UCMDef, UBLDef and
+BEMDef objects, outputs and morphed EPW.
+
+The outputs of each district are the outputs of its own uwg run. The districts
+must share the period and the inputs of the rural model (see
+uwg.RURAL_PARAMS), and are simulated by the python backend, without checkpoints
+or spin-up.
+"""
+from __future__ import division, print_function
+
+import os
+
+from .uwg import uwg
+from .batch import PARAMETERS, PARAM_MSG, SCENARIO_MSG, BASE_MSG
+from .conduction import conduction
+from .urbflux import surface_fluxes, conduction_inputs, road_fluxes, advection, canyon_fluxes
+from .solarcalcs import SolarCalcs
+from .psychrometrics import psychrometrics
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+DISTRICTS_MSG = "Districts needs at least one district."
+RURAL_MSG = "District {} does not have the period and rural inputs of district 0 (see uwg.RURAL_PARAMS)."
+BACKEND_MSG = "District {} is not set to the python backend, the only one of Districts."
+
+
+class Districts(object):
+    """
+    Urban districts of one rural site, advanced in lockstep by one time loop.
+
+    args:
+        models: list of uwg of the districts, initialized (init_BEM_obj,
+            init_input_obj and hvac_autosize) from the same EPW, with the same
+            period and rural inputs (see uwg.rural_key)
+
+    properties
+        models      # list of uwg of the districts
+        lead        # first district, whose forcing, calendar, geoParam, RSM and
+                    # rural element are shared by all districts
+    """
+
+    def __init__(self, models):
+        if not models:
+            raise Exception(DISTRICTS_MSG)
+        self.models = list(models)
+        self.lead = self.models[0]
+
+        key = self.lead.rural_key()
+        for i, model in enumerate(self.models):
+            if model.backend != "python":
+                raise Exception(BACKEND_MSG.format(i))
+            if model.rural_key() != key:
+                raise Exception(RURAL_MSG.format(i))
+
+        # Objects of the rural site, shared by all districts
+        lead = self.lead
+        for model in self.models[1:]:
+            model._period = lead._period
+            model.weather = lead.weather
+            model.forcIP = lead.forcIP
+            model.simTime = lead.simTime
+            model.forc = lead.forc
+            model.geoParam = lead.geoParam
+            model.RSM = lead.RSM
+            model.rural = lead.rural
+
+    def __repr__(self):
+        return "Districts: {} districts from {}".format(len(self.models), self.lead.epwFileName)
+
+    def solar_calcs(self):
+        """
+        SolarCalcs of each district. Districts with the same canyon aspect ratio
+        share their solar geometry, and the others share the solar angles of the
+        first one (see SolarCalcs.precompute).
+        """
+        lead = self.lead
+        geometries = {}
+        first = None
+        for model in self.models:
+            model.solar = SolarCalcs(model.UCM, model.BEM, lead.simTime, lead.RSM, lead.forc, lead.geoParam,
+                                     lead.rural)
+            previous = geometries.get(model.UCM.canAspect)
+            if previous is None or not model.solar.reuse(previous):
+                model.solar.precompute(lead.simTime.nt - 1, first)
+                geometries[model.UCM.canAspect] = model.solar
+            if first is None:
+                first = model.solar
+        return [model.solar for model in self.models]
+
+    def simulate(self):
+        """Simulate all districts, as uwg.simulate does for one."""
+        lead = self.lead
+        models = self.models
+        simTime = lead.simTime
+        forc = lead.forc
+        geoParam = lead.geoParam
+        RSM = lead.RSM
+        rural = lead.rural
+
+        for model in models:
+            model.N = int(simTime.days * 24)
+            model.ph = simTime.dt/3600.
+            model.init_recorder()
+        n = 0
+        N = lead.N
+        lastSchRow = None
+
+        forcRows = lead.forcing_rows()
+        for model in models:
+            model.forcRows = forcRows
+        self.solar_calcs()
+
+        print('\nSimulating new temperature and humidity values of {} districts for {} days from {}/{}.\n'.format(
+            len(models), int(lead.nDay), int(lead.Month), int(lead.Day)))
+        lead.logger.info("Start simulation of {} districts".format(len(models)))
+
+        for it in range(1, simTime.nt, 1):
+            lead.forcing_step(it)
+
+            dayType = simTime.dayType
+            schRow = (dayType - 1, simTime.hourDay)
+            updateSch = schRow != lastSchRow
+            lastSchRow = schRow
+
+            for model in models:
+                model.UCM.canHum = forc.hum
+                model.solar.solarcalcs()
+                model.dayType = dayType
+                model.UCM.sensAnthrop = model.sensAnth * (model.SchTraffic[dayType-1][simTime.hourDay])
+                model.building_step(schRow, updateSch)
+
+            lead.rural_step()
+
+            # Update the element temperatures of all districts (and rural) in one solve
+            elements = []
+            flx1 = []
+            bc = []
+            flx2 = []
+            for model in models:
+                surface_fluxes(model.UCM, model.BEM, forc, geoParam, simTime)
+                conduction_inputs(model.BEM, None, elements, flx1, bc, flx2)
+            conduction_inputs([], rural, elements, flx1, bc, flx2)
+            conduction(elements, simTime.dt, flx1, bc, forc.deepTemp, flx2)
+
+            # Then the roads of all districts
+            roads = []
+            for k, model in enumerate(models):
+                road_fluxes(model.UCM, model.BEM, forc, geoParam, simTime, rural if k == 0 else None)
+                roads.append(model.UCM.road)
+            conduction(roads, simTime.dt, [road.flux for road in roads], [2.] * len(roads), forc.deepTemp,
+                       [0.] * len(roads))
+
+            adv = advection(RSM)
+            for model in models:
+                canyon_fluxes(model.UCM, model.UBL, forc, geoParam, RSM, adv)
+                model.UCM.UCModel(model.BEM, model.UBL.ublTemp, forc, geoParam)
+                model.UBL.UBLModel(model.UCM, RSM, rural, forc, geoParam, simTime)
+
+            if simTime.IsPrintStep() and n < N:
+                for model in models:
+                    _Tdb, _w, model.UCM.canRHum, _h, model.UCM.Tdp, _v = psychrometrics(
+                        model.UCM.canTemp, model.UCM.canHum, forc.pres)
+                    model.recorder.record(forc, model.UCM, model.UBL, RSM)
+                n += 1
+
+    def write_epw(self):
+        """Write the morphed EPW of each district."""
+        for model in self.models:
+            model.write_epw()
+
+
+def run_districts(districts, epw, uwg_param_file=None, channels=None, write_epw=False, destination_dir=None):
+    """
+    Simulate the districts of a city on one rural EPW (see Districts).
+
+    args:
+        districts: list of .uwg file paths and dictionaries of uwg parameters
+            (see batch.PARAMETERS) overriding the base .uwg file, one per
+            district. They must not change the period or the rural inputs
+            (uwg.RURAL_PARAMS).
+        epw: path of the rural EPW file
+        uwg_param_file: path of the base .uwg file of dictionary districts
+        channels: output channels recorded in addition to the EPW channels
+            (see uwg.recordChannels)
+        write_epw: write the morphed EPW of each district, as
+            <epw name>_<district index>_UWG.epw in destination_dir
+        destination_dir: folder of the morphed EPW files (default: the folder
+            of the rural EPW)
+    returns:
+        list of the simulated uwg of the districts
+    """
+    models = []
+    for index, district in enumerate(districts):
+        models.append(_model(index, epw, district, uwg_param_file, channels, destination_dir))
+        if index > 0:
+            # Simulation period objects of the first district
+            models[-1]._period, models[-1].weather, models[-1].forcIP = \
+                models[0]._period, models[0].weather, models[0].forcIP
+        models[-1].init_BEM_obj()
+        models[-1].init_input_obj()
+        models[-1].hvac_autosize()
+
+    run = Districts(models)
+    run.simulate()
+    if write_epw:
+        run.write_epw()
+    return models
+
+
+def _model(index, path, district, uwg_param_file, channels, destination_dir):
+    # uwg of one district, with its inputs set (see batch._model)
+    if isinstance(district, dict):
+        if uwg_param_file is None:
+            raise Exception(BASE_MSG)
+        param_file, overrides = uwg_param_file, district
+    elif isinstance(district, str):
+        param_file, overrides = district, {}
+    else:
+        raise Exception(SCENARIO_MSG.format(type(district)))
+    for name in overrides:
+        if name not in PARAMETERS:
+            raise Exception(PARAM_MSG.format(name))
+
+    epwDir, epwFileName = os.path.split(os.path.abspath(path))
+    uwgParamDir, uwgParamFileName = os.path.split(os.path.abspath(param_file))
+    destinationFileName = "{}_{}_UWG.epw".format(os.path.splitext(epwFileName)[0], index)
+    model = uwg(epwFileName, uwgParamFileName, epwDir, uwgParamDir, destination_dir or epwDir,
+                destinationFileName)
+    model.recordChannels = channels
+
+    # Parameters set before set_input override the .uwg file
+    for name, value in overrides.items():
+        setattr(model, name, value)
+    model.read_epw()
+    model.set_input()
+    return model
@@ -75,6 +75,8 @@ class Element(object):
             self.T_int = None                                        # internal surface temperature
             self.flux = None                                         # external surface heat flux
 
+            self._factors = None                                     # cached conduction factors (see ConductionFactors)
+
     def __repr__(self):
         # Returns some representative wall properties
         s1 = "Element: {a}\n\tlayerNum={b}, totaldepth={c}\n\t".format(
@@ -98,6 +100,17 @@ class Element(object):
         """ Calculate net heat flux, and update element layer temperatures
         """
 
+        self.SurfHeatBalance(forc,parameter,simTime,humRef,tempRef,windRef)
+
+        self.layerTemp = self.Conduction(simTime.dt, self.flux, boundCond, forc.deepTemp, intFlux)
+        self.T_ext = self.layerTemp[0]
+        self.T_int = self.layerTemp[-1]
+
+    def SurfHeatBalance(self,forc,parameter,simTime,humRef,tempRef,windRef):
+        """ Calculate net heat flux at the outer surface, without updating the
+        element layer temperatures (see conduction.conduction for batched updates)
+        """
+
         # Calculated per unit area (m^2)
         dens = forc.pres/(1000*0.287042*tempRef*(1.+1.607858*humRef)) # air density (kgd m-3)
         self.aeroCond = 5.8 + 3.7 * windRef         # Convection coef (ref: uwg, eq. 12))
@@ -140,10 +153,6 @@ class Element(object):
             self.sens = self.aeroCond*(self.layerTemp[0]-tempRef)
             self.flux = -self.sens + self.solAbs + self.infra - self.lat # (W m-2)
 
-        self.layerTemp = self.Conduction(simTime.dt, self.flux, boundCond, forc.deepTemp, intFlux)
-        self.T_ext = self.layerTemp[0]
-        self.T_int = self.layerTemp[-1]
-
     def Conduction(self, dt, flx1, bc, temp2, flx2):
         """
         Solve the conductance of heat based on of the element layers.
@@ -153,6 +162,48 @@ class Element(object):
             temp2 : deep soil temperature (ave of air temperature)
             flx2  : surface flux (sum of absorbed, emitted, etc.)
 
+        The tridiagonal matrix (see ConductionFactors) is constant for a given
+        dt and bc, so only the right hand side is built here and the solve is
+        the back-substitution of invert.
+        """
+        t = self.layerTemp          # vector of layer temperatures (K)
+        fexp = 0.5                  # explicit coefficient
+        num = len(t)                # number of layers
+
+        tcp, hcpdt, za0, za1, za2 = self.ConductionFactors(dt, bc)
+        zy = [0 for x in range(num)]    # RHS
+
+        # flx1                      : net heat flux on surface
+        # bc                        : boundary condition parameter (1 or 2)
+        # temp2                     : deep soil temperature (avg of air temperature)
+        # flx2                      : surface flux (sum of absorbed, emitted, etc.)
+
+        # First row, other rows and boundary condition of the RHS column vector
+        zy[0] = hcpdt[0]*t[0] - fexp*tcp[1]*(t[0]-t[1]) + flx1
+        for j in range(1,num-1):
+          zy[j] = hcpdt[j] * t[j] + fexp * \
+            (tcp[j]*t[j-1] - tcp[j]*t[j] - tcp[j+1]*t[j] + tcp[j+1]*t[j+1])
+
+        if self.is_near_zero(bc-1.): # heat flux
+            zy[num-1] = hcpdt[num-1]*t[num-1] + fexp*tcp[num-1]*(t[num-2]-t[num-1]) + flx2
+        else: # deep-temperature
+            zy[num-1] = temp2
+
+        for i in reversed(range(num-1)):
+            zy[i] = zy[i] - za2[i] * zy[i+1]/za1[i+1]
+
+        for i in range(1,num,1):
+            zy[i] = zy[i] - za0[i] * zy[i-1]/za1[i-1]
+
+        return [zy[i]/za1[i] for i in range(num)] # return zx as 1d vector of templayers
+
+    def ConductionFactors(self, dt, bc):
+        """
+        Factors of the Conduction tridiagonal matrix for a time step and boundary
+        condition. They only depend on dt, bc and the layer properties, so they are
+        computed once per (dt, bc) and recomputed when layerThickness,
+        layerThermalCond or layerVolHeat change.
+
         key prop:
             za = [[ x00, x01, x02 ... x0w ]
                   [ x10, x11, x12 ... x1w ]
@@ -162,20 +213,27 @@ class Element(object):
             where h = matrix row index    = element layer number
                   w = matrix column index = 3
 
+        returns:
+            (tcp, hcpdt, za0, za1, za2) where tcp is the layer interface conductance,
+            hcpdt the layer heat capacity over dt, za0 and za2 the lower and upper
+            diagonals, and za1 the principal diagonal after the elimination of invert.
         """
-        t = self.layerTemp          # vector of layer temperatures (K)
+        layers = (tuple(self.layerThickness), tuple(self.layerThermalCond), tuple(self.layerVolHeat))
+        cache = getattr(self, '_factors', None)     # not set on Elements from older pickles
+        if cache is None or cache[0] != layers:
+            cache = (layers, {})
+            self._factors = cache
+
+        factors = cache[1].get((dt, bc))
+        if factors is not None:
+            return factors
+
         hc = self.layerVolHeat      # vector of layer volumetric heat (J m-3 K-1)
         tc = self.layerThermalCond  # vector of layer thermal conductivities (W m-1 K-1)
         d = self.layerThickness     # vector of layer thicknesses (m)
 
-        # flx1                      : net heat flux on surface
-        # bc                        : boundary condition parameter (1 or 2)
-        # temp2                     : deep soil temperature (avg of air temperature)
-        # flx2                      : surface flux (sum of absorbed, emitted, etc.)
-
         fimp = 0.5                  # implicit coefficient
-        fexp = 0.5                  # explicit coefficient
-        num = len(t)                # number of layers
+        num = len(d)                # number of layers
 
         # Mean thermal conductivity over distance between 2 layers (W/mK)
         tcp = [0 for x in range(num)]
@@ -183,8 +241,6 @@ class Element(object):
         hcp = [0 for x in range(num)]
         # lower, main, and upper diagonals
         za = [[0 for y in range(3)] for x in range(num)]
-        # RHS
-        zy = [0 for x in range(num)]
 
         #--------------------------------------------------------------------------
         # Define the column vectors for heat capactiy and conductivity
@@ -194,11 +250,10 @@ class Element(object):
             hcp[j] = hc[j] * d[j]
 
         #--------------------------------------------------------------------------
-        # Define the first row of za matrix, and RHS column vector
+        # Define the first row of za matrix
         za[0][0] = 0.
         za[0][1] = hcp[0]/dt + fimp*tcp[1]
         za[0][2] = -fimp*tcp[1]
-        zy[0] = hcp[0]/dt*t[0] - fexp*tcp[1]*(t[0]-t[1]) + flx1
 
         #--------------------------------------------------------------------------
         # Define other rows
@@ -206,8 +261,6 @@ class Element(object):
           za[j][0] = fimp*(-tcp[j])
           za[j][1] = hcp[j]/dt + fimp*(tcp[j]+tcp[j+1])
           za[j][2] = fimp*(-tcp[j+1])
-          zy[j] = hcp[j]/dt * t[j] + fexp * \
-            (tcp[j]*t[j-1] - tcp[j]*t[j] - tcp[j+1]*t[j] + tcp[j+1]*t[j+1])
 
         #--------------------------------------------------------------------------
         # Boundary conditions
@@ -215,20 +268,20 @@ class Element(object):
             za[num-1][0] = fimp * (-tcp[num-1])
             za[num-1][1] = hcp[num-1]/dt + fimp*tcp[num-1]
             za[num-1][2] = 0.
-            zy[num-1] = hcp[num-1]/dt*t[num-1] + fexp*tcp[num-1]*(t[num-2]-t[num-1]) + flx2
         elif self.is_near_zero(bc-2.): # deep-temperature
             za[num-1][0] = 0.
             za[num-1][1] = 1.
             za[num-1][2] = 0.
-            zy[num-1] = temp2
         else:
             raise Exception(self.CONDUCTION_INPUT_MSG)
 
-        #--------------------------------------------------------------------------
+        # Elimination of the principal diagonal, as done by invert
+        for i in reversed(range(num-1)):
+            za[i][1] = za[i][1] - za[i][2] * za[i+1][0]/za[i+1][1]
 
-        zx = self.invert(num,za,zy)
-        #t(:) = zx(:);
-        return zx # return zx as 1d vector of templayers
+        factors = (tcp, [h/dt for h in hcp], [z[0] for z in za], [z[1] for z in za], [z[2] for z in za])
+        cache[1][(dt, bc)] = factors
+        return factors
 
     def qsat(self,temp,pres,parameter):
         """
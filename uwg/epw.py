@@ -0,0 +1,300 @@
+"""EPW loaders shared by uwg.read_epw and Weather.
+
+load_epw parses the text of an EPW file. load_epw_columns reads the binary
+columnar sidecar of an EPW file (built from the text on first use), from which
+only the requested rows are read.
+"""
+import os
+import sys
+import struct
+import hashlib
+import logging
+from array import array
+from csv import reader as csv_reader
+from collections import OrderedDict
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+from .utilities import read_csv, str2fl, write_atomic
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+class EPWData(object):
+    """
+    EPW file read once: header lines, weather rows as strings and the weather
+    columns used by the uwg as floats.
+
+    args:
+        path: path to the .epw file
+
+    properties
+        path        # path to the .epw file
+        header      # list of the 8 header lines, split by comma
+        rows        # list of weather rows (lines 9 to end), split by comma
+        columns     # dictionary of EPW column index to list of floats (COLUMNS)
+
+    The rows and columns are shared between every user of the cached file and
+    must not be modified in place.
+    """
+
+    # EPW columns read as floats
+    COLUMNS = (
+        6,      # drybulb [C]
+        7,      # dewpoint [C]
+        8,      # air relative humidity (%)
+        9,      # air pressure (Pa)
+        12,     # horizontal Infrared Radiation Intensity (W m-2)
+        13,     # horizontal radiation [W m-2]
+        14,     # normal solar direct radiation (W m-2)
+        15,     # horizontal solar diffuse radiation (W m-2)
+        20,     # wind direction ()
+        21,     # wind speed (m s-1)
+        33,     # Precipitation (mm h-1)
+        )
+
+    def __init__(self, path):
+        self.path = path
+        climate_data = read_csv(path)
+        self.header = climate_data[0:8]
+        self.rows = climate_data[8:]
+        self.columns = dict((c, str2fl([r[c] for r in self.rows])) for c in self.COLUMNS)
+
+    def __repr__(self):
+        return "EPWData: {}, {} rows".format(self.path, len(self.rows))
+
+    @property
+    def location(self):
+        """Location name (line 1 of the EPW)."""
+        return self.header[0][1]
+
+    def column(self, index, start=0, stop=None):
+        """Floats of column index for weather rows start to stop (excluded)."""
+        return self.columns[index][start:stop]
+
+
+class EPWColumns(object):
+    """
+    Binary columnar sidecar of an EPW file: the verbatim header lines and the
+    COLUMNS of EPWData as fixed-width little-endian float64 columns. Values
+    that are not numbers in the EPW are stored as nan.
+
+    The sidecar is written next to the EPW file (or in CACHE_DIR when set) the
+    first time the file is read, and rebuilt when the EPW modification time or
+    size changes. It is memory-mapped, and column reads only the requested rows.
+    If the sidecar can not be written, the columns are kept in memory.
+
+    args:
+        path: path to the .epw file
+
+    properties
+        path        # path to the .epw file
+        cache_path  # path to the sidecar file
+        header      # list of the 8 header lines, split by comma
+        nrows       # number of weather rows
+    """
+
+    MAGIC = b"UWGEPW01"
+    SUFFIX = ".uwgc"
+    # source mtime, source size, header length, number of rows, number of columns
+    LAYOUT = "<ddIII"
+
+    def __init__(self, path):
+        self.path = path
+        self.cache_path = sidecar_path(path)
+        self.logger = logging.getLogger(__name__)
+        stat = os.stat(path)
+        self._stamp = (float(stat.st_mtime), float(stat.st_size))
+        self._map = None
+        self._data = None
+
+        if not self._open():
+            self._build()
+
+    def __repr__(self):
+        return "EPWColumns: {}, {} rows".format(self.path, self.nrows)
+
+    @property
+    def location(self):
+        """Location name (line 1 of the EPW)."""
+        return self.header[0][1]
+
+    def column(self, index, start=0, stop=None):
+        """Floats of column index for weather rows start to stop (excluded)."""
+        if self._map is None and self._data is None and not self._open():
+            # Mapping released by close
+            self._build()
+        start, stop, step = slice(start, stop).indices(self.nrows)
+        stop = max(start, stop)
+        if self._data is not None:
+            return self._data[index][start:stop].tolist()
+
+        offset = self._offset + (self._columns.index(index) * self.nrows + start) * 8
+        values = array('d')
+        _frombytes(values, self._map[offset:offset + (stop - start) * 8])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values.tolist()
+
+    def close(self):
+        """Release the memory map of the sidecar. A later column read maps it again."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def _open(self):
+        # Map an up-to-date sidecar, False if there is none
+        if mmap is None or not os.path.exists(self.cache_path):
+            return False
+        with open(self.cache_path, "rb") as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, EnvironmentError):
+                return False
+
+        fixed = len(self.MAGIC) + struct.calcsize(self.LAYOUT)
+        if buf[:len(self.MAGIC)] != self.MAGIC or len(buf) < fixed:
+            buf.close()
+            return False
+        mtime, size, nheader, nrows, ncols = struct.unpack(self.LAYOUT, buf[len(self.MAGIC):fixed])
+        if (mtime, size) != self._stamp:
+            buf.close()
+            return False
+
+        self._columns = list(struct.unpack("<{}i".format(ncols), buf[fixed:fixed + 4*ncols]))
+        header_start = fixed + 4*ncols
+        self._set_header(buf[header_start:header_start + nheader])
+        self.nrows = nrows
+        self._offset = _aligned(header_start + nheader)
+        self._map = buf
+        return True
+
+    def _build(self):
+        # Parse the EPW text and write the sidecar. The parsed rows are not
+        # kept in the load_epw cache, only the columns if the sidecar can not
+        # be written.
+        epw = EPWData(self.path)
+        with open(self.path, "rb") as f:
+            header = b"".join(f.readline() for i in range(8))
+        self._set_header(header)
+        self.nrows = len(epw.rows)
+        self._columns = list(EPWData.COLUMNS)
+
+        nan = float("nan")
+        self._data = dict((c, array('d', [v if isinstance(v, float) else nan for v in epw.columns[c]]))
+                          for c in self._columns)
+
+        try:
+            self._write(header)
+        except EnvironmentError as e:
+            self.logger.warning("Could not write EPW cache '{}': {}".format(self.cache_path, e))
+            return
+        if self._open():
+            self._data = None
+
+    def _write(self, header):
+        head = self.MAGIC + struct.pack(self.LAYOUT, self._stamp[0], self._stamp[1], len(header),
+                                        self.nrows, len(self._columns)) + \
+            struct.pack("<{}i".format(len(self._columns)), *self._columns) + header
+        write_atomic(self.cache_path, [head + b"\0" * (_aligned(len(head)) - len(head))] +
+                     [self._column_bytes(c) for c in self._columns])
+
+    def _column_bytes(self, c):
+        # Little-endian float64 bytes of a column of self._data
+        values = array('d', self._data[c])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return _tobytes(values)
+
+    def _set_header(self, header):
+        text = header.decode("utf-8", "ignore") if isinstance(header, bytes) else header
+        self.header = [r for r in csv_reader(text.splitlines(), delimiter=",")]
+
+
+def _aligned(n):
+    # n rounded up to a multiple of 8 bytes
+    return (n + 7) // 8 * 8
+
+
+def _frombytes(values, data):
+    if hasattr(values, "frombytes"):
+        values.frombytes(data)
+    else:
+        values.fromstring(data)
+
+
+def _tobytes(values):
+    return values.tobytes() if hasattr(values, "tobytes") else values.tostring()
+
+
+# Directory of the EPW sidecar files. None writes them next to each EPW file.
+CACHE_DIR = None
+
+
+def sidecar_path(path):
+    """Path of the binary sidecar of an EPW file."""
+    if CACHE_DIR is None:
+        return path + EPWColumns.SUFFIX
+    digest = hashlib.md5(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, "{}.{}{}".format(os.path.basename(path), digest, EPWColumns.SUFFIX))
+
+
+# Loaded EPW files, keyed by (loader, absolute path), most recently used last
+_cache = OrderedDict()
+MAX_CACHED = 16
+
+
+def _load(loader, path):
+    if not os.path.exists(path):
+        raise Exception("File name: '{}' does not exist.".format(path))
+
+    key = (loader, os.path.abspath(path))
+    stat = os.stat(path)
+    stamp = (stat.st_mtime, stat.st_size)
+
+    entry = _cache.pop(key, None)
+    if entry is None or entry[0] != stamp:
+        if entry is not None:
+            _close(entry[1])
+        entry = (stamp, loader(path))
+    _cache[key] = entry
+
+    while len(_cache) > MAX_CACHED:
+        _close(_cache.popitem(last=False)[1][1])
+    return entry[1]
+
+
+def _close(loaded):
+    # Release the memory map of an EPWColumns leaving the cache
+    if hasattr(loaded, "close"):
+        loaded.close()
+
+
+def load_epw(path):
+    """
+    Parsed EPWData of an EPW file. Files are parsed once per process and reused
+    until their modification time or size changes. The MAX_CACHED most recently
+    used files are kept.
+    """
+    return _load(EPWData, path)
+
+
+def load_epw_columns(path):
+    """
+    EPWColumns of an EPW file, from its binary sidecar. Reused within the
+    process like load_epw.
+    """
+    return _load(EPWColumns, path)
+
+
+def clear_cache():
+    """Forget all loaded EPW files (sidecar files are kept)."""
+    for stamp, loaded in _cache.values():
+        _close(loaded)
+    _cache.clear()
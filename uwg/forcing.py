@@ -1,5 +1,12 @@
 from __future__ import division
 
+try:
+    range = xrange
+except NameError:
+    pass
+
+import math
+
 
 class Forcing (object):
     """
@@ -54,6 +61,60 @@ class Forcing (object):
             self.prec = [p/3.6e6 for p in weather.staRobs]
             self.wind = weather.staUmod
 
+    # Fields of the rows returned by StepRows
+    STEP_FIELDS = ("infra", "wind", "uDir", "hum", "pres", "temp", "rHum", "prec", "dif", "dir")
+    MODES = ("step", "linear")
+    MODE_MSG = "Forcing mode must be one of {}. Got '{}'."
+
+    def StepRows(self, nt, ph, windMin, mode="step"):
+        """
+        Weather forcing at the simulation time step, for time steps 1 to nt-1 of
+        the uwg time loop (row it-1 for time step it).
+
+        args:
+            nt: total number of simulation time steps
+            ph: simulation time step in hours (weather data is hourly)
+            windMin: minimum wind speed (m s-1)
+            mode: "step" holds each weather value over the hour that ends at its
+                time stamp (ceil of the elapsed hours), as the uwg always did.
+                "linear" interpolates linearly between consecutive weather values.
+
+        returns:
+            list of tuples ordered as STEP_FIELDS. In "step" mode rows of the same
+            hour are the same tuple.
+        """
+        if mode not in self.MODES:
+            raise Exception(self.MODE_MSG.format(self.MODES, mode))
+
+        columns = [getattr(self, field) for field in self.STEP_FIELDS]
+        nw = len(self.temp)
+
+        if mode == "step":
+            hourly = [None for x in range(nw)]
+            for i in range(nw):
+                row = [c[i] for c in columns]
+                row[1] = max(row[1], windMin)
+                hourly[i] = tuple(row)
+            return [hourly[int(math.ceil(it * ph))-1] for it in range(1, nt)]
+
+        rows = [None for x in range(nt - 1)]
+        for it in range(1, nt):
+            # Weather value i is at the end of hour i (elapsed hours i+1)
+            x = it * ph - 1.
+            i0 = int(math.floor(x))
+            w = x - i0
+            if i0 < 0 or w == 0. or i0 + 1 >= nw:
+                i = min(max(i0, 0), nw - 1)
+                row = [c[i] for c in columns]
+            else:
+                row = [c[i0] + w * (c[i0+1] - c[i0]) for c in columns]
+                # wind direction (deg) along the shortest arc
+                d = (columns[2][i0+1] - columns[2][i0] + 180.) % 360. - 180.
+                row[2] = (columns[2][i0] + w * d) % 360.
+            row[1] = max(row[1], windMin)
+            rows[it-1] = tuple(row)
+        return rows
+
     def __repr__(self):
         return "Forcing: deepT={a}, waterT={b}".format(
             a=int(self.deepTemp) if self.deepTemp else None,
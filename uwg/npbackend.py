@@ -0,0 +1,758 @@
+"""Array-backed simulation engine for the uwg.
+
+NumpyBackend advances the same model as uwg.simulate, but holds the element
+layer temperatures, building states and schedules in NumPy arrays so that every
+typology and every layer is advanced together in a time step. The rural
+vertical diffusion model and the urban boundary layer are single sequential
+columns and still run through RSMDef.VDM and UBLDef.UBLModel.
+
+uwg.simulate remains the reference implementation. Recorded outputs (canyon
+dry bulb, dew point, relative humidity and wind) match the reference to within
+NumpyBackend.TOLERANCE. The gain grows with the number of typologies: with a
+handful of typologies the array overhead is on par with the reference loop.
+"""
+from __future__ import division, print_function
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+import math
+import logging
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .psychrometrics import psychrometrics
+
+
+class NumpyBackend(object):
+    """Vectorized time loop for an initialized uwg object.
+
+    args:
+        model: uwg object on which init_BEM_obj, init_input_obj and
+            hvac_autosize have been run.
+
+    Element rows are ordered as [mass_0..mass_n, roof_0..roof_n,
+    wall_0..wall_n, rural, road] and padded to the deepest element.
+    """
+
+    # Max absolute difference of the recorded hourly outputs to uwg.simulate
+    # (K for temperatures, % for relative humidity, m s-1 for wind). Differences
+    # of ~1e-11 are typical, from the pre-inverted conduction matrices.
+    TOLERANCE = 1e-8
+
+    FIMP = 0.5      # implicit coefficient of the conduction scheme
+    FEXP = 0.5      # explicit coefficient of the conduction scheme
+
+    NUMPY_MISSING_MSG = "The numpy backend requires numpy. Use backend='python' instead."
+
+    def __init__(self, model):
+        if np is None:
+            raise ImportError(self.NUMPY_MISSING_MSG)
+
+        self.model = model
+        self.logger = logging.getLogger(__name__)
+        self.nbem = len(model.BEM)
+
+        self._init_elements()
+        self._init_buildings()
+        self._init_schedules()
+
+    # ------------------------------------------------------------------
+    # Initialization
+    # ------------------------------------------------------------------
+    def _init_elements(self):
+        m = self.model
+        n = self.nbem
+        # N.B. the canyon road is the element held by the UCM, not uwg.road
+        self.elements = [b.mass for b in m.BEM] + [b.roof for b in m.BEM] + \
+            [b.wall for b in m.BEM] + [m.rural, m.UCM.road]
+        self.i_mass = slice(0, n)
+        self.i_roof = slice(n, 2*n)
+        self.i_wall = slice(2*n, 3*n)
+        self.i_rural = 3*n
+        self.i_road = 3*n + 1
+
+        ne = len(self.elements)
+        self.nlayer = np.array([len(e.layerThickness) for e in self.elements])
+        L = int(self.nlayer.max())
+        self.last = self.nlayer - 1
+        self.rows = np.arange(ne)
+
+        self.temp = np.zeros((ne, L))
+        hcp = np.zeros((ne, L))
+        tcp = np.zeros((ne, L + 1))
+        for k, e in enumerate(self.elements):
+            num = self.nlayer[k]
+            self.temp[k, :num] = e.layerTemp
+            hcp[k, 0] = e.layerVolHeat[0] * e.layerThickness[0]
+            for j in range(1, num):
+                tcp[k, j] = 2. / (e.layerThickness[j-1] / e.layerThermalCond[j-1] +
+                    e.layerThickness[j] / e.layerThermalCond[j])
+                hcp[k, j] = e.layerVolHeat[j] * e.layerThickness[j]
+        self.hcp = hcp
+        self.tcp = tcp
+
+        # boundary condition: 1 = heat flux (mass, roof, wall), 2 = deep temperature
+        self.bc2 = np.zeros(ne, dtype=bool)
+        self.bc2[self.i_rural] = True
+        self.bc2[self.i_road] = True
+
+        # constant tridiagonal coefficients
+        dt = m.simTime.dt
+        fimp = self.FIMP
+        lower = np.zeros((ne, L))
+        diag = np.ones((ne, L))
+        upper = np.zeros((ne, L))
+        for k in range(ne):
+            num = self.nlayer[k]
+            diag[k, 0] = hcp[k, 0]/dt + fimp*tcp[k, 1]
+            upper[k, 0] = -fimp*tcp[k, 1]
+            for j in range(1, num-1):
+                lower[k, j] = fimp*(-tcp[k, j])
+                diag[k, j] = hcp[k, j]/dt + fimp*(tcp[k, j]+tcp[k, j+1])
+                upper[k, j] = fimp*(-tcp[k, j+1])
+            if self.bc2[k]:
+                lower[k, num-1] = 0.
+                diag[k, num-1] = 1.
+            else:
+                lower[k, num-1] = fimp*(-tcp[k, num-1])
+                diag[k, num-1] = hcp[k, num-1]/dt + fimp*tcp[k, num-1]
+            upper[k, num-1] = 0.
+        self.lower = lower
+        self.diag = diag
+        self.upper = upper
+
+        # The conduction matrices only depend on the layers, dt and the boundary
+        # condition, so they are inverted once and each step is a product.
+        A = np.zeros((ne, L, L))
+        idx = np.arange(L)
+        A[:, idx, idx] = diag
+        A[:, idx[1:], idx[:-1]] = lower[:, 1:]
+        A[:, idx[:-1], idx[1:]] = upper[:, :-1]
+        self.invA = np.linalg.inv(A)
+        self.hcpdt = hcp/dt
+        self.pad = idx[None, :] > self.last[:, None]
+
+        # contiguous element groups solved together
+        self.s_surf = slice(n, 3*n + 1)     # roof, wall & rural surface fluxes
+        self.s_cond = slice(0, 3*n + 1)     # mass, roof, wall & rural conduction
+        self.s_road = slice(3*n + 1, 3*n + 2)
+
+        self.albedo = np.array([e.albedo for e in self.elements], dtype=float)
+        self.emissivity = np.array([e.emissivity for e in self.elements], dtype=float)
+        self.vegCoverage = np.array([e.vegCoverage for e in self.elements], dtype=float)
+        self.horizontal = np.array([bool(e.horizontal) for e in self.elements])
+        self.waterStorage = np.array([e.waterStorage for e in self.elements], dtype=float)
+
+        # surface state written back to the Element objects at the end of the run
+        self.solRec = np.zeros(ne)
+        self.infra = np.array([e.infra for e in self.elements], dtype=float)
+        self.sens = np.array([e.sens for e in self.elements], dtype=float)
+        self.lat = np.zeros(ne)
+        self.solAbs = np.zeros(ne)
+        self.aeroCond = np.zeros(ne)
+        self.flux = np.zeros(ne)
+
+    def _init_buildings(self):
+        bld = [b.building for b in self.model.BEM]
+        self.frac = np.array([b.frac for b in self.model.BEM], dtype=float)
+        self.fl_area = np.array([b.fl_area for b in self.model.BEM], dtype=float)
+        self.floorHeight = np.array([b.floorHeight for b in bld], dtype=float)
+        self.glazingRatio = np.array([b.glazingRatio for b in bld], dtype=float)
+        self.uValue = np.array([b.uValue for b in bld], dtype=float)
+        self.shgc = np.array([b.shgc for b in bld], dtype=float)
+        self.infil = np.array([b.infil for b in bld], dtype=float)
+        self.coolCap = np.array([b.coolCap for b in bld], dtype=float)
+        self.heatCap = np.array([b.heatCap for b in bld], dtype=float)
+        self.heatEff = np.array([b.heatEff for b in bld], dtype=float)
+        self.copAdj = np.array([b.copAdj for b in bld], dtype=float)
+        self.condAir = np.array([b.condType == 'AIR' for b in bld])
+        self.condWat = np.array([b.condType == 'WAT' for b in bld])
+        self.indoorTemp = np.array([b.indoorTemp for b in bld], dtype=float)
+        self.indoorHum = np.array([b.indoorHum for b in bld], dtype=float)
+        self.latWaste = np.array([getattr(b, 'latWaste', 0.) for b in bld], dtype=float)
+
+    def _init_schedules(self):
+        # (typology, day type, hour, quantity) array of the uwg load tables,
+        # quantities ordered as SchDef.LOAD_FIELDS
+        self.schTable = np.array(self.model.SchTable, dtype=float)
+        self.vent = self.schTable[:, 0, 0, 8]
+
+    # ------------------------------------------------------------------
+    # Time loop
+    # ------------------------------------------------------------------
+    def simulate(self):
+        """Run the time loop and fill the model's output recorder."""
+        m = self.model
+        simTime = m.simTime
+        forc = m.forc
+        forcIP = m.forcIP
+        UCM = m.UCM
+
+        m.N = int(simTime.days * 24)
+        n = 0
+        m.ph = simTime.dt/3600.
+
+        m.init_recorder()
+
+        print('\nSimulating new temperature and humidity values for {} days from {}/{}.\n'.format(
+            int(m.nDay), int(m.Month), int(m.Day)))
+        self.logger.info("Start simulation (numpy backend)")
+
+        deepTemp_avg = sum(forcIP.temp)/float(len(forcIP.temp))
+        forcRows = m.forcRows = m.forcing_rows()
+        m.solar = m.solar_calcs([])
+
+        for it in range(1, simTime.nt, 1):
+            if m.nSoil < 3:
+                forc.deepTemp = deepTemp_avg
+                forc.waterTemp = deepTemp_avg - 10.
+            else:
+                forc.deepTemp = m.Tsoil[m.soilindex1][simTime.month-1]
+                forc.waterTemp = m.Tsoil[2][simTime.month-1]
+
+            simTime.SetStep(it)
+
+            (forc.infra, forc.wind, forc.uDir, forc.hum, forc.pres, forc.temp, forc.rHum,
+             forc.prec, forc.dif, forc.dir) = forcRows[it-1]
+            UCM.canHum = forc.hum
+
+            self.solar_step()
+
+            m.dayType = simTime.dayType
+
+            UCM.sensAnthrop = m.sensAnth * (m.SchTraffic[m.dayType-1][simTime.hourDay])
+            self.schedule_step(m.dayType-1, simTime.hourDay)
+
+            self.step()
+
+            if simTime.IsPrintStep() and n < m.N:
+                _Tdb, _w, UCM.canRHum, _h, UCM.Tdp, _v = psychrometrics(
+                    UCM.canTemp, UCM.canHum, forc.pres)
+                m.recorder.record(forc, UCM, m.UBL, m.RSM)
+                n += 1
+
+        self.write_back()
+
+    def solar_step(self):
+        """Scalar canyon solar through SolarCalcs, broadcast to all typologies."""
+        m = self.model
+        m.solar.solarcalcs()
+        if m.forc.dir + m.forc.dif > 0.:
+            roof = m.solar.horSol + m.solar.dif
+            wall = m.solar.bldSol + (1 - 2*m.UCM.wallConf) * m.solar.mw + \
+                m.UCM.wallConf * m.solar.mr
+        else:
+            roof = 0.
+            wall = 0.
+        self.solRec[self.i_roof] = roof
+        self.solRec[self.i_wall] = wall
+        self.solRec[self.i_rural] = m.rural.solRec
+        self.solRec[self.i_road] = m.UCM.road.solRec
+
+    def schedule_step(self, d, h):
+        """Row lookup in the precompiled (typology, day type, hour) schedules."""
+        row = self.schTable[:, d, h]
+        self.coolSetpoint = row[:, 0]
+        self.heatSetpoint = row[:, 1]
+        self.Elec = row[:, 2]
+        self.Light = row[:, 3]
+        self.Nocc = row[:, 4]
+        self.Qocc = row[:, 5]
+        self.SWH = row[:, 6]
+        self.Gas = row[:, 7]
+        self.intHeatDay = row[:, 9]
+        self.intHeatFRad = row[:, 10]
+        self.intHeatFLat = row[:, 11]
+
+        self.T_wallex = self.temp[self.i_wall, 0].copy()
+        self.T_wallin = self.temp[self.i_wall][np.arange(self.nbem), self.last[self.i_wall]]
+        self.T_roofex = self.temp[self.i_roof, 0].copy()
+        self.T_roofin = self.temp[self.i_roof][np.arange(self.nbem), self.last[self.i_roof]]
+
+    def step(self):
+        m = self.model
+        forc = m.forc
+        UCM = m.UCM
+        parameter = m.geoParam
+        simTime = m.simTime
+        RSM = m.RSM
+        n = self.nbem
+        T0 = self.temp[:, 0]
+
+        # Rural surface heat flux inputs
+        self.infra[self.i_rural] = forc.infra - self.emissivity[self.i_rural] * m.SIGMA * \
+            T0[self.i_rural]**4.
+
+        # Building energy model for every typology (uses current layer temperatures)
+        T_can = UCM.canTemp
+        UCM.Q_roof = 0.
+        self.bem_calc()
+        sigma = 5.67e-8
+
+        # Roof & wall infrared
+        self.infra[self.i_roof] = self.emissivity[self.i_roof] * \
+            (forc.infra - sigma * T0[self.i_roof]**4.)
+        e_wall = self.emissivity[self.i_wall]
+        T_wall = T0[self.i_wall]
+        e_road = UCM.road.emissivity
+        self.infra[self.i_wall] = e_wall * UCM.wallConf * (forc.infra - sigma*T_wall**4.) + \
+            (1.-UCM.roadShad) * e_wall * e_road * sigma * UCM.wallConf * (UCM.roadTemp**4.-T_wall**4.)
+
+        # Surface flux for rural, roof and wall; mass is driven by the indoor flux only
+        ne = len(self.elements)
+        tempRef = np.empty(ne)
+        humRef = np.empty(ne)
+        windRef = np.empty(ne)
+        intFlux = np.zeros(ne)
+        tempRef[:] = T_can
+        humRef[:] = UCM.canHum
+        windRef[:] = UCM.canWind
+        windRef[self.i_roof] = max(forc.wind, UCM.canWind)
+        tempRef[self.i_rural] = forc.temp
+        humRef[self.i_rural] = forc.hum
+        windRef[self.i_rural] = forc.wind
+        intFlux[self.i_mass] = self.fluxMass
+        intFlux[self.i_roof] = self.fluxRoof
+        intFlux[self.i_wall] = self.fluxWall
+
+        self.surf_flux(self.s_surf, tempRef, humRef, windRef)
+        self.flux[self.i_mass] = self.fluxMass
+        self.conduction(self.s_cond, intFlux, forc.deepTemp)
+
+        # Vertical diffusion model at the rural site. The rural column is a single
+        # sequential profile, so it is left to the scalar RSMDef.VDM.
+        m.rural.sens = float(self.sens[self.i_rural])
+        RSM.VDM(forc, m.rural, parameter, simTime)
+
+        # Average wall & roof temperature, road infrared & conduction
+        UCM.wallTemp = float(np.sum(self.frac * self.temp[self.i_wall, 0]))
+        UCM.roofTemp = float(np.sum(self.frac * self.temp[self.i_roof, 0]))
+        e_wall_last = self.emissivity[self.i_wall][-1] if n > 0 else e_road
+        T_road = UCM.roadTemp
+        self.infra[self.i_road] = e_road * UCM.roadConf * (1.-UCM.roadShad) * \
+            (forc.infra - sigma*T_road**4.) + (1.-UCM.roadShad) * e_wall_last * e_road * \
+            sigma * (1. - UCM.roadConf) * (UCM.wallTemp**4.-T_road**4.)
+        self.surf_flux(self.s_road, tempRef, humRef, windRef)
+        self.conduction(self.s_road, intFlux, forc.deepTemp)
+        UCM.roadTemp = float(self.temp[self.i_road, 0])
+        if UCM.latHeat != None:
+            UCM.latHeat = UCM.latHeat + UCM.latAnthrop + UCM.treeLatHeat + \
+                self.lat[self.i_road]*(1.-UCM.bldDensity)
+
+        self.urb_flux()
+        self.uc_model()
+        m.UBL.UBLModel(UCM, RSM, m.rural, forc, parameter, simTime)
+
+    def surf_flux(self, sl, tempRef, humRef, windRef):
+        """Net surface heat flux (Element.SurfFlux) for a contiguous group of elements."""
+        m = self.model
+        forc = m.forc
+        parameter = m.geoParam
+        simTime = m.simTime
+
+        T0 = self.temp[sl, 0]
+        tRef = tempRef[sl]
+        hRef = humRef[sl]
+        aeroCond = 5.8 + 3.7 * windRef[sl]
+        solRec = self.solRec[sl]
+        albedo = self.albedo[sl]
+        veg = self.vegCoverage[sl]
+        horizontal = self.horizontal[sl]
+
+        # Evaporation from the water film (waterStorage is 0 for all elements in the uwg)
+        ws = self.waterStorage[sl]
+        wet = horizontal & (ws > 0.) & (np.abs(ws) >= 1e-10)
+        eg = np.zeros(len(T0))
+        if wet.any():
+            dens = forc.pres/(1000*0.287042*tRef*(1.+1.607858*hRef))
+            gamw = (parameter.cl - parameter.cpv) / parameter.rv
+            betaw = (parameter.lvtt/parameter.rv) + (gamw * parameter.tt)
+            alpw = math.log(parameter.estt) + (betaw / parameter.tt) + (gamw * math.log(parameter.tt))
+            work2 = parameter.r/parameter.rv
+            work1 = np.exp(alpw - betaw/T0 - gamw*np.log(T0))/forc.pres
+            qtsat = work2*work1 / (1. + (work2-1.) * work1)
+            eg_wet = aeroCond*parameter.colburn*dens*(qtsat-hRef)/parameter.waterDens/parameter.cp
+            eg = np.where(wet, eg_wet, 0.)
+            ws = np.where(wet, np.maximum(np.minimum(ws + simTime.dt*(forc.prec-eg), parameter.wgmax), 0.), ws)
+            self.waterStorage[sl] = ws
+        soilLat = eg*parameter.waterDens*parameter.lv
+
+        if simTime.month < parameter.vegStart and simTime.month > parameter.vegEnd:
+            solAbs_h = (1.-albedo)*solRec
+            vegLat = 0.
+            vegSens = 0.
+        else:
+            solAbs_h = ((1.-veg)*(1.-albedo)+veg*(1.-parameter.vegAlbedo))*solRec
+            vegLat = veg*parameter.grassFLat*(1.-parameter.vegAlbedo)*solRec
+            vegSens = veg*(1.-parameter.grassFLat)*(1.-parameter.vegAlbedo)*solRec
+
+        solAbs = np.where(horizontal, solAbs_h, (1.-albedo)*solRec)
+        lat = np.where(horizontal, soilLat + vegLat, 0.)
+        sens = np.where(horizontal, vegSens + aeroCond*(T0-tRef), aeroCond*(T0-tRef))
+
+        self.aeroCond[sl] = aeroCond
+        self.solAbs[sl] = solAbs
+        self.lat[sl] = lat
+        self.sens[sl] = sens
+        self.flux[sl] = -sens + solAbs + self.infra[sl] - lat
+
+    def conduction(self, sl, intFlux, deepTemp):
+        """Batched Element.Conduction for a contiguous group of elements."""
+        t = self.temp[sl]
+        hcpdt = self.hcpdt[sl]
+        tcp = self.tcp[sl]
+        last = self.last[sl]
+        rows = np.arange(len(last))
+        fexp = self.FEXP
+        L = t.shape[1]
+
+        zy = np.empty(t.shape)
+        zy[:, 0] = hcpdt[:, 0]*t[:, 0] - fexp*tcp[:, 1]*(t[:, 0]-t[:, 1]) + self.flux[sl]
+        if L > 2:
+            zy[:, 1:L-1] = hcpdt[:, 1:L-1]*t[:, 1:L-1] + fexp * (
+                tcp[:, 1:L-1]*t[:, 0:L-2] - tcp[:, 1:L-1]*t[:, 1:L-1] -
+                tcp[:, 2:L]*t[:, 1:L-1] + tcp[:, 2:L]*t[:, 2:L])
+        flx2_row = hcpdt[rows, last]*t[rows, last] + fexp*tcp[rows, last] * \
+            (t[rows, last-1]-t[rows, last]) + intFlux[sl]
+        zy[rows, last] = np.where(self.bc2[sl], deepTemp, flx2_row)
+        # padding rows past the last layer are identity rows
+        zy[self.pad[sl]] = 0.
+
+        self.temp[sl] = np.matmul(self.invA[sl], zy[:, :, None])[:, :, 0]
+
+    def bem_calc(self):
+        """Building.BEMCalc for every typology at once."""
+        m = self.model
+        UCM = m.UCM
+        forc = m.forc
+        parameter = m.geoParam
+        simTime = m.simTime
+        cp = parameter.cp
+        lv = parameter.lv
+
+        nFloor = np.maximum(UCM.bldHeight/self.floorHeight, 1)
+        self.nFloor = nFloor
+        T_indoor = self.indoorTemp
+        dens = forc.pres/(1000*0.287042*T_indoor*(1.+1.607858*self.indoorHum))
+        evapEff = 1.
+        volVent = self.vent * nFloor
+        volInfil = self.infil * UCM.bldHeight / 3600.
+        rows = np.arange(self.nbem)
+        T_wall = self.temp[self.i_wall][rows, self.last[self.i_wall]]
+        volSWH = self.SWH * nFloor/3600.
+        T_ceil = self.temp[self.i_roof][rows, self.last[self.i_roof]]
+        T_mass = self.temp[self.i_mass, 0]
+        T_can = UCM.canTemp
+
+        facArea = UCM.verToHor/UCM.bldDensity
+        wallArea = facArea*(1.-self.glazingRatio)
+        winArea = facArea*self.glazingRatio
+        massArea = 2*nFloor-1
+
+        # Setpoints are equal for day & night in the uwg schedules
+        T_cool = self.coolSetpoint
+        T_heat = self.heatSetpoint
+        intHeat = self.intHeatDay * nFloor
+        self.intHeat = intHeat
+
+        zac_in_wall = 3.076
+        zac_in_mass = 3.076
+
+        converge_hi = 100.0 + 273.15
+        converge_lo = -50.0 + 273.15
+        ok = (converge_lo <= T_indoor) & (T_indoor <= converge_hi) & \
+            (converge_lo <= T_ceil) & (T_ceil <= converge_hi)
+        if not ok.all():
+            j = int(np.argmin(ok))
+            raise Exception("{}.\n Error at {}/{} {}s for bld {}.".format(
+                m.BEM[j].building.TEMPERATURE_COEFFICIENT_CONFLICT_MSG, simTime.month,
+                simTime.day, simTime.secDay, m.BEM[j]))
+
+        zac_in_ceil = np.where(T_ceil > T_indoor, 0.948, 4.040)
+
+        winTrans = self.solRec[self.i_wall] * self.shgc * winArea
+
+        QLinfil = volInfil * dens * lv * (UCM.canHum - self.indoorHum)
+        QLvent = volVent * dens * lv * (UCM.canHum - self.indoorHum)
+        QLintload = intHeat * self.intHeatFLat
+
+        def _load(T_set):
+            return (wallArea*zac_in_wall*(T_wall - T_set) +
+                massArea*zac_in_mass*(T_mass-T_set) +
+                winArea*self.uValue*(T_can-T_set) +
+                zac_in_ceil*(T_ceil-T_set) +
+                intHeat +
+                volInfil*dens*cp*(T_can-T_set) +
+                volVent*dens*cp*(T_can-T_set) +
+                winTrans)
+
+        sensCoolDemand = np.maximum(_load(T_cool), 0.)
+        sensHeatDemand = np.maximum(-_load(T_heat), 0.)
+
+        zeros = np.zeros(self.nbem)
+        Qheat = zeros.copy()
+        coolConsump = zeros.copy()
+        heatConsump = zeros.copy()
+        sensWaste = zeros.copy()
+        dehumDemand = zeros.copy()
+        Qhvac = zeros.copy()
+        Qdehum = zeros.copy()
+        latWaste = self.latWaste
+
+        cool = (sensCoolDemand > 0.) & (UCM.canTemp > 288.)
+        heat = ~cool & (sensHeatDemand > 0.) & (UCM.canTemp < 288.)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if cool.any():
+                cap = self.coolCap * nFloor
+                VolCool = sensCoolDemand / (dens*cp*(T_indoor-283.15))
+                dehum = np.maximum(VolCool * dens * (self.indoorHum - 0.9*0.0078)*lv, 0.)
+                over = (dehum + sensCoolDemand) > cap
+                tot = dehum + sensCoolDemand
+                VolCool_o = VolCool / tot * cap
+                scd_o = sensCoolDemand * cap / tot
+                dehum_o = dehum * cap / (dehum + scd_o)
+                VolCool = np.where(over, VolCool_o, VolCool)
+                scd = np.where(over, scd_o, sensCoolDemand)
+                dehum = np.where(over, dehum_o, dehum)
+                qhvac = np.where(over, cap, tot)
+                qdehum = VolCool * dens * lv * (self.indoorHum - 0.9*0.0078)
+                cc = np.maximum(scd+dehum, 0.0)/self.copAdj
+                sw = np.where(self.condAir, np.maximum(scd+dehum, 0)+cc,
+                    np.where(self.condWat, np.maximum(scd+dehum, 0)+cc*(1.-evapEff), 0.))
+                lw = np.where(self.condAir, 0.0,
+                    np.where(self.condWat, np.maximum(scd+dehum, 0)+cc*evapEff, latWaste))
+
+                sensCoolDemand = np.where(cool, scd, sensCoolDemand)
+                dehumDemand = np.where(cool, dehum, dehumDemand)
+                Qhvac = np.where(cool, qhvac, Qhvac)
+                Qdehum = np.where(cool, qdehum, Qdehum)
+                coolConsump = np.where(cool, cc, coolConsump)
+                sensWaste = np.where(cool, sw, sensWaste)
+                latWaste = np.where(cool, lw, latWaste)
+                sensHeatDemand = np.where(cool, 0., sensHeatDemand)
+
+            if heat.any():
+                qh = np.minimum(sensHeatDemand, self.heatCap*nFloor)
+                hc = qh / self.heatEff
+                Qheat = np.where(heat, qh, Qheat)
+                sensWaste = np.where(heat, hc - qh, sensWaste)
+                heatConsump = np.where(heat, hc/nFloor, heatConsump)
+                sensHeatDemand = np.where(heat, qh/nFloor, sensHeatDemand)
+                Qdehum = np.where(heat, 0.0, Qdehum)
+                sensCoolDemand = np.where(heat, 0.0, sensCoolDemand)
+
+        Q = intHeat + winTrans + Qheat - sensCoolDemand
+        H1 = (T_wall*wallArea*zac_in_wall +
+            T_mass*massArea*zac_in_mass +
+            T_ceil*zac_in_ceil +
+            T_can*winArea*self.uValue +
+            T_can*volInfil * dens * cp +
+            T_can*volVent * dens * cp)
+        H2 = (wallArea*zac_in_wall +
+            massArea*zac_in_mass +
+            zac_in_ceil +
+            winArea*self.uValue +
+            volInfil * dens * cp +
+            volVent * dens * cp)
+
+        self.indoorTemp = (H1 + Q)/H2
+        self.indoorHum = self.indoorHum + (simTime.dt/(dens * lv * UCM.bldHeight)) * \
+            (QLintload + QLinfil + QLvent - Qdehum)
+
+        # Indoor relative humidity (psychrometrics)
+        P = forc.pres/1000.
+        Tdb = self.indoorTemp - 273.15
+        Pw = (self.indoorHum*P)/(0.621945 + self.indoorHum)
+        T = Tdb + 273.15
+        Pws = np.exp(-1*(5.8002206e3) / T+1.3914993 + (4.8640239e-2)*T*(-1.) +
+            (4.1764768e-5)*T**2 - (1.4452093e-8)*T**3 + 6.5459673*np.log(T))/1000.
+        self.indoorRhum = Pw/Pws*100.0
+
+        self.fluxWall = zac_in_wall * (T_indoor - T_wall)
+        self.fluxRoof = zac_in_ceil * (T_indoor - T_ceil)
+        self.fluxMass = zac_in_mass * (T_indoor - T_mass) + intHeat * self.intHeatFRad/massArea
+
+        self.fluxSolar = winTrans/nFloor
+        self.fluxWindow = winArea * self.uValue * (T_can - T_indoor)/nFloor
+        self.fluxInterior = intHeat * self.intHeatFRad * (1.-self.intHeatFLat)/nFloor
+        self.fluxInfil = volInfil * dens * cp * (T_can - T_indoor)/nFloor
+        self.fluxVent = volVent * dens * cp * (T_can - T_indoor)/nFloor
+        self.coolConsump = coolConsump/nFloor
+        self.sensCoolDemand = sensCoolDemand/nFloor
+        self.sensHeatDemand = sensHeatDemand
+        self.heatConsump = heatConsump
+        self.dehumDemand = dehumDemand
+        self.Qhvac = Qhvac
+        self.Qheat = Qheat
+        self.latWaste = latWaste
+
+        self.ElecTotal = self.coolConsump + self.Elec + self.Light
+
+        CpH20 = 4200.
+        T_hot = 49 + 273.15
+        self.sensWaste = sensWaste + (1/self.heatEff-1.)*(volSWH*CpH20*(T_hot - forc.waterTemp)) + \
+            self.Gas*(1-self.heatEff)*nFloor
+        self.GasTotal = self.Gas + volSWH*CpH20*(T_hot - forc.waterTemp)/nFloor/self.heatEff + heatConsump
+
+    def urb_flux(self):
+        """Scalar remainder of urbflux: advection, friction velocity and wind profile."""
+        m = self.model
+        UCM = m.UCM
+        UBL = m.UBL
+        RSM = m.RSM
+        forc = m.forc
+        parameter = m.geoParam
+        Cp = parameter.cp
+        T_can = UCM.canTemp
+        nzfor = RSM.nzfor
+        dz = RSM.dz
+
+        self.ElecTotalBEM = self.ElecTotal * self.fl_area
+
+        # fsum keeps the small advection difference exact, as the Kahan sums in urbflux
+        hfor = RSM.z[nzfor-1] + dz[nzfor-1]/2.
+        forDens = math.fsum(RSM.densityProfC[iz]*dz[iz]/hfor for iz in range(nzfor))
+        intAdv1 = math.fsum(RSM.windProf[iz]*RSM.tempProf[iz]*dz[iz] for iz in range(nzfor))
+        intAdv2 = math.fsum(RSM.windProf[iz]*dz[iz] for iz in range(nzfor))
+        UBL.advHeat = UBL.paralLength*Cp*forDens*(intAdv1-(UBL.ublTemp*intAdv2))/UBL.urbArea
+
+        zrUrb = 2*UCM.bldHeight
+        zref = RSM.z[RSM.nzref-1]
+        windUrb = forc.wind*math.log(zref/RSM.z0r)/math.log(parameter.windHeight/RSM.z0r) * \
+            math.log(zrUrb/UCM.z0u)/math.log(zref/UCM.z0u)
+        dens = forc.pres/(1000*0.287042*T_can*(1.+1.607858*UCM.canHum))
+        UCM.ustar = parameter.vk*windUrb/math.log((zrUrb-UCM.l_disp)/UCM.z0u)
+        wstar = (parameter.g*max(UCM.sensHeat, 0.0)*zref/dens/Cp/T_can)**(1/3.)
+        UCM.ustarMod = max(UCM.ustar, wstar)
+        UCM.uExch = parameter.exCoeff*UCM.ustarMod
+        UCM.canWind = UCM.ustarMod*(UCM.verToHor/8.)**(-1/2.)
+        UCM.turbU = 2.4*UCM.ustarMod
+        UCM.turbV = 1.9*UCM.ustarMod
+        UCM.turbW = 1.3*UCM.ustarMod
+        if len(UCM.windProf) != RSM.nzref:
+            UCM.windProf = [0. for x in range(RSM.nzref)]
+        for iz in range(RSM.nzref):
+            UCM.windProf[iz] = UCM.ustar/parameter.vk * \
+                math.log((RSM.z[iz]+UCM.bldHeight-UCM.l_disp)/UCM.z0u)
+
+    def uc_model(self):
+        """UCMDef.UCModel with the building sums vectorized across typologies."""
+        m = self.model
+        UCM = m.UCM
+        forc = m.forc
+        parameter = m.geoParam
+        T_ubl = m.UBL.ublTemp
+        dens = forc.pres/(1000*0.287042*UCM.canTemp*(1.+1.607858*UCM.canHum))
+        dens_ubl = forc.pres/(1000*0.287042*T_ubl*(1.+1.607858*forc.hum))
+        Cp_air = parameter.cp
+        frac = self.frac
+
+        T_road = self.temp[self.i_road, 0]
+        h_conv = self.aeroCond[self.i_road]
+        H1 = T_road*h_conv*UCM.roadArea
+        H2 = h_conv*UCM.roadArea
+        H1 = H1 + T_ubl*UCM.roadArea*UCM.uExch*Cp_air*dens_ubl
+        H2 = H2 + UCM.roadArea*UCM.uExch*Cp_air*dens_ubl
+        Q = (UCM.roofArea+UCM.roadArea)*(UCM.sensAnthrop + UCM.treeSensHeat*UCM.treeCoverage)
+
+        T_indoor = self.indoorTemp
+        T_wall = self.temp[self.i_wall, 0]
+        T_roof = self.temp[self.i_roof, 0]
+        A_wall = (1.-self.glazingRatio)*UCM.facArea
+        A_window = self.glazingRatio*UCM.facArea
+        U_window = self.uValue
+        ventH = UCM.roofArea*self.vent*self.nFloor*Cp_air*dens
+        infilH = UCM.roofArea*self.infil*UCM.bldHeight/3600.0*Cp_air*dens
+        wallSol = self.solRec[self.i_wall]
+        roofSens = self.sens[self.i_roof]
+
+        H1 = H1 + float(np.sum(frac*(T_indoor*A_window*U_window + T_wall*A_wall*h_conv +
+            T_indoor*ventH + T_indoor*infilH)))
+        H2 = H2 + float(np.sum(frac*(A_window*U_window + A_wall*h_conv + ventH + infilH)))
+        Q = Q + float(np.sum(frac*(UCM.roofArea*self.sensWaste*UCM.h_mix +
+            A_window*wallSol*(1.0-self.shgc))))
+
+        UCM.wallTemp = float(np.sum(frac*T_wall))
+        UCM.roofTemp = float(np.sum(frac*T_roof))
+        Q_ubl = float(np.sum(frac*UCM.bldDensity*(roofSens + self.sensWaste*(1.-UCM.h_mix))))
+
+        UCM.canTemp = (H1 + Q)/H2
+
+        T_can = UCM.canTemp
+        UCM.Q_road = h_conv*(T_road-UCM.canTemp)*(1.-UCM.bldDensity)
+        UCM.Q_ubl = Q_ubl + UCM.uExch*Cp_air*dens*(UCM.canTemp-T_ubl)*(1.-UCM.bldDensity)
+        UCM.Q_wall = h_conv*(UCM.wallTemp-UCM.canTemp)*(UCM.verToHor)
+        UCM.Q_traffic = UCM.sensAnthrop
+
+        V_vent = self.vent*self.nFloor
+        V_infil = self.infil*UCM.bldHeight/3600.0
+        R_glazing = self.glazingRatio
+        UCM.Q_window = float(np.sum(frac*UCM.verToHor*R_glazing*U_window*(T_indoor-T_can) +
+            frac*UCM.verToHor*R_glazing*wallSol*(1.-self.shgc)))
+        UCM.Q_vent = float(np.sum(frac*UCM.bldDensity*Cp_air*dens*(V_vent + V_infil)*(T_indoor-T_can)))
+        UCM.Q_hvac = float(np.sum(frac*UCM.bldDensity*self.sensWaste*UCM.h_mix))
+        UCM.Q_roof = UCM.Q_roof + float(np.sum(frac*UCM.bldDensity*roofSens))
+        UCM.ElecTotal = float(np.sum(self.fl_area*self.ElecTotal/1.e6))
+        UCM.GasTotal = float(np.sum(self.fl_area*self.GasTotal/1.e6))
+
+        UCM.sensHeat = UCM.Q_wall + UCM.Q_road + UCM.Q_vent + UCM.Q_window + UCM.Q_hvac + \
+            UCM.Q_traffic + UCM.treeSensHeat + UCM.Q_roof
+
+        if UCM.canTemp > 350. or UCM.canTemp < 250:
+            raise Exception(UCM.CANYON_TEMP_BOUND_ERROR)
+
+    # ------------------------------------------------------------------
+    # Write back
+    # ------------------------------------------------------------------
+    def write_back(self):
+        """Copy the array state back onto the Element, Building and RSM objects."""
+        m = self.model
+        for k, e in enumerate(self.elements):
+            num = self.nlayer[k]
+            e.layerTemp = self.temp[k, :num].tolist()
+            if k < self.nbem:
+                # mass is only conducted, its surface state is never set
+                continue
+            e.T_ext = e.layerTemp[0]
+            e.T_int = e.layerTemp[-1]
+            e.solRec = float(self.solRec[k])
+            e.infra = float(self.infra[k])
+            e.sens = float(self.sens[k])
+            e.lat = float(self.lat[k])
+            e.solAbs = float(self.solAbs[k])
+            e.aeroCond = float(self.aeroCond[k])
+            e.flux = float(self.flux[k])
+            e.waterStorage = float(self.waterStorage[k])
+        m.UCM.roadTemp = float(m.UCM.roadTemp)
+
+        bld_attrs = ('indoorTemp', 'indoorHum', 'indoorRhum', 'nFloor', 'intHeat', 'intHeatFRad',
+            'intHeatFLat', 'fluxWall', 'fluxRoof', 'fluxMass', 'fluxSolar', 'fluxWindow',
+            'fluxInterior', 'fluxInfil', 'fluxVent', 'coolConsump', 'sensCoolDemand',
+            'sensHeatDemand', 'heatConsump', 'dehumDemand', 'Qhvac', 'Qheat', 'latWaste',
+            'sensWaste', 'ElecTotal', 'GasTotal')
+        for j, bem in enumerate(m.BEM):
+            b = bem.building
+            for attr in bld_attrs:
+                setattr(b, attr, float(getattr(self, attr)[j]))
+            b.intHeatDay = b.intHeatNight = float(self.intHeatDay[j])
+            b.coolSetpointDay = b.coolSetpointNight = float(self.coolSetpoint[j])
+            b.heatSetpointDay = b.heatSetpointNight = float(self.heatSetpoint[j])
+            b.vent = float(self.vent[j])
+            bem.Elec = float(self.Elec[j])
+            bem.Light = float(self.Light[j])
+            bem.Nocc = float(self.Nocc[j])
+            bem.Qocc = float(self.Qocc[j])
+            bem.SWH = float(self.SWH[j])
+            bem.Gas = float(self.Gas[j])
+            bem.ElecTotal = float(self.ElecTotalBEM[j])
+            bem.T_wallex = float(self.T_wallex[j])
+            bem.T_wallin = float(self.T_wallin[j])
+            bem.T_roofex = float(self.T_roofex[j])
+            bem.T_roofin = float(self.T_roofin[j])
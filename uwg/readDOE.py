@@ -5,20 +5,29 @@ try:
 except NameError:
     pass
 
-import sys
 import os
+import sys
+import time
+import hashlib
+import argparse
 
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
 
+try:
+    import multiprocessing
+except ImportError:
+    multiprocessing = None
+
 from .building import Building
 from .material import Material
 from .element import Element
 from .BEMDef import BEMDef
 from .schdef import SchDef
 from .utilities import read_csv, str2fl
+from .refstore import DOEStore, read_pickle, write_store, dumps, set_loggers
 
 # For debugging only
 #import pprint
@@ -28,6 +37,10 @@ from .utilities import read_csv, str2fl
 
 DIR_CURR = os.path.abspath(os.path.dirname(__file__))
 DIR_DOE_PATH = os.path.join(DIR_CURR,"..","resources","DOERefBuildings")
+PKL_FILE_PATH = os.path.join(DIR_CURR,"refdata","readDOE.pkl")
+
+# csv files of each DOE building type: BLD<n>/BLD<n>_<sheet>.csv
+DOE_SHEETS = ("BuildingSummary", "ZoneSummary", "LocationSummary", "Schedules")
 
 # Define standards: 16 buiding types, 3 built eras, 16 climate zones
 
@@ -113,274 +126,401 @@ def readDOE(serialize_output=True):
     """
 
     #Nested, nested lists of Building, SchDef, BEMDef objects
-    refDOE   = [[[None]*16 for k_ in range(3)] for j_ in range(16)]                #refDOE(16,3,16) = Building
-    Schedule = [[[None]*16 for k_ in range(3)] for j_ in range(16)]                #Schedule (16,3,16) = SchDef
-    refBEM   = [[[None]*16 for k_ in range(3)] for j_ in range(16)]                #refBEM (16,3,16) = BEMDef
+    refDOE   = []                #refDOE(16,3,16) = Building
+    Schedule = []                #Schedule (16,3,16) = SchDef
+    refBEM   = []                #refBEM (16,3,16) = BEMDef
 
     #Purpose: Loop through every DOE reference csv and extract building data
     #Nested loop = 16 types, 3 era, 16 zones = time complexity O(n*m*k) = 768
     for i in range(16):
+        refDOE_i, refBEM_i, Schedule_i = read_type(i)
+        refDOE.append(refDOE_i)
+        refBEM.append(refBEM_i)
+        Schedule.append(Schedule_i)
 
-        #i = 16 types of buildings
-        #print "\tType: {} @i={}".format(BLDTYPE[i], i)
-
-        # Read building summary (Sheet 1)
-        file_doe_name_bld = os.path.join("{}".format(DIR_DOE_PATH), "BLD{}".format(i+1),"BLD{}_BuildingSummary.csv".format(i+1))
-        list_doe1 = read_csv(file_doe_name_bld)
-        #listof(listof 3 era values)
-        nFloor      = str2fl(list_doe1[3][3:6])      # Number of Floors, this will be list of floats and str if "basement"
-        glazing     = str2fl(list_doe1[4][3:6])      # [?] Total
-        hCeiling    = str2fl(list_doe1[5][3:6])      # [m] Ceiling height
-        ver2hor     = str2fl(list_doe1[7][3:6])      # Wall to Skin Ratio
-        AreaRoof    = str2fl(list_doe1[8][3:6])      # [m2] Gross Dimensions - Total area
-
-        # Read zone summary (Sheet 2)
-        file_doe_name_zone = os.path.join("{}".format(DIR_DOE_PATH), "BLD{}".format(i+1),"BLD{}_ZoneSummary.csv".format(i+1))
-        list_doe2 = read_csv(file_doe_name_zone)
-        #listof(listof 3 eras)
-        AreaFloor   = str2fl([list_doe2[2][5],list_doe2[3][5],list_doe2[4][5]])       # [m2]
-        Volume      = str2fl([list_doe2[2][6],list_doe2[3][6],list_doe2[4][6]])       # [m3]
-        AreaWall    = str2fl([list_doe2[2][8],list_doe2[3][8],list_doe2[4][8]])       # [m2]
-        AreaWindow  = str2fl([list_doe2[2][9],list_doe2[3][9],list_doe2[4][9]])       # [m2]
-        Occupant    = str2fl([list_doe2[2][11],list_doe2[3][11],list_doe2[4][11]])    # Number of People
-        Light       = str2fl([list_doe2[2][12],list_doe2[3][12],list_doe2[4][12]])    # [W/m2]
-        Elec        = str2fl([list_doe2[2][13],list_doe2[3][13],list_doe2[4][13]])    # [W/m2] Electric Plug and Process
-        Gas         = str2fl([list_doe2[2][14],list_doe2[3][14],list_doe2[4][14]])    # [W/m2] Gas Plug and Process
-        SHW         = str2fl([list_doe2[2][15],list_doe2[3][15],list_doe2[4][15]])    # [Litres/hr] Peak Service Hot Water
-        Vent        = str2fl([list_doe2[2][17],list_doe2[3][17],list_doe2[4][17]])    # [L/s/m2] Ventilation
-        Infil       = str2fl([list_doe2[2][20],list_doe2[3][20],list_doe2[4][20]])    # Air Changes Per Hour (ACH) Infiltration
-
-        # Read location summary (Sheet 3)
-        file_doe_name_location = os.path.join("{}".format(DIR_DOE_PATH), "BLD{}".format(i+1),"BLD{}_LocationSummary.csv".format(i+1))
-        list_doe3 = read_csv(file_doe_name_location)
-        #(listof (listof 3 eras (listof 16 climate types)))
-        TypeWall    = [list_doe3[3][4:20],list_doe3[14][4:20],list_doe3[25][4:20]]            # Construction type
-        RvalWall    = str2fl([list_doe3[4][4:20],list_doe3[15][4:20],list_doe3[26][4:20]])     # [m2*K/W] R-value
-        TypeRoof    = [list_doe3[5][4:20],list_doe3[16][4:20],list_doe3[27][4:20]]            # Construction type
-        RvalRoof    = str2fl([list_doe3[6][4:20],list_doe3[17][4:20],list_doe3[28][4:20]])     # [m2*K/W] R-value
-        Uwindow     = str2fl([list_doe3[7][4:20],list_doe3[18][4:20],list_doe3[29][4:20]])     # [W/m2*K] U-factor
-        SHGC        = str2fl([list_doe3[8][4:20],list_doe3[19][4:20],list_doe3[30][4:20]])     # [-] coefficient
-        HVAC        = str2fl([list_doe3[9][4:20],list_doe3[20][4:20],list_doe3[31][4:20]])     # [kW] Air Conditioning
-        HEAT        = str2fl([list_doe3[10][4:20],list_doe3[21][4:20],list_doe3[32][4:20]])    # [kW] Heating
-        COP         = str2fl([list_doe3[11][4:20],list_doe3[22][4:20],list_doe3[33][4:20]])    # [-] Air Conditioning COP
-        EffHeat     = str2fl([list_doe3[12][4:20],list_doe3[23][4:20],list_doe3[34][4:20]])    # [%] Heating Efficiency
-        FanFlow     = str2fl([list_doe3[13][4:20],list_doe3[24][4:20],list_doe3[35][4:20]])    # [m3/s] Fan Max Flow Rate
-
-        # Read Schedules (Sheet 4)
-        file_doe_name_schedules = os.path.join("{}".format(DIR_DOE_PATH), "BLD{}".format(i+1),"BLD{}_Schedules.csv".format(i+1))
-        list_doe4 = read_csv(file_doe_name_schedules)
-
-        #listof(listof weekday, sat, sun (list of 24 fractions)))
-        SchEquip    = str2fl([list_doe4[1][6:30],list_doe4[2][6:30],list_doe4[3][6:30]])      # Equipment Schedule 24 hrs
-        SchLight    = str2fl([list_doe4[4][6:30],list_doe4[5][6:30],list_doe4[6][6:30]])      # Light Schedule 24 hrs; Wkday=Sat=Sun=Hol
-        SchOcc      = str2fl([list_doe4[7][6:30],list_doe4[8][6:30],list_doe4[9][6:30]])      # Occupancy Schedule 24 hrs
-        SetCool     = str2fl([list_doe4[10][6:30],list_doe4[11][6:30],list_doe4[12][6:30]])   # Cooling Setpoint Schedule 24 hrs
-        SetHeat     = str2fl([list_doe4[13][6:30],list_doe4[14][6:30],list_doe4[15][6:30]])   # Heating Setpoint Schedule 24 hrs; summer design
-        SchGas      = str2fl([list_doe4[16][6:30],list_doe4[17][6:30],list_doe4[18][6:30]])   # Gas Equipment Schedule 24 hrs; wkday=sat
-        SchSWH      = str2fl([list_doe4[19][6:30],list_doe4[20][6:30],list_doe4[21][6:30]])   # Solar Water Heating Schedule 24 hrs; wkday=summerdesign, sat=winterdesgin
+    # if not test serialize refDOE,refBEM,Schedule and store in resources
+    if serialize_output:
+        write_pickle(PKL_FILE_PATH, refDOE, refBEM, Schedule)
 
+    return refDOE, refBEM, Schedule
 
-        for j in range(3):
 
-            # j = 3 built eras
-            #print"\tEra: {} @j={}".format(BUILTERA[j], j)
+def read_type(i, doe_path=DIR_DOE_PATH):
+    """
+    Read the csv files of DOE building type i (folder BLD<i+1> of doe_path).
 
-            for k in range(16):
+    Returns the refDOE, refBEM and Schedule matrices of the building type as
+    nested lists [3, 16] of Building, BEMDef and SchDef objects (era, climate zone).
+    """
 
-                # k = 16 climate zones
-                #print "\tClimate zone: {} @k={}".format(ZONETYPE[k], k)
-
-                B = Building(
-                    hCeiling[j],                        # floorHeight by era
-                    1,                                  # intHeatNight
-                    1,                                  # intHeatDay
-                    0.1,                                # intHeatFRad
-                    0.1,                                # intHeatFLat
-                    Infil[j],                           # infil (ACH) by era
-                    Vent[j]/1000.,                      # vent (m^3/s/m^2) by era, converted from liters
-                    glazing[j],                         # glazing ratio by era
-                    Uwindow[j][k],                      # uValue by era, by climate type
-                    SHGC[j][k],                         # SHGC, by era, by climate type
-                    'AIR',                              # cooling condensation system type: AIR, WATER
-                    COP[j][k],                          # cop by era, climate type
-                    297,                                # coolSetpointDay = 24 C
-                    297,                                # coolSetpointNight
-                    293,                                # heatSetpointDay = 20 C
-                    293,                                # heatSetpointNight
-                    (HVAC[j][k]*1000.0)/AreaFloor[j],   # coolCap converted to W/m2 by era, climate type
-                    EffHeat[j][k],                      # heatEff by era, climate type
-                    293)                                # initialTemp at 20 C
-
-                #Not defined in the constructor
-                B.heatCap = (HEAT[j][k]*1000.0)/AreaFloor[j]         # heating Capacity converted to W/m2 by era, climate type
-                B.Type = BLDTYPE[i]
-                B.Era = BUILTERA[j]
-                B.Zone = ZONETYPE[k]
-                refDOE[i][j][k] = B
-
-                # Define wall, mass(floor), roof
-                # Reference from E+ for conductivity, thickness (reference below)
-
-                # Material: (thermalCond, volHeat = specific heat * density)
-                Concrete = Material (1.311, 836.8 * 2240,"Concrete")
-                Insulation = Material (0.049, 836.8 * 265.0, "Insulation")
-                Gypsum = Material (0.16, 830.0 * 784.9, "Gypsum")
-                Wood = Material (0.11, 1210.0 * 544.62, "Wood")
-                Stucco = Material(0.6918,  837.0 * 1858.0, "Stucco")
-
-                # Wall (1 in stucco, concrete, insulation, gypsum)
-                # Check TypWall by era, by climate
-                if TypeWall[j][k] == "MassWall":
-                    #Construct wall based on R value of Wall from refDOE and properties defined above
-                    # 1" stucco, 8" concrete, tbd insulation, 1/2" gypsum
-                    Rbase = 0.271087 # R val based on stucco, concrete, gypsum
-                    Rins = RvalWall[j][k] - Rbase #find insulation value
-                    D_ins = Rins * Insulation.thermalCond # depth of ins from m2*K/W * W/m*K = m
-                    if D_ins > 0.01:
-                        thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,D_ins,0.0127]
-                        layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Insulation,Gypsum]
-                    else:
-                        #if it's less then 1 cm don't include in layers
-                        thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,0.0127]
-                        layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Gypsum]
-
-                    wall = Element(0.08,0.92,thickness,layers,0.,293.,0.,"MassWall")
-
-                    # If mass wall, assume mass floor (4" concrete)
-                    # Mass (assume 4" concrete);
-                    alb = 0.2
-                    emis = 0.9
-                    thickness = [0.054,0.054]
-                    concrete = Material (1.31, 2240.0*836.8)
-                    mass = Element(alb,emis,thickness,[concrete,concrete],0,293,1,"MassFloor")
-
-                elif TypeWall[j][k] == "WoodFrame":
-                    # 0.01m wood siding, tbd insulation, 1/2" gypsum
-                    Rbase = 0.170284091    # based on wood siding, gypsum
-                    Rins = RvalWall[j][k] - Rbase
-                    D_ins = Rins * Insulation.thermalCond #depth of insulatino
-
-                    if D_ins > 0.01:
-                        thickness = [0.01,D_ins,0.0127]
-                        layers = [Wood,Insulation,Gypsum]
-                    else:
-                        thickness = [0.01,0.0127]
-                        layers = [Wood,Gypsum]
-
-                    wall = Element(0.22,0.92,thickness,layers,0.,293.,0.,"WoodFrameWall")
-
-                    # If wood frame wall, assume wooden floor
-                    alb = 0.2
-                    emis = 0.9
-                    thickness = [0.05,0.05]
-                    wood = Material(1.31, 2240.0*836.8)
-                    mass = Element(alb,emis,thickness,[wood,wood],0.,293.,1.,"WoodFloor")
-
-                elif TypeWall[j][k] == "SteelFrame":
-                    # 1" stucco, 8" concrete, tbd insulation, 1/2" gypsum
-                    Rbase = 0.271087 # based on stucco, concrete, gypsum
-                    Rins = RvalWall[j][k] - Rbase
-                    D_ins = Rins * Insulation.thermalCond
-                    if D_ins > 0.01:
-                        thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,D_ins,0.0127]
-                        layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Insulation,Gypsum]
-                    else:    # If insulation is too thin, assume no insulation
-                        thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,0.0127]
-                        layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Gypsum]
-                    wall = Element(0.15,0.92,thickness,layers,0.,293.,0.,"SteelFrame")
-
-                    # If mass wall, assume mass foor
-                    # Mass (assume 4" concrete),
-                    alb = 0.2
-                    emis = 0.93
-                    thickness = [0.05,0.05]
-                    mass = Element(alb,emis,thickness,[Concrete,Concrete],0.,293.,1.,"MassFloor")
-
-                elif TypeWall[j][k] == "MetalWall":
-                    # metal siding, insulation, 1/2" gypsum
-                    alb = 0.2
-                    emis = 0.9
-                    D_ins = max((RvalWall[j][k] * Insulation.thermalCond)/2, 0.01) #use derived insul thickness or 0.01 based on max
-                    thickness = [D_ins,D_ins,0.0127]
-                    materials = [Insulation,Insulation,Gypsum]
-                    wall = Element(alb,emis,thickness,materials,0,293,0,"MetalWall")
-
-                    # Mass (assume 4" concrete);
-                    alb = 0.2
-                    emis = 0.9
-                    thickness = [0.05, 0.05]
-                    concrete = Material(1.31, 2240.0*836.8)
-                    mass = Element(alb,emis,thickness,[concrete,concrete],0.,293.,1.,"MassFloor")
-
-                # Roof
-                if TypeRoof[j][k] == "IEAD": #Insulation Entirely Above Deck
-                    # IEAD-> membrane, insulation, decking
-                     alb = 0.2
-                     emis = 0.93
-                     D_ins = max(RvalRoof[j][k] * Insulation.thermalCond/2.,0.01);
-                     roof = Element(alb,emis,[D_ins,D_ins],[Insulation,Insulation],0.,293.,0.,"IEAD")
-
-                elif TypeRoof[j][k] == "Attic":
-                    # IEAD-> membrane, insulation, decking
-                    alb = 0.2
-                    emis = 0.9
-                    D_ins = max(RvalRoof[j][k] * Insulation.thermalCond/2.,0.01)
-                    roof = Element(alb,emis,[D_ins,D_ins],[Insulation,Insulation],0.,293.,0.,"Attic")
-
-                elif TypeRoof[j][k] == "MetalRoof":
-                    # IEAD-> membrane, insulation, decking
-                    alb = 0.2
-                    emis = 0.9
-                    D_ins = max(RvalRoof[j][k] * Insulation.thermalCond/2.,0.01)
-                    roof = Element(alb,emis,[D_ins,D_ins],[Insulation,Insulation],0.,293.,0.,"MetalRoof")
-
-                # Define bulding energy model, set fraction of the urban floor space of this typology to zero
-                refBEM[i][j][k] = BEMDef(B, mass, wall, roof, 0.0)
-                refBEM[i][j][k].building.FanMax = FanFlow[j][k] # max fan flow rate (m^3/s) per DOE
-
-                Schedule[i][j][k] = SchDef()
-
-                Schedule[i][j][k].Elec = SchEquip   # 3x24 matrix of schedule for fraction electricity (WD,Sat,Sun)
-                Schedule[i][j][k].Light = SchLight  # 3x24 matrix of schedule for fraction light (WD,Sat,Sun)
-                Schedule[i][j][k].Gas = SchGas      # 3x24 matrix of schedule for fraction gas (WD,Sat,Sun)
-                Schedule[i][j][k].Occ = SchOcc      # 3x24 matrix of schedule for fraction occupancy (WD,Sat,Sun)
-                Schedule[i][j][k].Cool = SetCool    # 3x24 matrix of schedule for fraction cooling temp (WD,Sat,Sun)
-                Schedule[i][j][k].Heat = SetHeat    # 3x24 matrix of schedule for fraction heating temp (WD,Sat,Sun)
-                Schedule[i][j][k].SWH = SchSWH      # 3x24 matrix of schedule for fraction SWH (WD,Sat,Sun
-
-                Schedule[i][j][k].Qelec = Elec[j]                   # W/m^2 (max) for electrical plug process
-                Schedule[i][j][k].Qlight = Light[j]                 # W/m^2 (max) for light
-                Schedule[i][j][k].Nocc = Occupant[j]/AreaFloor[j]   # Person/m^2
-                Schedule[i][j][k].Qgas = Gas[j]                     # W/m^2 (max) for gas
-                Schedule[i][j][k].Vent = Vent[j]/1000.0             # m^3/m^2 per person
-                Schedule[i][j][k].Vswh = SHW[j]/AreaFloor[j]        # litres per hour per m^2 of floor
+    refDOE   = [[None]*16 for j_ in range(3)]     #refDOE(3,16) = Building
+    Schedule = [[None]*16 for j_ in range(3)]     #Schedule (3,16) = SchDef
+    refBEM   = [[None]*16 for j_ in range(3)]     #refBEM (3,16) = BEMDef
+
+    # Read building summary (Sheet 1)
+    file_doe_name_bld = os.path.join(doe_path, "BLD{}".format(i+1),"BLD{}_BuildingSummary.csv".format(i+1))
+    list_doe1 = read_csv(file_doe_name_bld)
+    #listof(listof 3 era values)
+    nFloor      = str2fl(list_doe1[3][3:6])      # Number of Floors, this will be list of floats and str if "basement"
+    glazing     = str2fl(list_doe1[4][3:6])      # [?] Total
+    hCeiling    = str2fl(list_doe1[5][3:6])      # [m] Ceiling height
+    ver2hor     = str2fl(list_doe1[7][3:6])      # Wall to Skin Ratio
+    AreaRoof    = str2fl(list_doe1[8][3:6])      # [m2] Gross Dimensions - Total area
+
+    # Read zone summary (Sheet 2)
+    file_doe_name_zone = os.path.join(doe_path, "BLD{}".format(i+1),"BLD{}_ZoneSummary.csv".format(i+1))
+    list_doe2 = read_csv(file_doe_name_zone)
+    #listof(listof 3 eras)
+    AreaFloor   = str2fl([list_doe2[2][5],list_doe2[3][5],list_doe2[4][5]])       # [m2]
+    Volume      = str2fl([list_doe2[2][6],list_doe2[3][6],list_doe2[4][6]])       # [m3]
+    AreaWall    = str2fl([list_doe2[2][8],list_doe2[3][8],list_doe2[4][8]])       # [m2]
+    AreaWindow  = str2fl([list_doe2[2][9],list_doe2[3][9],list_doe2[4][9]])       # [m2]
+    Occupant    = str2fl([list_doe2[2][11],list_doe2[3][11],list_doe2[4][11]])    # Number of People
+    Light       = str2fl([list_doe2[2][12],list_doe2[3][12],list_doe2[4][12]])    # [W/m2]
+    Elec        = str2fl([list_doe2[2][13],list_doe2[3][13],list_doe2[4][13]])    # [W/m2] Electric Plug and Process
+    Gas         = str2fl([list_doe2[2][14],list_doe2[3][14],list_doe2[4][14]])    # [W/m2] Gas Plug and Process
+    SHW         = str2fl([list_doe2[2][15],list_doe2[3][15],list_doe2[4][15]])    # [Litres/hr] Peak Service Hot Water
+    Vent        = str2fl([list_doe2[2][17],list_doe2[3][17],list_doe2[4][17]])    # [L/s/m2] Ventilation
+    Infil       = str2fl([list_doe2[2][20],list_doe2[3][20],list_doe2[4][20]])    # Air Changes Per Hour (ACH) Infiltration
+
+    # Read location summary (Sheet 3)
+    file_doe_name_location = os.path.join(doe_path, "BLD{}".format(i+1),"BLD{}_LocationSummary.csv".format(i+1))
+    list_doe3 = read_csv(file_doe_name_location)
+    #(listof (listof 3 eras (listof 16 climate types)))
+    TypeWall    = [list_doe3[3][4:20],list_doe3[14][4:20],list_doe3[25][4:20]]            # Construction type
+    RvalWall    = str2fl([list_doe3[4][4:20],list_doe3[15][4:20],list_doe3[26][4:20]])     # [m2*K/W] R-value
+    TypeRoof    = [list_doe3[5][4:20],list_doe3[16][4:20],list_doe3[27][4:20]]            # Construction type
+    RvalRoof    = str2fl([list_doe3[6][4:20],list_doe3[17][4:20],list_doe3[28][4:20]])     # [m2*K/W] R-value
+    Uwindow     = str2fl([list_doe3[7][4:20],list_doe3[18][4:20],list_doe3[29][4:20]])     # [W/m2*K] U-factor
+    SHGC        = str2fl([list_doe3[8][4:20],list_doe3[19][4:20],list_doe3[30][4:20]])     # [-] coefficient
+    HVAC        = str2fl([list_doe3[9][4:20],list_doe3[20][4:20],list_doe3[31][4:20]])     # [kW] Air Conditioning
+    HEAT        = str2fl([list_doe3[10][4:20],list_doe3[21][4:20],list_doe3[32][4:20]])    # [kW] Heating
+    COP         = str2fl([list_doe3[11][4:20],list_doe3[22][4:20],list_doe3[33][4:20]])    # [-] Air Conditioning COP
+    EffHeat     = str2fl([list_doe3[12][4:20],list_doe3[23][4:20],list_doe3[34][4:20]])    # [%] Heating Efficiency
+    FanFlow     = str2fl([list_doe3[13][4:20],list_doe3[24][4:20],list_doe3[35][4:20]])    # [m3/s] Fan Max Flow Rate
+
+    # Read Schedules (Sheet 4)
+    file_doe_name_schedules = os.path.join(doe_path, "BLD{}".format(i+1),"BLD{}_Schedules.csv".format(i+1))
+    list_doe4 = read_csv(file_doe_name_schedules)
+
+    #listof(listof weekday, sat, sun (list of 24 fractions)))
+    SchEquip    = str2fl([list_doe4[1][6:30],list_doe4[2][6:30],list_doe4[3][6:30]])      # Equipment Schedule 24 hrs
+    SchLight    = str2fl([list_doe4[4][6:30],list_doe4[5][6:30],list_doe4[6][6:30]])      # Light Schedule 24 hrs; Wkday=Sat=Sun=Hol
+    SchOcc      = str2fl([list_doe4[7][6:30],list_doe4[8][6:30],list_doe4[9][6:30]])      # Occupancy Schedule 24 hrs
+    SetCool     = str2fl([list_doe4[10][6:30],list_doe4[11][6:30],list_doe4[12][6:30]])   # Cooling Setpoint Schedule 24 hrs
+    SetHeat     = str2fl([list_doe4[13][6:30],list_doe4[14][6:30],list_doe4[15][6:30]])   # Heating Setpoint Schedule 24 hrs; summer design
+    SchGas      = str2fl([list_doe4[16][6:30],list_doe4[17][6:30],list_doe4[18][6:30]])   # Gas Equipment Schedule 24 hrs; wkday=sat
+    SchSWH      = str2fl([list_doe4[19][6:30],list_doe4[20][6:30],list_doe4[21][6:30]])   # Solar Water Heating Schedule 24 hrs; wkday=summerdesign, sat=winterdesgin
+
+
+    for j in range(3):
+
+        # j = 3 built eras
+        #print"\tEra: {} @j={}".format(BUILTERA[j], j)
+
+        for k in range(16):
+
+            # k = 16 climate zones
+            #print "\tClimate zone: {} @k={}".format(ZONETYPE[k], k)
+
+            B = Building(
+                hCeiling[j],                        # floorHeight by era
+                1,                                  # intHeatNight
+                1,                                  # intHeatDay
+                0.1,                                # intHeatFRad
+                0.1,                                # intHeatFLat
+                Infil[j],                           # infil (ACH) by era
+                Vent[j]/1000.,                      # vent (m^3/s/m^2) by era, converted from liters
+                glazing[j],                         # glazing ratio by era
+                Uwindow[j][k],                      # uValue by era, by climate type
+                SHGC[j][k],                         # SHGC, by era, by climate type
+                'AIR',                              # cooling condensation system type: AIR, WATER
+                COP[j][k],                          # cop by era, climate type
+                297,                                # coolSetpointDay = 24 C
+                297,                                # coolSetpointNight
+                293,                                # heatSetpointDay = 20 C
+                293,                                # heatSetpointNight
+                (HVAC[j][k]*1000.0)/AreaFloor[j],   # coolCap converted to W/m2 by era, climate type
+                EffHeat[j][k],                      # heatEff by era, climate type
+                293)                                # initialTemp at 20 C
+
+            #Not defined in the constructor
+            B.heatCap = (HEAT[j][k]*1000.0)/AreaFloor[j]         # heating Capacity converted to W/m2 by era, climate type
+            B.Type = BLDTYPE[i]
+            B.Era = BUILTERA[j]
+            B.Zone = ZONETYPE[k]
+            refDOE[j][k] = B
+
+            # Define wall, mass(floor), roof
+            # Reference from E+ for conductivity, thickness (reference below)
+
+            # Material: (thermalCond, volHeat = specific heat * density)
+            Concrete = Material (1.311, 836.8 * 2240,"Concrete")
+            Insulation = Material (0.049, 836.8 * 265.0, "Insulation")
+            Gypsum = Material (0.16, 830.0 * 784.9, "Gypsum")
+            Wood = Material (0.11, 1210.0 * 544.62, "Wood")
+            Stucco = Material(0.6918,  837.0 * 1858.0, "Stucco")
+
+            # Wall (1 in stucco, concrete, insulation, gypsum)
+            # Check TypWall by era, by climate
+            if TypeWall[j][k] == "MassWall":
+                #Construct wall based on R value of Wall from refDOE and properties defined above
+                # 1" stucco, 8" concrete, tbd insulation, 1/2" gypsum
+                Rbase = 0.271087 # R val based on stucco, concrete, gypsum
+                Rins = RvalWall[j][k] - Rbase #find insulation value
+                D_ins = Rins * Insulation.thermalCond # depth of ins from m2*K/W * W/m*K = m
+                if D_ins > 0.01:
+                    thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,D_ins,0.0127]
+                    layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Insulation,Gypsum]
+                else:
+                    #if it's less then 1 cm don't include in layers
+                    thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,0.0127]
+                    layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Gypsum]
+
+                wall = Element(0.08,0.92,thickness,layers,0.,293.,0.,"MassWall")
+
+                # If mass wall, assume mass floor (4" concrete)
+                # Mass (assume 4" concrete);
+                alb = 0.2
+                emis = 0.9
+                thickness = [0.054,0.054]
+                concrete = Material (1.31, 2240.0*836.8)
+                mass = Element(alb,emis,thickness,[concrete,concrete],0,293,1,"MassFloor")
+
+            elif TypeWall[j][k] == "WoodFrame":
+                # 0.01m wood siding, tbd insulation, 1/2" gypsum
+                Rbase = 0.170284091    # based on wood siding, gypsum
+                Rins = RvalWall[j][k] - Rbase
+                D_ins = Rins * Insulation.thermalCond #depth of insulatino
+
+                if D_ins > 0.01:
+                    thickness = [0.01,D_ins,0.0127]
+                    layers = [Wood,Insulation,Gypsum]
+                else:
+                    thickness = [0.01,0.0127]
+                    layers = [Wood,Gypsum]
+
+                wall = Element(0.22,0.92,thickness,layers,0.,293.,0.,"WoodFrameWall")
+
+                # If wood frame wall, assume wooden floor
+                alb = 0.2
+                emis = 0.9
+                thickness = [0.05,0.05]
+                wood = Material(1.31, 2240.0*836.8)
+                mass = Element(alb,emis,thickness,[wood,wood],0.,293.,1.,"WoodFloor")
+
+            elif TypeWall[j][k] == "SteelFrame":
+                # 1" stucco, 8" concrete, tbd insulation, 1/2" gypsum
+                Rbase = 0.271087 # based on stucco, concrete, gypsum
+                Rins = RvalWall[j][k] - Rbase
+                D_ins = Rins * Insulation.thermalCond
+                if D_ins > 0.01:
+                    thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,D_ins,0.0127]
+                    layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Insulation,Gypsum]
+                else:    # If insulation is too thin, assume no insulation
+                    thickness = [0.0254,0.0508,0.0508,0.0508,0.0508,0.0127]
+                    layers = [Stucco,Concrete,Concrete,Concrete,Concrete,Gypsum]
+                wall = Element(0.15,0.92,thickness,layers,0.,293.,0.,"SteelFrame")
+
+                # If mass wall, assume mass foor
+                # Mass (assume 4" concrete),
+                alb = 0.2
+                emis = 0.93
+                thickness = [0.05,0.05]
+                mass = Element(alb,emis,thickness,[Concrete,Concrete],0.,293.,1.,"MassFloor")
+
+            elif TypeWall[j][k] == "MetalWall":
+                # metal siding, insulation, 1/2" gypsum
+                alb = 0.2
+                emis = 0.9
+                D_ins = max((RvalWall[j][k] * Insulation.thermalCond)/2, 0.01) #use derived insul thickness or 0.01 based on max
+                thickness = [D_ins,D_ins,0.0127]
+                materials = [Insulation,Insulation,Gypsum]
+                wall = Element(alb,emis,thickness,materials,0,293,0,"MetalWall")
+
+                # Mass (assume 4" concrete);
+                alb = 0.2
+                emis = 0.9
+                thickness = [0.05, 0.05]
+                concrete = Material(1.31, 2240.0*836.8)
+                mass = Element(alb,emis,thickness,[concrete,concrete],0.,293.,1.,"MassFloor")
+
+            # Roof
+            if TypeRoof[j][k] == "IEAD": #Insulation Entirely Above Deck
+                # IEAD-> membrane, insulation, decking
+                 alb = 0.2
+                 emis = 0.93
+                 D_ins = max(RvalRoof[j][k] * Insulation.thermalCond/2.,0.01);
+                 roof = Element(alb,emis,[D_ins,D_ins],[Insulation,Insulation],0.,293.,0.,"IEAD")
+
+            elif TypeRoof[j][k] == "Attic":
+                # IEAD-> membrane, insulation, decking
+                alb = 0.2
+                emis = 0.9
+                D_ins = max(RvalRoof[j][k] * Insulation.thermalCond/2.,0.01)
+                roof = Element(alb,emis,[D_ins,D_ins],[Insulation,Insulation],0.,293.,0.,"Attic")
+
+            elif TypeRoof[j][k] == "MetalRoof":
+                # IEAD-> membrane, insulation, decking
+                alb = 0.2
+                emis = 0.9
+                D_ins = max(RvalRoof[j][k] * Insulation.thermalCond/2.,0.01)
+                roof = Element(alb,emis,[D_ins,D_ins],[Insulation,Insulation],0.,293.,0.,"MetalRoof")
+
+            # Define bulding energy model, set fraction of the urban floor space of this typology to zero
+            refBEM[j][k] = BEMDef(B, mass, wall, roof, 0.0)
+            refBEM[j][k].building.FanMax = FanFlow[j][k] # max fan flow rate (m^3/s) per DOE
+
+            Schedule[j][k] = SchDef()
+
+            Schedule[j][k].Elec = SchEquip   # 3x24 matrix of schedule for fraction electricity (WD,Sat,Sun)
+            Schedule[j][k].Light = SchLight  # 3x24 matrix of schedule for fraction light (WD,Sat,Sun)
+            Schedule[j][k].Gas = SchGas      # 3x24 matrix of schedule for fraction gas (WD,Sat,Sun)
+            Schedule[j][k].Occ = SchOcc      # 3x24 matrix of schedule for fraction occupancy (WD,Sat,Sun)
+            Schedule[j][k].Cool = SetCool    # 3x24 matrix of schedule for fraction cooling temp (WD,Sat,Sun)
+            Schedule[j][k].Heat = SetHeat    # 3x24 matrix of schedule for fraction heating temp (WD,Sat,Sun)
+            Schedule[j][k].SWH = SchSWH      # 3x24 matrix of schedule for fraction SWH (WD,Sat,Sun
+
+            Schedule[j][k].Qelec = Elec[j]                   # W/m^2 (max) for electrical plug process
+            Schedule[j][k].Qlight = Light[j]                 # W/m^2 (max) for light
+            Schedule[j][k].Nocc = Occupant[j]/AreaFloor[j]   # Person/m^2
+            Schedule[j][k].Qgas = Gas[j]                     # W/m^2 (max) for gas
+            Schedule[j][k].Vent = Vent[j]/1000.0             # m^3/m^2 per person
+            Schedule[j][k].Vswh = SHW[j]/AreaFloor[j]        # litres per hour per m^2 of floor
 
+    return refDOE, refBEM, Schedule
 
-    # if not test serialize refDOE,refBEM,Schedule and store in resources
-    if serialize_output:
 
-        # create a binary file for serialized obj
-        pkl_file_path = os.path.join(DIR_CURR,'refdata','readDOE.pkl')
-        pickle_readDOE = open(pkl_file_path, 'wb')
+def write_pickle(pkl_file_path, refDOE, refBEM, Schedule):
+    """Serialize the refDOE, refBEM and Schedule matrices to readDOE.pkl."""
 
-        # dump in ../resources
-        # Pickle objects, protocol 1 b/c binary file
-        pickle.dump(refDOE, pickle_readDOE,1)
-        pickle.dump(refBEM, pickle_readDOE,1)
-        pickle.dump(Schedule, pickle_readDOE,1)
+    # create a binary file for serialized obj
+    pickle_readDOE = open(pkl_file_path, 'wb')
 
-        pickle_readDOE.close()
+    # Pickle objects, protocol 1 b/c binary file
+    pickle.dump(refDOE, pickle_readDOE,1)
+    pickle.dump(refBEM, pickle_readDOE,1)
+    pickle.dump(Schedule, pickle_readDOE,1)
 
-    return refDOE, refBEM, Schedule
+    pickle_readDOE.close()
 
-if __name__ == "__main__":
 
-    # Set to True only if you want create new .pkls of DOE refs
-    # Use --serialize switch to serialize the readDOE data
-    if len(sys.argv)> 1 and sys.argv[1]=="--serialize":
-        refDOE, refBEM, Schedule = readDOE(True)
+def source_digests(i, doe_path=DIR_DOE_PATH):
+    """md5 digests of the csv files (DOE_SHEETS) of DOE building type i."""
+    digests = []
+    for sheet in DOE_SHEETS:
+        file_path = os.path.join(doe_path, "BLD{}".format(i+1), "BLD{}_{}.csv".format(i+1, sheet))
+        if not os.path.exists(file_path):
+            raise Exception("DOE reference file: '{}' does not exist.".format(file_path))
+        with open(file_path, 'rb') as f:
+            digests.append(hashlib.md5(f.read()).hexdigest())
+    return tuple(digests)
+
+
+def _compile_type(args):
+    # Process pool task: matrices of one building type, pickled without loggers
+    i, doe_path = args
+    refDOE, refBEM, Schedule = read_type(i, doe_path)
+    return i, dumps((refDOE, refBEM, Schedule), [B for era in refDOE for B in era])
+
+
+def compile_store(doe_path=DIR_DOE_PATH, pkl_file_path=PKL_FILE_PATH, processes=None, force=False):
+    """
+    Incremental readDOE: rebuild readDOE.pkl and its indexed DOEStore (see
+    uwg.refstore) from the DOE csv files, parsing only the building types whose
+    csv files changed since the last compile.
+
+    The md5 digests of the csv files of each building type are kept in the index
+    of the store. Changed building types are read in a process pool, and the
+    templates of the others are taken from the current readDOE.pkl and store.
+
+    args:
+        doe_path: folder of the DOE reference csv files (BLD1 to BLD16)
+        pkl_file_path: path of readDOE.pkl
+        processes: number of worker processes (default: number of cpus, 1 to
+            read in this process)
+        force: rebuild every building type
+    returns:
+        list of the indices of the rebuilt building types
+    """
+
+    sources = dict((i, source_digests(i, doe_path)) for i in range(16))
+    store = None
+    if not force and os.path.exists(pkl_file_path):
+        store = DOEStore(pkl_file_path)
+    changed = [i for i in range(16) if store is None or store.sources.get(i) != sources[i]]
+    if not changed:
+        return changed
+
+    jobs = [(i, doe_path) for i in changed]
+    if multiprocessing is None or processes == 1 or len(jobs) < 2:
+        results = [_compile_type(job) for job in jobs]
     else:
-        refDOE, refBEM, Schedule = readDOE(False)
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_compile_type, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+    # Unchanged building types from the current readDOE.pkl
+    if len(changed) < 16:
+        refDOE, refBEM, Schedule = [list(m) for m in read_pickle(pkl_file_path)]
+    else:
+        refDOE, refBEM, Schedule = [None]*16, [None]*16, [None]*16
+    for i, blob in results:
+        refDOE[i], refBEM[i], Schedule[i] = pickle.loads(blob)
+
+    set_loggers([B for bld in refDOE for era in bld for B in era])
+    write_pickle(pkl_file_path, refDOE, refBEM, Schedule)
+
+    templates = {}
+    blobs = {}
+    for i in range(16):
+        for j in range(3):
+            for k in range(16):
+                templates[(i, j, k)] = (refDOE[i][j][k], refBEM[i][j][k], Schedule[i][j][k])
+                if i not in changed:
+                    blobs[(i, j, k)] = store.raw(i, j, k)
+    write_store(pkl_file_path, templates, sources, blobs)
+
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m uwg.readDOE",
+        description="Read the DOE reference building csv files.")
+    parser.add_argument("--serialize", action="store_true",
+        help="read every building type and write readDOE.pkl")
+    parser.add_argument("--compile", action="store_true",
+        help="rebuild readDOE.pkl and its reference store for the building types whose csv files changed")
+    parser.add_argument("--doe-path", default=DIR_DOE_PATH,
+        help="folder of the DOE reference csv files (default: %(default)s)")
+    parser.add_argument("--pkl", default=PKL_FILE_PATH,
+        help="path of readDOE.pkl (default: %(default)s)")
+    parser.add_argument("--processes", type=int, default=None,
+        help="number of worker processes for --compile (default: number of cpus)")
+    parser.add_argument("--force", action="store_true",
+        help="with --compile, rebuild every building type")
+    args = parser.parse_args(argv)
+
+    if args.compile:
+        t = time.time()
+        changed = compile_store(args.doe_path, args.pkl, args.processes, args.force)
+        if changed:
+            print("Rebuilt {} in {:.1f} s: {}".format(args.pkl, time.time() - t,
+                ", ".join(BLDTYPE[i] for i in changed)))
+        else:
+            print("{} is up to date.".format(args.pkl))
+    else:
+        # Set to True only if you want create new .pkls of DOE refs
+        # Use --serialize switch to serialize the readDOE data
+        readDOE(args.serialize)
+
+
+if __name__ == "__main__":
+    # Run as python -m uwg.readDOE, so that the process pool can import its tasks
+    main(sys.argv[1:])
 
 
 # Material ref from E+
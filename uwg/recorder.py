@@ -0,0 +1,228 @@
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Registry of the quantities that can be recorded at each print step, as
+# "<source>.<attribute>" of the forcing, urban canyon, urban boundary layer and
+# rural station models. Add an entry here to make a new scalar recordable.
+CHANNELS = {
+    "forc.deepTemp": "deep soil temperature (K)",
+    "forc.waterTemp": "water temperature (K)",
+    "forc.infra": "horizontal infrared radiation intensity (W m-2)",
+    "forc.uDir": "wind direction (deg)",
+    "forc.hum": "specific humidity (kg kg-1)",
+    "forc.pres": "pressure (Pa)",
+    "forc.temp": "air temperature (K)",
+    "forc.rHum": "relative humidity (%)",
+    "forc.dir": "normal solar direct radiation (W m-2)",
+    "forc.dif": "horizontal solar diffuse radiation (W m-2)",
+    "forc.prec": "precipitation (m s-1)",
+    "forc.wind": "wind speed (m s-1)",
+    "UCM.canTemp": "canyon air temperature (K)",
+    "UCM.canHum": "canyon specific humidity (kg kg-1)",
+    "UCM.canRHum": "canyon relative humidity (%)",
+    "UCM.Tdp": "canyon dew point temperature (C)",
+    "UCM.canWind": "canyon wind velocity (m s-1)",
+    "UCM.ublWind": "urban boundary layer wind velocity (m s-1)",
+    "UCM.ustar": "friction velocity (m s-1)",
+    "UCM.ustarMod": "modified friction velocity (m s-1)",
+    "UCM.roadTemp": "average road temperature (K)",
+    "UCM.wallTemp": "average wall temperature (K)",
+    "UCM.roofTemp": "average roof temperature (K)",
+    "UCM.sensHeat": "urban sensible heat (W m-2)",
+    "UCM.latHeat": "urban latent heat (W m-2)",
+    "UCM.sensAnthrop": "sensible anthropogenic heat (W m-2)",
+    "UCM.ElecTotal": "total electricity consumption (MW)",
+    "UCM.GasTotal": "total gas consumption (MW)",
+    "UCM.Q_wall": "wall sensible heat flux (W m-2)",
+    "UCM.Q_roof": "roof sensible heat flux (W m-2)",
+    "UCM.Q_road": "road sensible heat flux (W m-2)",
+    "UCM.Q_window": "window sensible heat flux (W m-2)",
+    "UCM.Q_vent": "ventilation sensible heat flux (W m-2)",
+    "UCM.Q_hvac": "HVAC waste heat flux (W m-2)",
+    "UCM.Q_traffic": "traffic sensible heat flux (W m-2)",
+    "UCM.Q_ubl": "sensible heat exchanged with the urban boundary layer (W m-2)",
+    "UBL.ublTemp": "urban boundary layer temperature (K)",
+    "UBL.sensHeat": "urban sensible heat seen by the boundary layer (W m-2)",
+    "RSM.ublPres": "pressure at the urban boundary layer height (Pa)",
+}
+
+# Vertical profiles that can be recorded at each print step. The number of
+# levels is taken from the first recorded step.
+PROFILES = {
+    "UCM.windProf": "urban wind profile at the RSM levels (m s-1)",
+    "RSM.windProf": "rural wind profile (m s-1)",
+    "RSM.tempProf": "rural potential temperature profile (K)",
+}
+
+# Channels read by uwg.write_epw
+DEFAULT_CHANNELS = ("UCM.canTemp", "UCM.Tdp", "UCM.canRHum", "forc.wind")
+
+SOURCES = ("forc", "UCM", "UBL", "RSM")
+
+
+class Recorder(object):
+    """
+    Columnar output of the uwg simulation: one preallocated column of N doubles
+    per recorded channel, filled at each print step. Replaces per-step copies of
+    the forcing, UCM, UBL and RSM objects. A profile channel (see PROFILES) is a
+    column of N times the number of levels values.
+
+    args:
+        N: number of print steps (hours) in the simulation
+        channels: list of channel names (keys of CHANNELS or PROFILES). Defaults to
+            DEFAULT_CHANNELS, which are the quantities written to the EPW.
+
+    attributes:
+        N;              # number of print steps
+        n;              # number of print steps recorded so far
+        channels;       # tuple of recorded channel names
+        columns;        # dictionary of channel name to array('d') column
+        levels;         # dictionary of profile channel name to number of levels
+    """
+
+    CHANNEL_MSG = "Unknown output channel '{}'. Recordable channels are listed in " \
+        "uwg.recorder.CHANNELS and uwg.recorder.PROFILES."
+    NUMPY_MISSING_MSG = "numpy is required for Recorder.to_numpy."
+
+    def __init__(self, N, channels=None):
+        if channels is None:
+            channels = DEFAULT_CHANNELS
+        for name in channels:
+            if name not in CHANNELS and name not in PROFILES:
+                raise Exception(self.CHANNEL_MSG.format(name))
+
+        self.N = N
+        self.n = 0
+        # Keep the order of the request, without duplicates
+        self.channels = tuple(name for i, name in enumerate(channels) if name not in channels[:i])
+        self.columns = dict((name, array('d', [0.]) * N) for name in self.channels if name in CHANNELS)
+        self.levels = {}
+
+        # (column, index of source in SOURCES, attribute) for each channel
+        self._targets = [(self.columns[name], SOURCES.index(name.split('.')[0]), name.split('.')[1])
+                         for name in self.channels if name in CHANNELS]
+        # (name, index of source in SOURCES, attribute) for each profile
+        self._profiles = [(name, SOURCES.index(name.split('.')[0]), name.split('.')[1])
+                          for name in self.channels if name in PROFILES]
+
+    def __repr__(self):
+        return "Recorder: {} of {} steps, channels = {}".format(self.n, self.N, ", ".join(self.channels))
+
+    def record(self, forc, UCM, UBL, RSM):
+        """Store the recorded channels of the current print step."""
+        sources = (forc, UCM, UBL, RSM)
+        n = self.n
+        for column, src, attr in self._targets:
+            value = getattr(sources[src], attr)
+            column[n] = float('nan') if value is None else value
+        for name, src, attr in self._profiles:
+            values = getattr(sources[src], attr)
+            if name not in self.columns:
+                self.levels[name] = len(values)
+                self.columns[name] = array('d', [0.]) * (self.N * len(values))
+            nz = self.levels[name]
+            self.columns[name][n*nz:(n+1)*nz] = array('d', values)
+        self.n = n + 1
+
+    def state(self):
+        """Recorded values so far, for Recorder.restore (see checkpoint.Checkpoint)."""
+        n = self.n
+        return (n, dict(self.levels),
+                dict((name, column[:n*self.levels.get(name, 1)]) for name, column in self.columns.items()))
+
+    def restore(self, state):
+        """Set the recorded values of a recorder with the same N and channels to state."""
+        n, levels, columns = state
+        for name, values in columns.items():
+            if name not in self.columns:
+                self.levels[name] = levels[name]
+                self.columns[name] = array('d', [0.]) * (self.N * levels[name])
+            # Columns are modified in place, as _targets refers to them
+            self.columns[name][:len(values)] = values
+        self.n = n
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def profile(self, name, n):
+        """List of the levels of a recorded profile at step n."""
+        nz = self.levels[name]
+        return list(self.columns[name][n*nz:(n+1)*nz])
+
+    def to_numpy(self, name):
+        """numpy view of a recorded column (no copy). Profiles are shaped (N, levels)."""
+        if np is None:
+            raise ImportError(self.NUMPY_MISSING_MSG)
+        column = np.frombuffer(self.columns[name], dtype=float)
+        if name in self.levels:
+            column = column.reshape(self.N, self.levels[name])
+        return column
+
+    def view(self, source):
+        """Lazy list-like view of the channels of one source (i.e. "UCM"), one item per step."""
+        return RecordView(self, source)
+
+
+class RecordView(object):
+    """
+    Read-only sequence standing in for the former per-step object lists
+    (WeatherData, UCMData, UBLData, RSMData). Item n exposes the recorded
+    channels of the source at step n as attributes, i.e. UCMData[n].canTemp.
+    Nothing is stored per step.
+    """
+
+    def __init__(self, recorder, source):
+        self.recorder = recorder
+        self.source = source
+
+    def __len__(self):
+        return self.recorder.N
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self[i] for i in range(*n.indices(len(self)))]
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError("{} index out of range".format(self.source))
+        return Record(self.recorder, self.source, n)
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield Record(self.recorder, self.source, n)
+
+
+class Record(object):
+    """One step of a RecordView. Attributes are read from the recorder columns."""
+
+    RECORD_MSG = "'{0}' was not recorded. Add '{1}.{0}' to uwg.recordChannels before simulating."
+
+    def __init__(self, recorder, source, n):
+        self._recorder = recorder
+        self._source = source
+        self._n = n
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        name = "{}.{}".format(self._source, attr)
+        if name in self._recorder.levels:
+            return self._recorder.profile(name, self._n)
+        column = self._recorder.columns.get(name)
+        if column is None:
+            raise AttributeError(self.RECORD_MSG.format(attr, self._source))
+        return column[self._n]
+
+    def __repr__(self):
+        return "Record: {} step {}".format(self._source, self._n)
@@ -0,0 +1,301 @@
+"""Indexed store of the DOE reference buildings of readDOE.pkl.
+
+readDOE.pkl holds the reference Building, BEMDef and SchDef of the 16 building
+types, 3 built eras and 16 climate zones in three nested lists, and loading it
+unpickles all 768 of each. DOEStore splits it once into a data file with one
+pickle per (building type, era, climate zone) and a small index of their
+offsets, written next to readDOE.pkl. Templates are then read from the data
+file only when requested, and kept for the rest of the process.
+"""
+import os
+import copy
+import logging
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .utilities import PICKLE_PROTOCOL, write_atomic
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+class DOEStore(object):
+    """
+    Reference data of readDOE.pkl, indexed by (building type, era, climate zone).
+
+    The index and data files are built from readDOE.pkl the first time it is
+    opened, and rebuilt when its modification time or size changes. If they can
+    not be written, readDOE.pkl is read whole and kept in memory.
+
+    Templates are shared by every user of the store and are read only: the
+    layer properties of their Elements are frozen to tuples. bem returns per-run
+    copies that share the constructions of the template.
+
+    args:
+        path: path to readDOE.pkl
+
+    properties
+        path        # path to readDOE.pkl
+        index_path  # path to the index file
+        data_path   # path to the data file
+        refDOE      # lazy refDOE[i][j][k] view of the reference Buildings
+        refBEM      # lazy refBEM[i][j][k] view of the reference BEMDefs
+        refSchedule # lazy refSchedule[i][j][k] view of the reference SchDefs
+        sources     # dictionary of building type index to the digests of the
+                    # DOE csv files it was compiled from (empty if unknown)
+    """
+
+    INDEX_SUFFIX = ".idx"
+    DATA_SUFFIX = ".dat"
+    PROTOCOL = PICKLE_PROTOCOL
+    # Size of the reference data: building types, built eras, climate zones
+    SHAPE = (16, 3, 16)
+
+    KEY_MSG = "No DOE reference building for building type {}, era {}, zone {}."
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise Exception("readDOE.pkl file: '{}' does not exist.".format(path))
+        self.path = path
+        root = os.path.splitext(path)[0]
+        self.index_path = root + self.INDEX_SUFFIX
+        self.data_path = root + self.DATA_SUFFIX
+        self.logger = logging.getLogger(__name__)
+
+        stat = os.stat(path)
+        self._stamp = (float(stat.st_mtime), float(stat.st_size))
+        self._templates = {}    # (i, j, k) to (Building, BEMDef, SchDef)
+        self._offsets = None
+        self.sources = {}       # building type to digests of its DOE csv files (see readDOE.compile)
+
+        if not self._open():
+            self._build()
+
+        self.refDOE = TemplateView(self, 0)
+        self.refBEM = TemplateView(self, 1)
+        self.refSchedule = TemplateView(self, 2)
+
+    def __repr__(self):
+        return "DOEStore: {}, {} templates loaded".format(self.path, len(self._templates))
+
+    def template(self, i, j, k):
+        """
+        Shared (Building, BEMDef, SchDef) of building type i, era j and climate
+        zone k, read from the data file on first use. Do not modify.
+        """
+        key = (i, j, k)
+        template = self._templates.get(key)
+        if template is None:
+            template = pickle.loads(self.raw(i, j, k))
+            self._templates[key] = _prepare(template)
+        return template
+
+    def raw(self, i, j, k):
+        """Pickled template of building type i, era j and climate zone k, as stored in the data file."""
+        key = (i, j, k)
+        if self._offsets is None or key not in self._offsets:
+            raise Exception(self.KEY_MSG.format(i, j, k))
+        offset, length = self._offsets[key]
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def bem(self, i, j, k):
+        """
+        Per-run BEMDef of building type i, era j and climate zone k. The BEMDef,
+        its Building and its mass, wall and roof Elements are shallow copies of
+        the template, so a run can set their attributes (overrides, fluxes,
+        temperatures) without touching it. The layer properties of the Elements
+        are the (read only) tuples of the template, and only the layer
+        temperatures are copied.
+        """
+        bem = copy.copy(self.template(i, j, k)[1])
+        bem.building = copy.copy(bem.building)
+        bem.mass = _instance(bem.mass)
+        bem.wall = _instance(bem.wall)
+        bem.roof = _instance(bem.roof)
+        return bem
+
+    def schedule(self, i, j, k):
+        """Reference SchDef of building type i, era j and climate zone k (shared, read only)."""
+        return self.template(i, j, k)[2]
+
+    def _open(self):
+        # Read an up-to-date index, False if there is none
+        if not (os.path.exists(self.index_path) and os.path.exists(self.data_path)):
+            return False
+        try:
+            with open(self.index_path, "rb") as f:
+                stamp, offsets, sources = pickle.load(f)
+        except Exception:
+            return False
+        if stamp != self._stamp:
+            return False
+        self._offsets = offsets
+        self.sources = sources
+        return True
+
+    def _build(self):
+        # Split readDOE.pkl into the data and index files
+        refDOE, refBEM, refSchedule = read_pickle(self.path)
+        templates = dict(((i, j, k), (refDOE[i][j][k], refBEM[i][j][k], refSchedule[i][j][k]))
+                         for i in range(self.SHAPE[0]) for j in range(self.SHAPE[1]) for k in range(self.SHAPE[2]))
+        try:
+            self._offsets = write_store(self.path, templates)
+        except EnvironmentError as e:
+            self.logger.warning("Could not write DOE reference store '{}': {}".format(self.index_path, e))
+            # Keep the whole reference data in memory instead
+            for key in templates:
+                self._templates[key] = _prepare(templates[key])
+
+
+class TemplateView(object):
+    """
+    Read-only nested view of one kind of template of a DOEStore, indexed like the
+    lists of readDOE.pkl, i.e. store.refBEM[i][j][k]. Templates are read when the
+    last index is given.
+    """
+
+    def __init__(self, store, field, key=()):
+        self.store = store
+        self.field = field
+        self.key = key
+
+    def __len__(self):
+        return self.store.SHAPE[len(self.key)]
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += len(self)
+        if not 0 <= n < len(self):
+            raise IndexError("DOE reference index out of range")
+        key = self.key + (n,)
+        if len(key) < len(self.store.SHAPE):
+            return TemplateView(self.store, self.field, key)
+        return self.store.template(*key)[self.field]
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+
+def read_pickle(path):
+    """refDOE, refBEM and Schedule nested lists of a readDOE.pkl file."""
+    with open(path, "rb") as f:
+        refDOE = pickle.load(f)
+        refBEM = pickle.load(f)
+        refSchedule = pickle.load(f)
+    return refDOE, refBEM, refSchedule
+
+
+def write_store(path, templates, sources=None, blobs=None):
+    """
+    Write the data and index files of the DOEStore of readDOE.pkl file path.
+
+    args:
+        path: path to readDOE.pkl, which must be written first
+        templates: dictionary of (i, j, k) to (Building, BEMDef, SchDef)
+        sources: dictionary of building type index to the digests of its DOE csv files
+        blobs: dictionary of (i, j, k) to pickled templates (see DOEStore.raw),
+            used instead of pickling templates[(i, j, k)] again
+    returns:
+        dictionary of (i, j, k) to (offset, length) in the data file
+    """
+    root = os.path.splitext(path)[0]
+    stat = os.stat(path)
+    stamp = (float(stat.st_mtime), float(stat.st_size))
+
+    data = []
+    offsets = {}
+    offset = 0
+    for key in sorted(templates):
+        blob = blobs.get(key) if blobs else None
+        if blob is None:
+            blob = dumps(templates[key], [templates[key][0], templates[key][1].building])
+        offsets[key] = (offset, len(blob))
+        offset += len(blob)
+        data.append(blob)
+
+    write_atomic(root + DOEStore.DATA_SUFFIX, data)
+    write_atomic(root + DOEStore.INDEX_SUFFIX, [pickle.dumps((stamp, offsets, sources or {}), DOEStore.PROTOCOL)])
+    return offsets
+
+
+def dumps(obj, buildings):
+    """
+    Pickle obj without the loggers of the given Buildings in it, which can not be
+    pickled by every python. Loggers are given back by set_loggers when read.
+    """
+    loggers = [(b, b.__dict__.pop("logger", None)) for b in buildings]
+    try:
+        return pickle.dumps(obj, DOEStore.PROTOCOL)
+    finally:
+        for b, logger in loggers:
+            b.logger = logger
+
+
+def set_loggers(buildings):
+    """Give Buildings read from the store the logger of their module."""
+    for b in buildings:
+        b.logger = logging.getLogger(type(b).__module__)
+
+
+def _prepare(template):
+    # Give the Buildings of a template the loggers of their module, and freeze
+    # its Elements
+    set_loggers((template[0], template[1].building))
+    bem = template[1]
+    for element in (bem.mass, bem.wall, bem.roof):
+        _freeze(element)
+    return template
+
+
+def _freeze(element):
+    # Layer vectors of a template Element as tuples. The conduction factor cache
+    # is created here so that it is shared by the per-run instances.
+    element.layerThickness = tuple(element.layerThickness)
+    element.layerThermalCond = tuple(element.layerThermalCond)
+    element.layerVolHeat = tuple(element.layerVolHeat)
+    element.layerTemp = tuple(element.layerTemp)
+    element._factors = ((element.layerThickness, element.layerThermalCond, element.layerVolHeat), {})
+
+
+def _instance(element):
+    # Per-run copy of a template Element. The simulation replaces the layer
+    # vectors of an Element instead of modifying them in place; layerTemp is
+    # copied back to a list, as the batched conduction pads it with lists.
+    element = copy.copy(element)
+    element.layerTemp = list(element.layerTemp)
+    return element
+
+
+# Opened stores, keyed by absolute path of readDOE.pkl
+_stores = {}
+
+
+def load_store(path):
+    """
+    DOEStore of a readDOE.pkl file. Stores, and the templates read from them,
+    are kept for the rest of the process and reopened when the modification
+    time or size of the file changes.
+    """
+    key = os.path.abspath(path)
+    store = _stores.get(key)
+    if store is not None:
+        stat = os.stat(path) if os.path.exists(path) else None
+        if stat is None or (float(stat.st_mtime), float(stat.st_size)) != store._stamp:
+            store = None
+    if store is None:
+        store = DOEStore(path)
+        _stores[key] = store
+    return store
+
+
+def clear_cache():
+    """Forget all opened stores and their templates (the store files are kept)."""
+    _stores.clear()
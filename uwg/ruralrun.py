@@ -0,0 +1,94 @@
+"""Replay of the rural reference model across urban scenarios.
+
+The rural element surface heat balance and conduction and the rural vertical
+diffusion model (RSMDef.VDM) of simulate depend on the weather, the rural and
+road parameters and geoParam, never on the urban canyon, boundary layer or
+buildings. A RuralRun holds what the urban models read from them at each time
+step: the rural sensible heat flux, the RSM pressure at the boundary layer
+height and the RSM temperature, wind and density profiles.
+
+With uwg.ruralReuse set, the first run of a (period, rural inputs) records a
+RuralRun, and the next runs with the same key replay it instead of running the
+rural models (see uwg.rural_key).
+"""
+from array import array
+from collections import OrderedDict
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+class RuralRun(object):
+    """
+    Rural model outputs at time steps 1 to nt-1, one row of doubles per time
+    step: rural.sens, RSM.ublPres, then the nz levels of each of PROFILES.
+
+    args:
+        nt: total number of simulation time steps
+        nz: number of RSM levels (RSM.nzref)
+
+    properties
+        nt          # total number of simulation time steps
+        nz          # number of RSM levels
+        width       # number of values per time step
+        values      # array('d') of (nt-1) * width values
+    """
+
+    PROFILES = ("tempProf", "windProf", "densityProfC")
+
+    def __init__(self, nt, nz):
+        self.nt = nt
+        self.nz = nz
+        self.width = 2 + len(self.PROFILES) * nz
+        self.values = array('d', [0.]) * ((nt - 1) * self.width)
+
+    def __repr__(self):
+        return "RuralRun: {} time steps, {} levels".format(self.nt - 1, self.nz)
+
+    def record(self, it, rural, RSM):
+        """Store the rural outputs of time step it."""
+        k = (it - 1) * self.width
+        self.values[k] = rural.sens
+        self.values[k+1] = RSM.ublPres
+        k += 2
+        for name in self.PROFILES:
+            self.values[k:k+self.nz] = array('d', getattr(RSM, name))
+            k += self.nz
+
+    def replay(self, it, rural, RSM):
+        """Set the rural outputs of time step it, as computed by the recorded run."""
+        k = (it - 1) * self.width
+        rural.sens = self.values[k]
+        RSM.ublPres = self.values[k+1]
+        k += 2
+        for name in self.PROFILES:
+            setattr(RSM, name, self.values[k:k+self.nz].tolist())
+            k += self.nz
+
+
+# Recorded runs, keyed by uwg.rural_key, most recently used last
+_runs = OrderedDict()
+MAX_RUNS = 4
+
+
+def lookup(key):
+    """Recorded RuralRun of a key, or None."""
+    run = _runs.pop(key, None)
+    if run is not None:
+        _runs[key] = run
+    return run
+
+
+def store(key, run):
+    """Keep a recorded RuralRun. The MAX_RUNS most recently used runs are kept."""
+    _runs.pop(key, None)
+    _runs[key] = run
+    while len(_runs) > MAX_RUNS:
+        _runs.popitem(last=False)
+
+
+def clear_cache():
+    """Forget all recorded runs."""
+    _runs.clear()
@@ -1,3 +1,11 @@
+from __future__ import division
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
 class SchDef(object):
     """
     Schedule class\
@@ -28,6 +36,63 @@ class SchDef(object):
         self.Heat = Heat
         self.SWH = SWH
 
+    # Quantities of each row of LoadTable
+    LOAD_FIELDS = ("coolSetpoint", "heatSetpoint", "Elec", "Light", "Nocc", "Qocc", "SWH", "Gas",
+                   "vent", "intHeat", "intHeatFRad", "intHeatFLat")
+
+    def LoadTable(self, sensOcc, LatFOcc, RadFLight, RadFEquip):
+        """
+        Precompile the schedules into the building loads and setpoints of each
+        day type (WD,Sat,Sun) and hour, as used by the uwg time loop.
+
+        args:
+            sensOcc: sensible heat from occupant (W)
+            LatFOcc: latent heat fraction from occupant
+            RadFLight: radiant heat fraction from light
+            RadFEquip: radiant heat fraction from equipment
+
+        returns:
+            3x24 matrix of tuples ordered as LOAD_FIELDS: cooling and heating
+            setpoints (K), Elec, Light (W/m^2), Nocc (#/m^2), Qocc (W/m^2), SWH,
+            Gas (W/m^2), vent, intHeat (W/m^2) and its radiant and latent fractions
+        """
+        table = [[None for h in range(24)] for d in range(3)]
+        for d in range(3):
+            for h in range(24):
+                Elec = self.Qelec * self.Elec[d][h]             # Qelec x elec fraction for day
+                Light = self.Qlight * self.Light[d][h]          # Qlight x light fraction for day
+                Nocc = self.Nocc * self.Occ[d][h]               # Number of occupants x occ fraction for day
+                # Sensible Q occupant * fraction occupant sensible Q * number of occupants
+                Qocc = sensOcc * (1 - LatFOcc) * Nocc
+
+                # W/m2 from light, electricity, occupants
+                intHeat = Light + Elec + Qocc
+                if intHeat == 0.:
+                    # No internal heat: no radiant or latent part. The time loop used
+                    # to divide by zero at such an hour; the table is built for every
+                    # hour, including those a run never reaches, so it can not raise.
+                    intHeatFRad = intHeatFLat = 0.
+                else:
+                    # fraction of radiant heat from light and equipment of whole internal heat
+                    intHeatFRad = (RadFLight * Light + RadFEquip * Elec) / intHeat
+                    # fraction of latent heat (from occupants) of whole internal heat
+                    intHeatFLat = LatFOcc * sensOcc * Nocc/intHeat
+
+                table[d][h] = (
+                    self.Cool[d][h] + 273.15,
+                    self.Heat[d][h] + 273.15,
+                    Elec,
+                    Light,
+                    Nocc,
+                    Qocc,
+                    self.Vswh * self.SWH[d][h],                 # litres per hour x SWH fraction for day
+                    self.Qgas * self.Gas[d][h],                 # Gas Equip Schedule, per m^2 of floor
+                    self.Vent,                                  # m^3/s/m^2 of floor
+                    intHeat,
+                    intHeatFRad,
+                    intHeatFLat)
+        return table
+
     def __repr__(self):
         return "Schedule:(weekday from 8:00 - 18:00) \n Heating: {a}\n Cooling: {b}".format(
             a= "Null" if self.Heat is None else self.Heat[0][7:17],
@@ -0,0 +1,244 @@
+"""Parallel segmented runs of a long uwg simulation.
+
+run_segmented splits the period of a run into segments (calendar months by
+default) and simulates them in parallel with run_batch. Each segment starts
+spin_up_days before its first day, from the initial state of the uwg, and its
+first spin_up_days of outputs are dropped. The outputs of the segments are then
+stitched into the series of the whole period.
+
+A segment starts from the initial state instead of the state reached by the
+sequential run, so the stitched series differ from it after each seam until the
+segment has spun up. With reference=True the sequential run is simulated along
+with the segments, and the differences at each seam are reported (Seam).
+"""
+from __future__ import division, print_function
+
+import os
+from array import array
+
+from .uwg import uwg
+from .batch import run_batch
+from .simparam import SimParam
+from .recorder import Recorder, DEFAULT_CHANNELS
+from .uwgparams import load_params
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+# Day of the year of the first day of each month, and days of each month, of
+# the uwg calendar (SimParam.INOBIS, no leap years)
+INOBIS = SimParam.INOBIS
+MONTH_DAYS = tuple(b - a for a, b in zip(INOBIS, INOBIS[1:] + (365,)))
+
+# Channels compared at the seams
+SEAM_CHANNELS = ("UCM.canTemp", "UCM.Tdp", "UCM.canRHum")
+
+SEGMENT_MSG = "Segment {} of the run failed:\n{}"
+REFERENCE_MSG = "The sequential reference run failed:\n{}"
+PERIOD_MSG = "The run from {}/{} for {} days does not fit in one year."
+
+
+class Seam(object):
+    """
+    Difference of the stitched series to the sequential run after the start of
+    a segment.
+
+    properties
+        segment     # index of the segment starting at the seam
+        month       # month of the first day of the segment
+        day         # first day of the segment
+        hour        # index of the first hour of the segment in the stitched series
+        first       # dictionary of channel to the absolute difference at the first hour
+        maxdiff     # dictionary of channel to the max absolute difference over the
+                    # window hours from the seam
+    """
+
+    def __init__(self, segment, month, day, hour, first, maxdiff):
+        self.segment = segment
+        self.month = month
+        self.day = day
+        self.hour = hour
+        self.first = first
+        self.maxdiff = maxdiff
+
+    def __repr__(self):
+        return "Seam: segment {} from {}/{}, {}".format(
+            self.segment, self.month, self.day,
+            ", ".join("{} {:.3g}".format(name, self.maxdiff[name]) for name in sorted(self.maxdiff)))
+
+
+class SegmentedRun(object):
+    """
+    Stitched outputs of a segmented run.
+
+    properties
+        segments    # list of (month, day, days) of the segments
+        runs        # list of (month, day, days) simulated for each segment,
+                    # including the spin-up days
+        recorder    # Recorder of the whole period, with the stitched outputs
+        seams       # list of Seam, one per segment after the first (empty if
+                    # the run had no reference)
+        reference   # Recorder of the sequential run, or None
+        newPathName # path of the morphed EPW, if written
+    """
+
+    def __init__(self, segments, runs, recorder, seams=None, reference=None):
+        self.segments = segments
+        self.runs = runs
+        self.recorder = recorder
+        self.seams = seams or []
+        self.reference = reference
+        self.newPathName = None
+
+    def __repr__(self):
+        return "SegmentedRun: {} segments, {} hours".format(len(self.segments), self.recorder.N)
+
+    def seam_report(self):
+        """Text report of the differences at the seams."""
+        lines = ["Seam discrepancy of the stitched series to the sequential run"]
+        for seam in self.seams:
+            lines.append("  segment {:2d} from {:2d}/{:<2d} (hour {:5d}): {}".format(
+                seam.segment, seam.month, seam.day, seam.hour,
+                ", ".join("{} first {:.3g} max {:.3g}".format(name, seam.first[name], seam.maxdiff[name])
+                          for name in sorted(seam.maxdiff))))
+        return "\n".join(lines)
+
+
+def month_segments(month, day, days):
+    """(month, day, days) of the calendar months of a period."""
+    julian = INOBIS[month-1] + day - 1
+    stop = julian + days
+    if stop > 365:
+        raise Exception(PERIOD_MSG.format(month, day, days))
+    segments = []
+    while julian < stop:
+        m, d = _date(julian)
+        length = min(INOBIS[m-1] + MONTH_DAYS[m-1], stop) - julian
+        segments.append((m, d, length))
+        julian += length
+    return segments
+
+
+def day_segments(month, day, days, segment_days):
+    """(month, day, days) of segments of segment_days days of a period."""
+    julian = INOBIS[month-1] + day - 1
+    if julian + days > 365:
+        raise Exception(PERIOD_MSG.format(month, day, days))
+    segments = []
+    for start in range(julian, julian + days, segment_days):
+        m, d = _date(start)
+        segments.append((m, d, min(segment_days, julian + days - start)))
+    return segments
+
+
+def run_segmented(epw, uwg_param_file, overrides=None, segment_days=None, spin_up_days=7, channels=None,
+                  reference=False, window=24, write_epw=False, destination_dir=None, processes=None):
+    """
+    Simulate the period of a run as parallel segments, and stitch their outputs.
+
+    args:
+        epw: path of the rural EPW file
+        uwg_param_file: path of the .uwg file of the run
+        overrides: dictionary of uwg parameters overriding the .uwg file (see
+            batch.PARAMETERS), i.e. the period (Month, Day, nDay)
+        segment_days: days of each segment. None splits the period into
+            calendar months.
+        spin_up_days: days simulated before each segment (but the first)
+        channels: output channels recorded in addition to the EPW channels
+        reference: also simulate the sequential run, and report the seams
+        window: hours after each seam over which the differences are reported
+        write_epw: write the morphed EPW of the stitched outputs
+        destination_dir: folder of the morphed EPW (default: the folder of the EPW)
+        processes: number of worker processes (see batch.run_batch)
+    returns:
+        SegmentedRun
+    """
+    overrides = dict(overrides or {})
+    params = load_params(uwg_param_file)
+    month, day, days = [int(overrides.get(name, params[name])) for name in ("Month", "Day", "nDay")]
+    if segment_days is None:
+        segments = month_segments(month, day, days)
+    else:
+        segments = day_segments(month, day, days, int(segment_days))
+
+    # Simulated period of each segment, from spin_up_days before it
+    first = INOBIS[month-1] + day - 1
+    runs = []
+    for m, d, length in segments:
+        julian = INOBIS[m-1] + d - 1
+        start = max(first, julian - int(spin_up_days))
+        runs.append(_date(start) + (julian - start + length,))
+
+    scenarios = [dict(overrides, Month=m, Day=d, nDay=length) for m, d, length in runs]
+    if reference:
+        scenarios.append(dict(overrides, Month=month, Day=day, nDay=days))
+
+    results = {}
+    for result in run_batch(scenarios, epw, uwg_param_file, channels, processes=processes, rural_reuse=False):
+        if not result.ok:
+            if result.index == len(runs):
+                raise Exception(REFERENCE_MSG.format(result.error))
+            raise Exception(SEGMENT_MSG.format(result.index, result.error))
+        results[result.index] = result
+
+    # Stitch the segments, dropping their spin-up hours
+    recorder = Recorder(days * 24, _channels(channels))
+    stitched = dict((name, array('d')) for name in results[0].outputs)
+    for i, (segment, run) in enumerate(zip(segments, runs)):
+        result = results[i]
+        skip = (run[2] - segment[2]) * 24
+        for name, column in result.outputs.items():
+            nz = result.levels.get(name, 1)
+            stitched[name].extend(column[skip*nz:(skip + segment[2]*24)*nz])
+    recorder.restore((days * 24, results[0].levels, stitched))
+
+    seams = []
+    ref = None
+    if reference:
+        ref = Recorder(days * 24, _channels(channels))
+        ref.restore((days * 24, results[len(runs)].levels, results[len(runs)].outputs))
+        hour = 0
+        for i, (m, d, length) in enumerate(segments):
+            if i > 0:
+                stop = min(hour + window, days * 24)
+                first_diff = dict((name, abs(recorder[name][hour] - ref[name][hour])) for name in SEAM_CHANNELS)
+                maxdiff = dict((name, max(abs(recorder[name][h] - ref[name][h]) for h in range(hour, stop)))
+                               for name in SEAM_CHANNELS)
+                seams.append(Seam(i, m, d, hour, first_diff, maxdiff))
+            hour += length * 24
+
+    run = SegmentedRun(segments, runs, recorder, seams, ref)
+    if write_epw:
+        _write_epw(run, epw, uwg_param_file, overrides, destination_dir)
+    return run
+
+
+def _channels(channels):
+    # Channels recorded by the runs (see uwg.init_recorder)
+    if channels is None:
+        return None
+    return list(DEFAULT_CHANNELS) + list(channels)
+
+
+def _date(julian):
+    # (month, day) of a day of the year (0 for January 1st)
+    month = max(m for m in range(1, 13) if INOBIS[m-1] <= julian)
+    return month, julian - INOBIS[month-1] + 1
+
+
+def _write_epw(run, epw, uwg_param_file, overrides, destination_dir):
+    # Morphed EPW of the stitched outputs, written by a uwg of the whole period
+    epwDir, epwFileName = os.path.split(os.path.abspath(epw))
+    uwgParamDir, uwgParamFileName = os.path.split(os.path.abspath(uwg_param_file))
+    model = uwg(epwFileName, uwgParamFileName, epwDir, uwgParamDir, destination_dir or epwDir)
+    for name, value in overrides.items():
+        setattr(model, name, value)
+    model.read_epw()
+    model.set_input()
+    model.simTime = SimParam(model.dtSim, model.dtWeather, model.Month, model.Day, model.nDay)
+    model.recorder = run.recorder
+    model.write_epw()
+    run.newPathName = model.newPathName
@@ -0,0 +1,157 @@
+"""Weather columns of EPW files shared between processes.
+
+The batch runner publishes the Weather columns of each EPW file (all weather
+rows, in the units of Weather) once in a block of shared memory, and its
+workers attach to the blocks. Weather then takes read-only views of the rows
+of its period from the block, instead of reading the EPW sidecar and deriving
+the humidity and temperature columns in every worker.
+
+Requires multiprocessing.shared_memory (python 3.8). Without it nothing is
+published and Weather reads the EPW as usual.
+"""
+import os
+import logging
+from array import array
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+from .epw import load_epw_columns
+from .psychrometrics import HumFromRHumTemp
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+# Weather columns of a block, in the units of Weather (see weather.Weather)
+FIELDS = ("staTemp", "staTdp", "staRhum", "staPres", "staInfra", "staHor", "staDir", "staDif",
+          "staUdir", "staUmod", "staRobs", "staHum")
+
+# Weather field of each EPW column read by Weather
+EPW_COLUMNS = (("staTemp", 6), ("staTdp", 7), ("staRhum", 8), ("staPres", 9), ("staInfra", 12),
+               ("staHor", 13), ("staDir", 14), ("staDif", 15), ("staUdir", 20), ("staUmod", 21),
+               ("staRobs", 33))
+
+
+class SharedWeather(object):
+    """
+    Block of shared memory holding the FIELDS columns of an EPW file, as
+    float64 columns of nrows values.
+
+    args:
+        path: path of the .epw file
+        spec: (name, nrows, location) of a published block to attach to. If
+            None, a new block is created and filled from the EPW file.
+
+    properties
+        path        # path of the .epw file
+        name        # name of the shared memory block
+        nrows       # number of weather rows
+        location    # location name (line 1 of the EPW)
+        spec        # (name, nrows, location), to attach to the block in another process
+        owner       # True for the process that created the block, which unlinks it
+    """
+
+    SHARED_MEMORY_MSG = "Shared weather requires multiprocessing.shared_memory (python 3.8)."
+
+    def __init__(self, path, spec=None):
+        if shared_memory is None:
+            raise ImportError(self.SHARED_MEMORY_MSG)
+        self.path = os.path.abspath(path)
+        self.owner = spec is None
+
+        if self.owner:
+            epw = load_epw_columns(path)
+            self.nrows, self.location = epw.nrows, epw.location
+            columns = self._columns(epw)
+            self._shm = shared_memory.SharedMemory(create=True, size=max(len(FIELDS) * self.nrows * 8, 8))
+            self.name = self._shm.name
+            values = memoryview(self._shm.buf).cast('d')
+            for k, field in enumerate(FIELDS):
+                values[k*self.nrows:(k+1)*self.nrows] = array('d', columns[field])
+            values.release()
+        else:
+            self.name, self.nrows, self.location = spec
+            # Workers share the resource tracker of the publishing process,
+            # which keeps the block until it is unlinked by close
+            self._shm = shared_memory.SharedMemory(name=self.name)
+        self._values = memoryview(self._shm.buf).cast('d').toreadonly()
+
+    def __repr__(self):
+        return "SharedWeather: {}, {} rows in '{}'".format(self.path, self.nrows, self.name)
+
+    @property
+    def spec(self):
+        return (self.name, self.nrows, self.location)
+
+    def column(self, field, start=0, stop=None):
+        """Read-only view of column field for weather rows start to stop (excluded)."""
+        start, stop, step = slice(start, stop).indices(self.nrows)
+        k = FIELDS.index(field) * self.nrows
+        return self._values[k + start:k + max(start, stop)]
+
+    def close(self):
+        """Detach from the block, and remove it if this process created it."""
+        if self._shm is None:
+            return
+        self._values.release()
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def _columns(self, epw):
+        # Weather columns of all rows, as computed by Weather
+        columns = dict((field, epw.column(c)) for field, c in EPW_COLUMNS)
+        columns["staHum"] = [HumFromRHumTemp(columns["staRhum"][i], columns["staTemp"][i], columns["staPres"][i])
+                             for i in range(self.nrows)]
+        columns["staTemp"] = [s+273.15 for s in columns["staTemp"]]
+        return columns
+
+
+# Blocks attached in this process, keyed by absolute path of the EPW file
+_attached = {}
+
+
+def publish(paths):
+    """
+    Create the shared blocks of EPW files, i.e. before starting the workers of
+    a batch. Returns the list of SharedWeather, to close when the workers are
+    done, or an empty list if shared memory is not available.
+    """
+    if shared_memory is None:
+        return []
+    blocks = []
+    try:
+        for path in paths:
+            blocks.append(SharedWeather(path))
+    except Exception as e:
+        logging.getLogger(__name__).warning("Could not publish shared weather: {}".format(e))
+        for block in blocks:
+            block.close()
+        return []
+    return blocks
+
+
+def attach(specs):
+    """Attach to published blocks, given as a list of (path, spec), in a worker process."""
+    for path, spec in specs:
+        key = os.path.abspath(path)
+        if key not in _attached:
+            _attached[key] = SharedWeather(path, spec)
+
+
+def lookup(path):
+    """SharedWeather attached for an EPW file, or None."""
+    return _attached.get(os.path.abspath(path)) if _attached else None
+
+
+def detach():
+    """Detach from all attached blocks."""
+    for block in _attached.values():
+        block.close()
+    _attached.clear()
@@ -6,6 +6,7 @@ except NameError:
     pass
 
 import math
+from array import array
 
 
 class SimParam(object):
@@ -31,9 +32,14 @@ class SimParam(object):
         hourDay       % hour of the day (0 - 23hr)
         inobis        % julian day at the end of each month
         julian        % julian day
+        step          % current timestep (0 before the first UpdateDate/SetStep)
+        dayType       % day type of the current timestep (1 = weekday, 2 = sat, 3 = sun)
     """
     TIMESTEP_CONFLICT_MSG = "TIMESTEP ERROR! Timestep must be a factor of 3600."
 
+    # Julian day before the first day of each month (no leap years)
+    INOBIS = (0,31,59,90,120,151,181,212,243,273,304,334)
+
     def __init__(self,dt,timefor,M,DAY,days):
         self.dt = dt                                                        # uwg time simulation time step
         self.timeForcing = timefor                                          # weather data timestep
@@ -45,7 +51,7 @@ class SimParam(object):
         self.timeSim = self.timeDay*days                                    # how many steps in weather data simulation
         self.timeMax = 24.*3600.*days                                       # total seconds in simulation days
         self.nt = int(round(self.timeMax/self.dt+1))                        # total number of timesteps for uwg simuation
-        self.inobis = [0,31,59,90,120,151,181,212,243,273,304,334]
+        self.inobis = list(self.INOBIS)
         self.julian = self.inobis[self.month - 1] + DAY - 1
         #H1: (julian day * number of timesteps in a day) == sensor data index in epw
         H1 = int((self.inobis[self.month - 1] + DAY - 1) * self.timeDay)
@@ -53,6 +59,9 @@ class SimParam(object):
         self.timeFinal = int(H1 + self.timeDay * self.days - 1 + 8)         # sensor data in epw for final time based on julian day & timesteps
         self.secDay = 0                                                     # current seconds in day
         self.hourDay = 0                                                    # current hours in day
+        self.step = 0                                                       # current timestep
+        self.dayType = self.DayType(self.julian)                            # current day type
+        self._calendar = None                                               # see Calendar
 
     def __repr__(self):
         return "SimParam: Start = {}/{}, days = {}, timestep = {}s".format(
@@ -65,7 +74,75 @@ class SimParam(object):
     def is_near_zero(self,num,eps=1e-10):
         return abs(float(num)) < eps
 
+    def DayType(self, julian):
+        # Day type of a julian day (1 = weekday, 2 = sat, 3 = sun/other)
+        if julian % 7 == 0:
+            return 3
+        elif julian % 7 == 6:
+            return 2
+        return 1
+
+    def Calendar(self):
+        """
+        Calendar of every timestep of the simulation, computed once from the
+        initial date with integer arithmetic (no accumulation of dt).
+
+        returns:
+            dictionary of arrays indexed by timestep (0 = initial date, 1 to nt-1
+            after each step): month, day, julian, secDay, hourDay, dayType, and
+            isPrint (1 when the timestep reaches a print time, timePrint).
+        """
+        if self._calendar is not None:
+            return self._calendar
+
+        # Whole seconds when the timestep allows, to keep the day arithmetic exact
+        dt = int(self.dt) if self.dt == int(self.dt) else self.dt
+        julian0 = self.inobis[self.month - 1] + int(self.day) - 1
+
+        calendar = dict((key, array('i')) for key in
+                        ("month", "day", "julian", "hourDay", "dayType", "isPrint"))
+        calendar["secDay"] = array('i') if isinstance(dt, int) else array('d')
+
+        for it in range(self.nt):
+            elapsed = it * dt
+            julian = julian0 + int(elapsed // 86400)
+            secDay = elapsed - (julian - julian0) * 86400
+            month = 1
+            for j in range(1, 12):
+                if julian >= self.inobis[j]:
+                    month = j + 1
+            calendar["month"].append(month)
+            calendar["day"].append(julian - self.inobis[month - 1] + 1)
+            calendar["julian"].append(julian)
+            calendar["secDay"].append(secDay)
+            calendar["hourDay"].append(int(secDay // 3600))
+            calendar["dayType"].append(self.DayType(julian))
+            # print when a multiple of timePrint is reached during this timestep
+            calendar["isPrint"].append(
+                int(it > 0 and elapsed // self.timePrint > (elapsed - dt) // self.timePrint))
+
+        self._calendar = calendar
+        return calendar
+
+    def SetStep(self, it):
+        """Set the date of timestep it from the precomputed Calendar."""
+        calendar = self._calendar if self._calendar is not None else self.Calendar()
+        self.step = it
+        self.month = calendar["month"][it]
+        self.day = calendar["day"][it]
+        self.julian = calendar["julian"][it]
+        self.secDay = calendar["secDay"][it]
+        self.hourDay = calendar["hourDay"][it]
+        self.dayType = calendar["dayType"][it]
+
+    def IsPrintStep(self):
+        """True when the current timestep reaches a print time (timePrint)."""
+        calendar = self._calendar if self._calendar is not None else self.Calendar()
+        return calendar["isPrint"][self.step] == 1
+
     def UpdateDate(self):
+        # Advance one timestep by accumulation. The uwg time loop uses SetStep.
+        self.step += 1
         self.secDay = self.secDay + self.dt
 
         if self.is_near_zero(self.secDay - 3600*24):
@@ -81,3 +158,4 @@ class SimParam(object):
             raise Exception("{}. CURRENTLY AT {}.".format(self.TIMESTEP_CONFLICT_MSG, self.dt))
 
         self.hourDay = int(math.floor(self.secDay/3600.))       # 0 - 23hr
+        self.dayType = self.DayType(self.julian)
@@ -5,8 +5,10 @@ try:
 except NameError:
     pass
 
+import copy
 import math
 import logging
+from array import array
 
 
 class SolarCalcs(object):
@@ -37,9 +39,96 @@ class SolarCalcs(object):
         self.parameter = parameter
         self.rural = rural
 
+        self.geometry = None    # whole-run solar geometry (see precompute)
+
         # Logger will be disabled by default unless explicitly called in tests
         self.logger = logging.getLogger(__name__)
 
+    def precompute(self, nt, angles=None):
+        """
+        Solar geometry of the next nt time steps of the simulation, from the
+        current simTime. It only depends on the site, the calendar and the canyon
+        aspect ratio, so solarcalcs reads it from here instead of calling
+        solarangles at each step.
+
+        args:
+            nt: number of time steps
+            angles: Optional SolarCalcs with the geometry of the same site and
+                time steps (i.e. of another district). Its zenith angles are
+                used, and only the terms of the canyon aspect ratio are computed.
+
+        Properties
+            self.geometry   # dictionary of arrays with one value per time step:
+                            # zenith, tanzen, critOrient, cosZenith (direct to
+                            # horizontal radiation factor), Kw_term and Kr_term
+        """
+        simTime = self.simTime
+        canAspect = self.UCM.canAspect
+
+        geometry = dict((key, array('d')) for key in
+                        ("zenith", "tanzen", "critOrient", "cosZenith", "Kw_term", "Kr_term"))
+
+        site = (self.RSM.lon, self.RSM.lat, self.RSM.GMT)
+        if angles is not None and angles.geometry is not None and angles._geometryKey[1:] == site and \
+                angles._geometryStart == (simTime.step, simTime.dt) and len(angles.geometry["zenith"]) >= nt:
+            # Zenith angles of the same site and time steps
+            for key in ("zenith", "tanzen", "cosZenith"):
+                geometry[key] = angles.geometry[key][:nt]
+            for tanzen in geometry["tanzen"]:
+                critOrient = math.asin(min(abs(1./tanzen)/canAspect, 1.))
+                Kw_term, Kr_term = _canyon_terms(canAspect, critOrient, tanzen)
+                geometry["critOrient"].append(critOrient)
+                geometry["Kw_term"].append(Kw_term)
+                geometry["Kr_term"].append(Kr_term)
+        else:
+            # Walk a copy of the calendar through the run
+            self.simTime = copy.copy(simTime)
+            try:
+                for it in range(simTime.step + 1, simTime.step + nt + 1):
+                    self.simTime.SetStep(it)
+                    self.solarangles()
+                    Kw_term, Kr_term = _canyon_terms(canAspect, self.critOrient, self.tanzen)
+                    geometry["zenith"].append(self.zenith)
+                    geometry["tanzen"].append(self.tanzen)
+                    geometry["critOrient"].append(self.critOrient)
+                    geometry["cosZenith"].append(math.cos(self.zenith))
+                    geometry["Kw_term"].append(Kw_term)
+                    geometry["Kr_term"].append(Kr_term)
+            finally:
+                self.simTime = simTime
+
+        self.geometry = geometry
+        # Inputs of the geometry and time step before its first value
+        self._geometryKey = (canAspect,) + site
+        self._geometryStart = (simTime.step, simTime.dt)
+        return geometry
+
+    def reuse(self, other):
+        """
+        Use the solar geometry precomputed by another SolarCalcs, if it was
+        computed from the same canyon aspect ratio, site and time step (the
+        calendars of both simTime must be the same). Returns True if it is used.
+        """
+        if other.geometry is None or \
+                other._geometryKey != (self.UCM.canAspect, self.RSM.lon, self.RSM.lat, self.RSM.GMT) or \
+                other._geometryStart != (self.simTime.step, self.simTime.dt):
+            return False
+        self.geometry = other.geometry
+        self._geometryKey = other._geometryKey
+        self._geometryStart = other._geometryStart
+        return True
+
+    def _geometry_step(self):
+        # Index of the current time step in self.geometry, or None if it does not apply
+        if self.geometry is None or \
+                self._geometryKey != (self.UCM.canAspect, self.RSM.lon, self.RSM.lat, self.RSM.GMT):
+            return None
+        step, dt = self._geometryStart
+        if dt != self.simTime.dt:
+            return None
+        k = self.simTime.step - step - 1
+        return k if 0 <= k < len(self.geometry["zenith"]) else None
+
     def solarcalcs(self):
         """ Solar Calculation
         Mutates RSM, BEM, and UCM objects based on following parameters:
@@ -71,15 +160,22 @@ class SolarCalcs(object):
 
             self.logger.debug("{} Solar radiation > 0".format(__name__))
 
-            # calculate zenith tangent, and critOrient solar angles
-            self.solarangles()
+            k = self._geometry_step()
+            if k is not None:
+                # precomputed solar angles and fractional terms
+                self.zenith = self.geometry["zenith"][k]
+                self.tanzen = self.geometry["tanzen"][k]
+                self.critOrient = self.geometry["critOrient"][k]
+                self.horSol = max(self.geometry["cosZenith"][k]*self.dir, 0.0)   # Direct horizontal radiation
+                self.Kw_term = self.geometry["Kw_term"][k]
+                self.Kr_term = self.geometry["Kr_term"][k]
+            else:
+                # calculate zenith tangent, and critOrient solar angles
+                self.solarangles()
 
-            self.horSol = max(math.cos(self.zenith)*self.dir, 0.0)            # Direct horizontal radiation
-            # Fractional terms for wall & road
-            self.Kw_term = min(abs(1./self.UCM.canAspect*(0.5-self.critOrient/math.pi) \
-                + 1/math.pi*self.tanzen*(1-math.cos(self.critOrient))),1.)
-            self.Kr_term = min(abs(2.*self.critOrient/math.pi \
-                - (2/math.pi*self.UCM.canAspect*self.tanzen)*(1-math.cos(self.critOrient))), 1-2*self.UCM.canAspect*self.Kw_term)
+                self.horSol = max(math.cos(self.zenith)*self.dir, 0.0)            # Direct horizontal radiation
+                # Fractional terms for wall & road
+                self.Kw_term, self.Kr_term = _canyon_terms(self.UCM.canAspect, self.critOrient, self.tanzen)
 
 
             # Direct and diffuse solar radiation
@@ -218,3 +314,15 @@ class SolarCalcs(object):
         # critical canyon angle for which solar radiation reaches the road
         # has to do with street canyon orientation for given solar angle
         self.critOrient = math.asin(min(abs( 1./self.tanzen)/canAspect, 1. ))
+
+
+def _canyon_terms(canAspect, critOrient, tanzen):
+    """
+    Fractional terms of the direct solar radiation received by the walls and
+    the road of a canyon: (Kw_term, Kr_term).
+    """
+    Kw_term = min(abs(1./canAspect*(0.5-critOrient/math.pi) \
+        + 1/math.pi*tanzen*(1-math.cos(critOrient))),1.)
+    Kr_term = min(abs(2.*critOrient/math.pi \
+        - (2/math.pi*canAspect*tanzen)*(1-math.cos(critOrient))), 1-2*canAspect*Kw_term)
+    return Kw_term, Kr_term
@@ -0,0 +1,218 @@
+"""Cache of spun-up model states, to warm-start uwg runs.
+
+A run starts from uniform layer temperatures, a road at 293 K and rural
+profiles at the temperature of the first hour, and the first days of a run are
+spent leaving this state. With uwg.spinUpDays set, the uwg simulates the days
+before the start of the run once, and keeps the state reached at the start date
+in a SpinUpCache, keyed by the EPW content, the start date and the parameters of
+the run. Runs with the same key start from this state without spinning up.
+
+A run whose parameters are not in the cache can start from the state of the
+nearest parameters cached for the same EPW and start date, if they differ by no
+more than a relative tolerance and the model has the same structure (building
+typologies, element layers, boundary layer and vertical diffusion levels).
+"""
+import os
+import hashlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .utilities import PICKLE_PROTOCOL, write_atomic
+
+
+# Prognostic variables of the model objects: the state that a run carries from
+# the spin-up to its start date. Other attributes are recomputed in a time step.
+ELEMENT_STATE = ("layerTemp", "waterStorage", "T_ext", "T_int")
+STATE = {
+    "UCM": ("canTemp", "canHum"),
+    "UBL": ("ublTemp", "ublTempdx"),
+    "RSM": ("tempProf", "presProf"),
+    "building": ("indoorTemp", "indoorHum"),
+    "element": ELEMENT_STATE,
+    }
+
+# Default directory of the cache
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".uwg", "spinup")
+
+# Default max relative difference of the parameters of a nearest cached state
+TOLERANCE = 0.1
+
+
+class SpinUpCache(object):
+    """
+    Directory of spun-up states, one file per (EPW, start date, parameters).
+
+    args:
+        directory: cache directory, created when the first state is stored.
+            Defaults to CACHE_DIR.
+
+    properties
+        directory   # cache directory
+    """
+
+    SUFFIX = ".spinup"
+    PROTOCOL = PICKLE_PROTOCOL
+
+    def __init__(self, directory=None):
+        self.directory = directory if directory is not None else CACHE_DIR
+
+    def __repr__(self):
+        return "SpinUpCache: {}".format(self.directory)
+
+    def lookup(self, epw, start, params, fixed, tolerance=0.):
+        """
+        Cached state of a run, or of the nearest parameters within tolerance.
+
+        args:
+            epw: digest of the EPW file (see file_digest)
+            start: (month, day) of the start of the run
+            params: dictionary of parameter name to value
+            fixed: values that a cached state must match exactly (time steps,
+                forcing mode, spin-up days, model structure)
+            tolerance: max relative difference of the parameters of a nearest state
+        returns:
+            (state, distance), distance being 0. for the state of the same
+            parameters, or None if there is no such state
+        """
+        path = self._path(epw, start, params, fixed)
+        if os.path.exists(path):
+            entry = self._read(path, True)
+            if entry is not None and entry[1] == fixed:
+                return entry[2], 0.
+        if not tolerance or not os.path.isdir(self.directory):
+            return None
+
+        prefix = self._prefix(epw, start)
+        best = None
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith(prefix) and name.endswith(self.SUFFIX)):
+                continue
+            entry = self._read(os.path.join(self.directory, name), False)
+            if entry is None or entry[1] != fixed:
+                continue
+            d = distance(params, entry[0])
+            if d <= tolerance and (best is None or d < best[0]):
+                best = (d, name)
+        if best is None:
+            return None
+        entry = self._read(os.path.join(self.directory, best[1]), True)
+        return (entry[2], best[0]) if entry is not None else None
+
+    def store(self, epw, start, params, fixed, state):
+        """Store the spun-up state of a run (see lookup). The file is replaced at once."""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self._path(epw, start, params, fixed)
+        write_atomic(path, (pickle.dumps((params, fixed), self.PROTOCOL), pickle.dumps(state, self.PROTOCOL)))
+        return path
+
+    def clear(self):
+        """Remove the cached states."""
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(self.SUFFIX):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _prefix(self, epw, start):
+        return "{}_{:02d}{:02d}_".format(epw[:16], int(start[0]), int(start[1]))
+
+    def _path(self, epw, start, params, fixed):
+        # States of the same parameters with other fixed values are kept apart
+        return os.path.join(self.directory, self._prefix(epw, start) + digest(dict(params, fixed=fixed))[:16] +
+                            self.SUFFIX)
+
+    def _read(self, path, with_state):
+        # (params, fixed, state or None), None if the file can not be read
+        try:
+            with open(path, "rb") as f:
+                params, fixed = pickle.load(f)
+                state = pickle.load(f) if with_state else None
+        except Exception:
+            return None
+        return params, fixed, state
+
+
+def capture(model):
+    """Spun-up state of a simulated uwg: the STATE attributes of its model objects."""
+    return dict((name, dict((attr, getattr(obj, attr)) for attr in attrs))
+                for name, obj, attrs in _objects(model))
+
+
+def apply(model, state):
+    """Set the state of the model objects of an initialized uwg (see capture)."""
+    for name, obj, attrs in _objects(model):
+        for attr in attrs:
+            value = state[name][attr]
+            setattr(obj, attr, list(value) if isinstance(value, list) else value)
+
+
+def structure(model):
+    """
+    Shape of the state of an initialized uwg: states can only be applied to
+    models of the same structure.
+    """
+    bem = tuple((i, j) for i in range(len(model.bld)) for j in range(len(model.bld[i]))
+                if model.bld[i][j] > 0.)
+    layers = tuple(len(obj.layerTemp) for name, obj, attrs in _objects(model) if attrs is ELEMENT_STATE)
+    return (bem, layers, len(model.UBL.ublTempdx), len(model.RSM.tempProf))
+
+
+def distance(a, b):
+    """
+    Max relative difference of the values of two dictionaries of parameters
+    (numbers or nested lists of numbers). Infinite if their keys or shapes differ.
+    """
+    if sorted(a) != sorted(b):
+        return float("inf")
+    return max([_distance(a[key], b[key]) for key in a] or [0.])
+
+
+def digest(values):
+    """md5 digest of a dictionary of parameters."""
+    return hashlib.md5(repr(sorted(values.items())).encode("utf-8")).hexdigest()
+
+
+# Digests of files, keyed by absolute path, with their (mtime, size)
+_digests = {}
+
+
+def file_digest(path):
+    """md5 digest of the content of a file, computed again when it changes."""
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime, stat.st_size)
+    entry = _digests.get(key)
+    if entry is None or entry[0] != stamp:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                md5.update(chunk)
+        entry = _digests[key] = (stamp, md5.hexdigest())
+    return entry[1]
+
+
+def _objects(model):
+    # (name, object, state attributes) of the model objects of a uwg
+    objects = [("UCM", model.UCM, STATE["UCM"]), ("UBL", model.UBL, STATE["UBL"]),
+               ("RSM", model.RSM, STATE["RSM"]), ("road", model.UCM.road, ELEMENT_STATE),
+               ("rural", model.rural, ELEMENT_STATE)]
+    for i, bem in enumerate(model.BEM):
+        objects.extend((("BEM{}.building".format(i), bem.building, STATE["building"]),
+                        ("BEM{}.mass".format(i), bem.mass, ELEMENT_STATE),
+                        ("BEM{}.wall".format(i), bem.wall, ELEMENT_STATE),
+                        ("BEM{}.roof".format(i), bem.roof, ELEMENT_STATE)))
+    return objects
+
+
+def _distance(a, b):
+    if isinstance(a, (list, tuple)) or isinstance(b, (list, tuple)):
+        if not (isinstance(a, (list, tuple)) and isinstance(b, (list, tuple))) or len(a) != len(b):
+            return float("inf")
+        return max([_distance(x, y) for x, y in zip(a, b)] or [0.])
+    if a is None or b is None:
+        return 0. if a is b else float("inf")
+    scale = max(abs(a), abs(b))
+    return abs(a - b)/scale if scale > 0. else 0.
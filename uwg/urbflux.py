@@ -6,16 +6,43 @@ except NameError:
     pass
 
 from .infracalcs import infracalcs
+from .conduction import conduction
 from math import log
 
 
-def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
+def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM, rural=None):
     """
     Calculate the surface heat fluxes
     Output: [UCM,UBL,BEM]
+
+    The layer temperatures of all masses, roofs and walls (and of the rural
+    element, if its surface heat balance was done and it is passed as rural)
+    are updated in one batched conduction solve; the road follows in a second
+    one since its infrared depends on the updated wall temperatures.
+
+    districts.Districts calls the steps of urbflux separately, to solve the
+    conduction of the elements of all its districts together.
     """
+    surface_fluxes(UCM, BEM, forc, parameter, simTime)
+
+    # Update element temperatures (mass, roof, wall & rural) in one solve
+    elements = []
+    flx1 = []
+    bc = []
+    flx2 = []
+    conduction_inputs(BEM, rural, elements, flx1, bc, flx2)
+    conduction(elements, simTime.dt, flx1, bc, forc.deepTemp, flx2)
+
+    road_fluxes(UCM, BEM, forc, parameter, simTime, rural)
+    conduction([UCM.road], simTime.dt, [UCM.road.flux], [2.], forc.deepTemp, [0.])
+
+    canyon_fluxes(UCM, UBL, forc, parameter, RSM, advection(RSM))
+    return UCM,UBL,BEM
+
+
+def surface_fluxes(UCM, BEM, forc, parameter, simTime):
+    """Building energy model and surface heat balance of the roofs & walls."""
     T_can = UCM.canTemp
-    Cp = parameter.cp
     UCM.Q_roof = 0.
     sigma = 5.67e-8         # Stephan-Boltzman constant
     UCM.roofTemp = 0.       # Average urban roof temperature
@@ -37,36 +64,66 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
         # calculates the infrared radiation for wall, taking into account radiation exchange from road
         _infra_road_, BEM[j].wall.infra = infracalcs(UCM, forc, UCM.road.emissivity, e_wall, UCM.roadTemp, T_wall)
 
-        # Update element temperatures
-        BEM[j].mass.layerTemp = BEM[j].mass.Conduction(simTime.dt, BEM[j].building.fluxMass,1.,0.,BEM[j].building.fluxMass)
-        BEM[j].roof.SurfFlux(forc,parameter,simTime,UCM.canHum,T_can,max(forc.wind,UCM.canWind),1.,BEM[j].building.fluxRoof)
-        BEM[j].wall.SurfFlux(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind,1.,BEM[j].building.fluxWall)
+        # Surface heat balance of roof & wall
+        BEM[j].roof.SurfHeatBalance(forc,parameter,simTime,UCM.canHum,T_can,max(forc.wind,UCM.canWind))
+        BEM[j].wall.SurfHeatBalance(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind)
+
+
+def conduction_inputs(BEM, rural, elements, flx1, bc, flx2):
+    """
+    Append the masses, roofs and walls (and the rural element, if not None) with
+    their conduction inputs to the lists of a batched conduction solve.
+    """
+    for j in range(len(BEM)):
+        elements += [BEM[j].mass, BEM[j].roof, BEM[j].wall]
+        flx1 += [BEM[j].building.fluxMass, BEM[j].roof.flux, BEM[j].wall.flux]
+        bc += [1., 1., 1.]
+        flx2 += [BEM[j].building.fluxMass, BEM[j].building.fluxRoof, BEM[j].building.fluxWall]
+    if rural is not None:
+        elements.append(rural)
+        flx1.append(rural.flux)
+        bc.append(2.)
+        flx2.append(0.)
+
+
+def road_fluxes(UCM, BEM, forc, parameter, simTime, rural=None):
+    """
+    Surface temperatures of the conducted elements, and surface heat balance of
+    the road (whose conduction follows).
+    """
+    if rural is not None:
+        rural.T_ext = rural.layerTemp[0]
+        rural.T_int = rural.layerTemp[-1]
+
+    for j in range(len(BEM)):
+        for surf in (BEM[j].roof, BEM[j].wall):
+            surf.T_ext = surf.layerTemp[0]
+            surf.T_int = surf.layerTemp[-1]
 
         # Note the average wall & roof temperature
         UCM.wallTemp = UCM.wallTemp + BEM[j].frac*BEM[j].wall.layerTemp[0]
         UCM.roofTemp = UCM.roofTemp + BEM[j].frac*BEM[j].roof.layerTemp[0]
 
     # Update road infra calc (assume walls have similar emissivity, so use the last one)
+    e_wall = BEM[-1].wall.emissivity
     UCM.road.infra, _wall_infra = infracalcs(UCM,forc,UCM.road.emissivity,e_wall,UCM.roadTemp,UCM.wallTemp)
-    UCM.road.SurfFlux(forc,parameter,simTime,UCM.canHum,T_can,UCM.canWind,2.,0.)
-    UCM.roadTemp = UCM.road.layerTemp[0]
-
-    # Sensible & latent heat flux (total)
-    if UCM.latHeat != None:
-        UCM.latHeat = UCM.latHeat + UCM.latAnthrop + UCM.treeLatHeat + UCM.road.lat*(1.-UCM.bldDensity)
+    UCM.road.SurfHeatBalance(forc,parameter,simTime,UCM.canHum,UCM.canTemp,UCM.canWind)
 
-    # ---------------------------------------------------------------------
-    # Advective heat flux to UBL from VDM
-    #
-    # Note: UWG_Matlab code here is modified to compensate for rounding errors
-    # that occur when recursively adding forDens, intAdv1, and intAdv2.
-    # This causes issues in the UBL.advHeat calculatiuon when large (1e5)
-    # numbers are subtracted to produce small numbers (1e-10) that can
-    # differ from equivalent matlab calculations by a factor of 2.
-    # Values this small are ~ 0, but for consistency's sake Kahan Summation
-    # algorithm is applied to keep margin of difference from UWG_Matlab low.
-    # ---------------------------------------------------------------------
 
+def advection(RSM):
+    """
+    Vertical integrals of the RSM profiles for the advective heat flux to the
+    UBL: (forDens, intAdv1, intAdv2). They only depend on the RSM, so they are
+    shared by the districts of a rural site.
+
+    Note: UWG_Matlab code here is modified to compensate for rounding errors
+    that occur when recursively adding forDens, intAdv1, and intAdv2.
+    This causes issues in the UBL.advHeat calculatiuon when large (1e5)
+    numbers are subtracted to produce small numbers (1e-10) that can
+    differ from equivalent matlab calculations by a factor of 2.
+    Values this small are ~ 0, but for consistency's sake Kahan Summation
+    algorithm is applied to keep margin of difference from UWG_Matlab low.
+    """
     forDens = 0.0
     intAdv1 = 0.0
     intAdv2 = 0.0
@@ -98,6 +155,29 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
     forDens -= c1
     intAdv1 -= c2
     intAdv2 -= c3
+    return forDens, intAdv1, intAdv2
+
+
+def canyon_fluxes(UCM, UBL, forc, parameter, RSM, adv):
+    """
+    Road temperature after its conduction, total latent heat, and the advective
+    (adv, see advection) and convective heat fluxes to the UBL.
+    """
+    T_can = UCM.canTemp
+    Cp = parameter.cp
+
+    UCM.road.T_ext = UCM.road.layerTemp[0]
+    UCM.road.T_int = UCM.road.layerTemp[-1]
+    UCM.roadTemp = UCM.road.layerTemp[0]
+
+    # Sensible & latent heat flux (total)
+    if UCM.latHeat != None:
+        UCM.latHeat = UCM.latHeat + UCM.latAnthrop + UCM.treeLatHeat + UCM.road.lat*(1.-UCM.bldDensity)
+
+    # ---------------------------------------------------------------------
+    # Advective heat flux to UBL from VDM
+    # ---------------------------------------------------------------------
+    forDens, intAdv1, intAdv2 = adv
     UBL.advHeat = UBL.paralLength*Cp*forDens*(intAdv1-(UBL.ublTemp*intAdv2))/UBL.urbArea
 
     # ---------------------------------------------------------------------
@@ -128,9 +208,9 @@ def urbflux(UCM, UBL, BEM, forc, parameter, simTime, RSM):
     UCM.turbV = 1.9*UCM.ustarMod
     UCM.turbW = 1.3*UCM.ustarMod
 
-    # Urban wind profile
+    # Urban wind profile, one value per RSM level overwritten every time step
+    if len(UCM.windProf) != RSM.nzref:
+        UCM.windProf = [0. for x in range(RSM.nzref)]
     for iz in range(RSM.nzref):
-        UCM.windProf.append(UCM.ustar/parameter.vk*\
-            log((RSM.z[iz]+UCM.bldHeight-UCM.l_disp)/UCM.z0u))
-
-    return UCM,UBL,BEM
+        UCM.windProf[iz] = UCM.ustar/parameter.vk*\
+            log((RSM.z[iz]+UCM.bldHeight-UCM.l_disp)/UCM.z0u)
@@ -9,6 +9,33 @@ except NameError:
     pass
 
 
+# Pickle protocol of the files written by the uwg (checkpoints, spin-up states,
+# DOE store), readable by python 2 and IronPython
+PICKLE_PROTOCOL = 2
+
+
+def write_atomic(path, blobs):
+    """Write the byte strings blobs to a file, replaced at once.
+
+    The blobs are written to a temporary file next to path, which then
+    replaces path, so that readers never see a partly written file.
+
+    Args:
+        path: Path of the file.
+        blobs: Iterable of byte strings.
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        for blob in blobs:
+            f.write(blob)
+    if hasattr(os, "replace"):
+        os.replace(tmp_path, path)
+    else:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+
+
 def zeros(h, w):
     """create a (h x w) matrix of zeros.
 
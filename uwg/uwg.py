@@ -24,14 +24,11 @@ except NameError:
     pass
 
 import os
+import sys
 import math
 import copy
 import logging
-
-try:
-    import cPickle as pickle
-except ImportError:
-    import pickle
+from collections import OrderedDict
 
 from .simparam import SimParam
 from .weather import Weather
@@ -48,7 +45,18 @@ from .RSMDef import RSMDef
 from .solarcalcs import SolarCalcs
 from .psychrometrics import psychrometrics
 from .readDOE import readDOE
+from .epw import load_epw, load_epw_columns
+from .refstore import load_store
+from .uwgparams import load_params, SCHEMA, OPTIONAL
+from . import uwgparams
 from .urbflux import urbflux
+from .npbackend import NumpyBackend
+from .recorder import Recorder, DEFAULT_CHANNELS
+from .checkpoint import Checkpoint, digest
+from .spinup import SpinUpCache, file_digest, structure
+from .ruralrun import RuralRun
+from . import ruralrun
+from . import spinup
 from . import utilities
 
 # For debugging only
@@ -71,6 +79,9 @@ class uwg(object):
             as the rural EPW file (the epwDir).
         destinationFileName: Optional destination file name for the morphed EPW file.
             If left blank, the morphed file will append "_UWG" to the original file name.
+        backend: Optional simulation engine. "python" (default) runs the reference
+            time loop in simulate. "numpy" runs the array engine in npbackend, which
+            advances all typologies and element layers together (requires numpy).
     returns:
         newClimateFile: the path to a new EPW file that has been morphed to account
             for uban conditions.
@@ -112,7 +123,45 @@ class uwg(object):
     RESOURCE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "resources"))
     CURRENT_PATH = os.path.abspath(os.path.dirname(__file__))
 
-    def __init__(self, epwFileName, uwgParamFileName=None, epwDir=None, uwgParamDir=None, destinationDir=None, destinationFileName=None):
+    # Parameters that rerun can change, by group. Every rerun builds new BEM
+    # (from the shared DOE templates), UCM, UBL, RSM, road and rural objects,
+    # since simulate modifies them. In addition:
+    #   period      new calendar, weather, forcing and solar geometry
+    #   buildings   nothing else
+    #   urban       new solar geometry if the canyon aspect ratio (bldHeight,
+    #               bldDensity, verToHor) changes, new forcing rows if windMin changes
+    #   options     new forcing rows if forcingMode changes
+    # The EPW, the DOE templates and the layer discretization are kept.
+    RERUN_GROUPS = (
+        ("period", ("Month", "Day", "nDay", "dtSim", "dtWeather")),
+        ("buildings", ("bld", "zone", "flr_h", "glzR", "albRoof", "vegRoof", "SHGC", "albWall",
+                       "autosize", "sensOcc", "LatFOcc", "RadFOcc", "RadFEquip", "RadFLight")),
+        ("urban", ("bldHeight", "bldDensity", "verToHor", "charLength", "h_mix", "alb_road", "d_road",
+                   "sensAnth", "kRoad", "cRoad", "vegCover", "treeCoverage", "vegStart", "vegEnd",
+                   "albVeg", "rurVegCover", "latGrss", "latTree", "SchTraffic", "h_ubl1", "h_ubl2",
+                   "h_ref", "h_temp", "h_wind", "c_circ", "c_exch", "maxDay", "maxNight", "windMin",
+                   "h_obs")),
+        ("options", ("forcingMode", "recordChannels")),
+        )
+    RERUN_MSG = "rerun needs a uwg that was run (or initialized with init_input_obj) first."
+    RERUN_PARAM_MSG = "'{}' can not be changed by rerun. Parameters are listed in uwg.RERUN_GROUPS."
+
+    CHECKPOINT_MSG = "The checkpoint was taken from a run with other inputs or another period."
+    CHECKPOINT_BACKEND_MSG = "Checkpoints are only supported by the python backend."
+
+    # Parameters of the rural reference model (rural element, RSM and geoParam), in
+    # addition to the period, which the rural results of a run depend on (see rural_key)
+    RURAL_PARAMS = ("alb_road", "d_road", "kRoad", "cRoad", "rurVegCover", "h_obs", "h_ubl1", "h_ubl2",
+                    "h_ref", "h_temp", "h_wind", "c_circ", "c_exch", "maxDay", "maxNight", "windMin",
+                    "latTree", "latGrss", "albVeg", "vegStart", "vegEnd", "forcingMode")
+
+    SPINUP_MSG = "No weather before {}/{} in the EPW to spin up from. The run starts from the initial state."
+
+    BACKENDS = ("python", "numpy")
+    BACKEND_MSG = "Simulation backend must be one of {}. Got '{}'."
+
+    def __init__(self, epwFileName, uwgParamFileName=None, epwDir=None, uwgParamDir=None, destinationDir=None, destinationFileName=None,
+                 backend="python"):
 
         # Logger will be disabled by default unless explicitly called in tests
         self.logger = logging.getLogger(__name__)
@@ -139,8 +188,49 @@ class uwg(object):
         # EPW precision
         self.epw_precision = 1
 
+        # Simulation engine
+        if backend not in self.BACKENDS:
+            raise Exception(self.BACKEND_MSG.format(self.BACKENDS, backend))
+        self.backend = backend
+
+        # Output channels recorded at each print step (see recorder.CHANNELS and
+        # recorder.PROFILES, i.e. "UCM.windProf" for the hourly urban wind profile).
+        # None records the channels written to the EPW.
+        self.recordChannels = None
+
+        # Weather forcing at the simulation time step: "step" (held over each
+        # weather time step) or "linear" (interpolated). See Forcing.StepRows.
+        self.forcingMode = "step"
+
+        # Parameters of the .uwg file (uwgparams.UWGParams). Read from uwgParamFileName
+        # by read_input if not set; a record set here is used instead of the file.
+        self.params = None
+
+        # Simulated days between checkpoints of the simulation state (see resume).
+        # None takes no checkpoint. The last checkpoint is kept in self.checkpoint,
+        # and written to checkpointPath if set. Python backend only.
+        self.checkpointDays = None
+        self.checkpointPath = None
+        self.checkpoint = None
+
+        # Days simulated before the start date to spin the model up from its initial
+        # state (see spinup). The state reached at the start date is cached in spinUpDir
+        # (spinup.CACHE_DIR if None), and the runs with the same EPW, start date and
+        # parameters, or parameters within spinUpTolerance of them (relative difference),
+        # start from it without spinning up. None starts from the initial state.
+        self.spinUpDays = None
+        self.spinUpDir = None
+        self.spinUpTolerance = spinup.TOLERANCE
+
+        # Replay the rural reference model of a previous run with the same period
+        # and rural inputs (see ruralrun and rural_key), and record it for the next
+        # runs otherwise. Python backend only; not replayed with checkpoints.
+        self.ruralReuse = False
+
         # init uwg variables
         self._init_param_dict = None
+        self._period = None     # simulation period objects (see init_input_obj)
+        self._epwinput = None
 
         # Define Simulation and Weather parameters
         self.Month = None        # starting month (1-12)
@@ -261,17 +351,18 @@ class uwg(object):
         # Make dir path to epw file
         self.climateDataPath = os.path.join(self.epwDir, self.epwFileName)
 
-        # Open epw file and feed csv data to climate_data
+        # Open epw file (binary sidecar, see epw.load_epw_columns)
         try:
-            climate_data = utilities.read_csv(self.climateDataPath)
+            epw = load_epw_columns(self.climateDataPath)
         except Exception as e:
-            raise Exception("Failed to read epw file! {}".format(e.message))
+            raise Exception("Failed to read epw file! {}".format(e))
 
         # Read header lines (1 to 8) from EPW and ensure TMY2 format.
-        self._header = climate_data[0:8]
+        self._header = epw.header
 
-        # Read weather data from EPW for each time step in weather file. (lines 8 - end)
-        self.epwinput = climate_data[8:]
+        # Weather data from EPW for each time step in weather file (lines 8 - end)
+        # is only parsed when needed (see epwinput).
+        self._epwinput = None
 
         # Read Lat, Long (line 1 of EPW)
         self.lat = float(self._header[0][6])
@@ -296,6 +387,18 @@ class uwg(object):
         # Set new directory path for the moprhed EPW file
         self.newPathName = os.path.join(self.destinationDir, self.destinationFileName)
 
+    @property
+    def epwinput(self):
+        """Weather rows of the EPW file (lines 8 - end), split by comma."""
+        if self._epwinput is None:
+            # Rows are copied since write_epw overwrites some of their values.
+            self._epwinput = [list(row) for row in load_epw(self.climateDataPath).rows]
+        return self._epwinput
+
+    @epwinput.setter
+    def epwinput(self, value):
+        self._epwinput = value
+
     def read_input(self):
         """Section 3 - Read Input File (.m, file)
         Note: UWG_Matlab input files are xlsm, XML, .m, file.
@@ -310,224 +413,22 @@ class uwg(object):
 
         """
 
-        uwg_param_file_path = os.path.join(self.uwgParamDir, self.uwgParamFileName)
-
-        if not os.path.exists(uwg_param_file_path):
-            raise Exception("Param file: '{}' does not exist.".format(uwg_param_file_path))
-
-        # Open .uwg file and feed csv data to initializeDataFile
-        try:
-            uwg_param_data = utilities.read_csv(uwg_param_file_path)
-        except Exception as e:
-            raise Exception("Failed to read .uwg file! {}".format(e.message))
+        if self.params is None:
+            uwg_param_file_path = os.path.join(self.uwgParamDir, self.uwgParamFileName)
+            self.params = load_params(uwg_param_file_path)
 
         # The initialize.uwg is read with a dictionary so that users changing
         # line endings or line numbers doesn't make reading input incorrect
-        self._init_param_dict = {}
-        count = 0
-        while count < len(uwg_param_data):
-            row = uwg_param_data[count]
-            row = [row[i].replace(" ", "") for i in range(len(row))]  # strip white spaces
-
-            # Optional parameters might be empty so handle separately
-            is_optional_parameter = (
-                row != [] and
-                (
-                    row[0] == "albRoof" or
-                    row[0] == "vegRoof" or
-                    row[0] == "glzR" or
-                    row[0] == "hvac" or
-                    row[0] == "albWall" or
-                    row[0] == "SHGC"
-                )
-            )
-            try:
-                if row == [] or "#" in row[0]:
-                    count += 1
-                    continue
-                elif row[0] == "SchTraffic":
-                    # SchTraffic: 3 x 24 matrix
-                    trafficrows = uwg_param_data[count+1:count+4]
-                    self._init_param_dict[row[0]] = [utilities.str2fl(r[:24]) for r in trafficrows]
-                    count += 4
-                elif row[0] == "bld":
-                    # bld: 17 x 3 matrix
-                    bldrows = uwg_param_data[count+1:count+17]
-                    self._init_param_dict[row[0]] = [utilities.str2fl(r[:3]) for r in bldrows]
-                    count += 17
-                elif is_optional_parameter:
-                    self._init_param_dict[row[0]] = float(row[1]) if row[1] != "" else None
-                    count += 1
-                else:
-                    self._init_param_dict[row[0]] = float(row[1])
-                    count += 1
-            except ValueError:
-                print("Error while reading parameter at {} {}".format(count, row))
-
-        ipd = self._init_param_dict
+        self._init_param_dict = dict(self.params.values)
 
-        # Define Simulation and Weather parameters
-        if self.Month is None: self.Month = ipd['Month']
-        if self.Day is None: self.Day = ipd['Day']
-        if self.nDay is None: self.nDay = ipd['nDay']
-        if self.dtSim is None: self.dtSim = ipd['dtSim']
-        if self.dtWeather is None: self.dtWeather = ipd['dtWeather']
-
-        # HVAC system and internal laod
-        if self.autosize is None: self.autosize = ipd['autosize']
-        if self.sensOcc is None: self.sensOcc = ipd['sensOcc']
-        if self.LatFOcc is None: self.LatFOcc = ipd['LatFOcc']
-        if self.RadFOcc is None: self.RadFOcc = ipd['RadFOcc']
-        if self.RadFEquip is None: self.RadFEquip = ipd['RadFEquip']
-        if self.RadFLight is None: self.RadFLight = ipd['RadFLight']
-
-        # Define Urban microclimate parameters
-        if self.h_ubl1 is None: self.h_ubl1 = ipd['h_ubl1']
-        if self.h_ubl2 is None: self.h_ubl2 = ipd['h_ubl2']
-        if self.h_ref is None: self.h_ref = ipd['h_ref']
-        if self.h_temp is None: self.h_temp = ipd['h_temp']
-        if self.h_wind is None: self.h_wind = ipd['h_wind']
-        if self.c_circ is None: self.c_circ = ipd['c_circ']
-        if self.c_exch is None: self.c_exch = ipd['c_exch']
-        if self.maxDay is None: self.maxDay = ipd['maxDay']
-        if self.maxNight is None: self.maxNight = ipd['maxNight']
-        if self.windMin is None: self.windMin = ipd['windMin']
-        if self.h_obs is None: self.h_obs = ipd['h_obs']
-
-        # Urban characteristics
-        if self.bldHeight is None: self.bldHeight = ipd['bldHeight']
-        if self.h_mix is None: self.h_mix = ipd['h_mix']
-        if self.bldDensity is None: self.bldDensity = ipd['bldDensity']
-        if self.verToHor is None: self.verToHor = ipd['verToHor']
-        if self.charLength is None: self.charLength = ipd['charLength']
-        if self.alb_road is None: self.alb_road = ipd['albRoad']
-        if self.d_road is None: self.d_road = ipd['dRoad']
-        if self.sensAnth is None: self.sensAnth = ipd['sensAnth']
-        # if self.latAnth is None: self.latAnth = ipd['latAnth'] # Not used, taken out by JH.
-
-        # climate Zone
-        if self.zone is None: self.zone = ipd['zone']
-
-        # Vegetation parameters
-        if self.vegCover is None: self.vegCover = ipd['vegCover']
-        if self.treeCoverage is None: self.treeCoverage = ipd['treeCoverage']
-        if self.vegStart is None: self.vegStart = ipd['vegStart']
-        if self.vegEnd is None: self.vegEnd = ipd['vegEnd']
-        if self.albVeg is None: self.albVeg = ipd['albVeg']
-        if self.rurVegCover is None: self.rurVegCover = ipd['rurVegCover']
-        if self.latGrss is None: self.latGrss = ipd['latGrss']
-        if self.latTree is None: self.latTree = ipd['latTree']
-
-        # Define Traffic schedule
-        if self.SchTraffic is None: self.SchTraffic = ipd['SchTraffic']
-
-        # Define Road (Assume 0.5m of asphalt)
-        if self.kRoad is None: self.kRoad = ipd['kRoad']
-        if self.cRoad is None: self.cRoad = ipd['cRoad']
-
-        # Building stock fraction
-        if self.bld is None: self.bld = ipd['bld']
-
-        # Optional parameters
-        if self.albRoof is None: self.albRoof = ipd['albRoof']
-        if self.vegRoof is None: self.vegRoof = ipd['vegRoof']
-        if self.glzR is None: self.glzR = ipd['glzR']
-        if self.albWall is None: self.albWall = ipd['albWall']
-        if self.SHGC is None: self.SHGC = ipd['SHGC']
+        # Set the parameters that are not already defined (see uwgparams.SCHEMA)
+        self.params.apply(self)
 
     def check_required_inputs(self):
         # Fail if required parameters aren't correct
-        assert isinstance(self.Month, (float, int)), \
-            'Month must be a number. Got {}'.format(type(self.Month))
-        assert isinstance(self.Day, (float, int)), \
-            'Day must be a number. Got {}'.format(type(self.Day))
-        assert isinstance(self.nDay, (float, int)), \
-            'nDay must be a number. Got {}'.format(type(self.nDay))
-        assert isinstance(self.dtSim, float), \
-            'dtSim must be a float. Got {}'.format(type(self.dtSim))
-        assert isinstance(self.dtWeather, float), \
-            'dtWeather must be a float. Got {}'.format(type(self.dtWeather))
-        assert isinstance(self.autosize, (float, int)), \
-            'autosize must be a number. Got {}'.format(type(self.autosize))
-        assert isinstance(self.sensOcc, float), \
-            'sensOcc must be a float. Got {}'.format(type(self.sensOcc))
-        assert isinstance(self.LatFOcc, float), \
-            'LatFOcc must be a float. Got {}'.format(type(self.LatFOcc))
-        assert isinstance(self.RadFOcc, float), \
-            'RadFOcc must be a float. Got {}'.format(type(self.RadFOcc))
-        assert isinstance(self.RadFEquip, float), \
-            'RadFEquip must be a float. Got {}'.format(type(self.RadFEquip))
-        assert isinstance(self.RadFLight, float), \
-            'RadFLight must be a float. Got {}'.format(type(self.RadFLight))
-        assert isinstance(self.h_ubl1, float), \
-            'h_ubl1 must be a float. Got {}'.format(type(self.h_ubl1))
-        assert isinstance(self.h_ubl2, float), \
-            'h_ubl2 must be a float. Got {}'.format(type(self.h_ubl2))
-        assert isinstance(self.h_ref, float), \
-            'h_ref must be a float. Got {}'.format(type(self.h_ref))
-        assert isinstance(self.h_temp, float), \
-            'h_temp must be a float. Got {}'.format(type(self.h_temp))
-        assert isinstance(self.h_wind, float), \
-            'h_wind must be a float. Got {}'.format(type(self.h_wind))
-        assert isinstance(self.c_circ, float), \
-            'c_circ must be a float. Got {}'.format(type(self.c_circ))
-        assert isinstance(self.c_exch, float), \
-            'c_exch must be a float. Got {}'.format(type(self.c_exch))
-        assert isinstance(self.maxDay, float), \
-            'maxDay must be a float. Got {}'.format(type(self.maxDay))
-        assert isinstance(self.maxNight, float), \
-            'maxNight must be a float. Got {}'.format(type(self.maxNight))
-        assert isinstance(self.windMin, float), \
-            'windMin must be a float. Got {}'.format(type(self.windMin))
-        assert isinstance(self.h_obs, float), \
-            'h_obs must be a float. Got {}'.format(type(self.h_obs))
-        assert isinstance(self.bldHeight, float), \
-            'bldHeight must be a float. Got {}'.format(type(self.bldHeight))
-        assert isinstance(self.h_mix, float), \
-            'h_mix must be a float. Got {}'.format(type(self.h_mix))
-        assert isinstance(self.bldDensity, float), \
-            'bldDensity must be a float. Got {}'.format(type(self.bldDensity))
-        assert isinstance(self.verToHor, float), \
-            'verToHor must be a float. Got {}'.format(type(self.verToHor))
-        assert isinstance(self.charLength, float), \
-            'charLength must be a float. Got {}'.format(type(self.charLength))
-        assert isinstance(self.alb_road, float), \
-            'alb_road must be a float. Got {}'.format(type(self.alb_road))
-        assert isinstance(self.d_road, float), \
-            'd_road must be a float. Got {}'.format(type(self.d_road))
-        assert isinstance(self.sensAnth, float), \
-            'sensAnth must be a float. Got {}'.format(type(self.sensAnth))
-        # assert isinstance(self.latAnth, float) # Take this out as isn't being used
-        assert isinstance(self.bld, list), \
-            'bld must be a list. Got {}'.format(type(self.bld))
-        assert len(self.bld) == 16, \
-            'length of bld must be 16. Got {}'.format(len(self.bld))
-        assert isinstance(self.latTree, float), \
-            'latTree must be a float. Got {}'.format(type(self.latTree))
-        assert isinstance(self.latGrss, float), \
-            'latGrss must be a float. Got {}'.format(type(self.latGrss))
-        assert isinstance(self.zone, (float, int)), \
-            'zone must be a number. Got {}'.format(type(self.zone))
-        assert isinstance(self.vegStart, (float, int)), \
-            'vegStart must be a number. Got {}'.format(type(self.vegStart))
-        assert isinstance(self.vegEnd, (float, int)), \
-            'vegEnd must be a number. Got {}'.format(type(self.vegEnd))
-        assert isinstance(self.vegCover, float), \
-            'vegCover must be a float. Got {}'.format(type(self.vegCover))
-        assert isinstance(self.treeCoverage, float), \
-            'treeCoverage must be a float. Got {}'.format(type(self.treeCoverage))
-        assert isinstance(self.albVeg, float), \
-            'albVeg must be a float. Got {}'.format(type(self.albVeg))
-        assert isinstance(self.rurVegCover, float), \
-            'rurVegCover must be a float. Got {}'.format(type(self.rurVegCover))
-        assert isinstance(self.kRoad, float), \
-            'kRoad must be a float. Got {}'.format(type(self.kRoad))
-        assert isinstance(self.cRoad, float), \
-            'cRoad must be a float. Got {}'.format(type(self.cRoad))
-        assert isinstance(self.SchTraffic, list), \
-            'SchTraffic must be a list. Got {}'.format(type(self.SchTraffic))
-        assert len(self.SchTraffic) == 3, \
-            'length of SchTraffic must be 3. Got {}'.format(len(self.SchTraffic))
+        for key, attr, kind, nrows, ncols in SCHEMA:
+            if kind != OPTIONAL:
+                uwgparams.check(attr, getattr(self, attr))
 
     def set_input(self):
         """ Set inputs from .uwg input file if not already defined, the check if all
@@ -536,7 +437,7 @@ class uwg(object):
 
         # If a uwgParamFileName is set, then read inputs from .uwg file.
         # User-defined class properties will override the inputs from the .uwg file.
-        if self.uwgParamFileName is not None:
+        if self.uwgParamFileName is not None or self.params is not None:
             print("\nReading uwg file input.")
             self.read_input()
         else:
@@ -557,13 +458,10 @@ class uwg(object):
         """
 
         if not os.path.exists(self.readDOE_file_path):
-            raise Exception("readDOE.pkl file: '{}' does not exist.".format(readDOE_file_path))
+            raise Exception("readDOE.pkl file: '{}' does not exist.".format(self.readDOE_file_path))
 
-        readDOE_file = open(self.readDOE_file_path, 'rb')  # open pickle file in binary form
-        refDOE = pickle.load(readDOE_file)
-        refBEM = pickle.load(readDOE_file)
-        refSchedule = pickle.load(readDOE_file)
-        readDOE_file.close()
+        # Reference templates are read from the store only for the typologies used
+        refStore = load_store(self.readDOE_file_path)
 
         # Define building energy models
         k = 0
@@ -578,12 +476,15 @@ class uwg(object):
 
         self.BEM = []           # list of BEMDef objects
         self.Sch = []           # list of Schedule objects
+        self.SchTable = []      # list of 3x24 load tables (see SchDef.LoadTable)
 
         for i in range(16):    # 16 building types
             for j in range(3):  # 3 built eras
                 if self.bld[i][j] > 0.:
-                    # Add to BEM list
-                    self.BEM.append(refBEM[i][j][self.zone])
+                    # Add to BEM list. Each typology gets its own copy of the reference
+                    # BEMDef, Building and Elements.
+                    bem = refStore.bem(i, j, self.zone)
+                    self.BEM.append(bem)
                     self.BEM[k].frac = self.bld[i][j]
                     self.BEM[k].fl_area = self.bld[i][j] * total_urban_bld_area
 
@@ -606,7 +507,9 @@ class uwg(object):
                     self.SHGC_total += self.BEM[k].frac * self.BEM[k].building.shgc
                     self.alb_wall_total += self.BEM[k].frac * self.BEM[k].wall.albedo
                     # Add to schedule list
-                    self.Sch.append(refSchedule[i][j][self.zone])
+                    self.Sch.append(refStore.schedule(i, j, self.zone))
+                    self.SchTable.append(self.Sch[k].LoadTable(
+                        self.sensOcc, self.LatFOcc, self.RadFLight, self.RadFEquip))
                     k += 1
 
     def init_input_obj(self):
@@ -632,11 +535,20 @@ class uwg(object):
 
         climate_file_path = os.path.join(self.epwDir, self.epwFileName)
 
-        self.simTime = SimParam(self.dtSim, self.dtWeather, self.Month,
-                                self.Day, self.nDay)  # simulation time parametrs
-        # weather file data for simulation time period
-        self.weather = Weather(climate_file_path, self.simTime.timeInitial, self.simTime.timeFinal)
-        self.forcIP = Forcing(self.weather.staTemp, self.weather)  # initialized Forcing class
+        # Simulation period objects, kept by rerun while the period is unchanged
+        period = (climate_file_path, self.dtSim, self.dtWeather, self.Month, self.Day, self.nDay)
+        if self._period is None or self._period[0] != period:
+            simTime = SimParam(self.dtSim, self.dtWeather, self.Month,
+                               self.Day, self.nDay)  # simulation time parametrs
+            # weather file data for simulation time period
+            self.weather = Weather(climate_file_path, simTime.timeInitial, simTime.timeFinal)
+            self.forcIP = Forcing(self.weather.staTemp, self.weather)  # initialized Forcing class
+            simTime.Calendar()
+            # (key, initial simTime, forcing rows by StepRows arguments, SolarCalcs with the solar geometry)
+            self._period = (period, simTime, {}, None)
+
+        # simTime is advanced by simulate, each run starts from a copy (sharing the calendar)
+        self.simTime = copy.copy(self._period[1])
         self.forc = Forcing()  # empty forcing class
 
         # Initialize geographic Param and Urban Boundary Layer Objects
@@ -670,10 +582,6 @@ class uwg(object):
         self.road = Element(self.alb_road, emis, thickness_vector, material_vector, road_veg_coverage,
                             road_T_init, road_horizontal, name="urban_road")
 
-        self.rural = copy.deepcopy(self.road)
-        self.rural.vegCoverage = self.rurVegCover
-        self.rural._name = "rural_road"
-
         # Reference site class (also include VDM)
         self.RSM = RSMDef(self.lat, self.lon, self.GMT, self.h_obs,
                           self.weather.staTemp[0], self.weather.staPres[0], self.geoParam, self.z_meso_dir_path)
@@ -688,43 +596,21 @@ class uwg(object):
         self.UCM.h_mix = self.h_mix
 
         # Define Road Element & buffer to match ground temperature depth
-        roadMat, newthickness = procMat(self.road, self.MAXTHICKNESS, self.MINTHICKNESS)
+        soil_depths = [self.depth_soil[i][0] for i in range(self.nSoil)]
+        roadMat, newthickness, soilindex = discretize(
+            self.road, self.MAXTHICKNESS, self.MINTHICKNESS, soil_depths, self.SOIL)
+        if soilindex is not None:
+            self.soilindex1 = soilindex
 
-        for i in range(self.nSoil):
-            # if soil depth is greater then the thickness of the road
-            # we add new slices of soil at max thickness until road is greater or equal
-
-            is_soildepth_equal = self.is_near_zero(self.depth_soil[i][0] - sum(newthickness), 1e-15)
-
-            if is_soildepth_equal or (self.depth_soil[i][0] > sum(newthickness)):
-                while self.depth_soil[i][0] > sum(newthickness):
-                    newthickness.append(self.MAXTHICKNESS)
-                    roadMat.append(self.SOIL)
-                self.soilindex1 = i
-                break
+        # Define Rural Element, with the layers of the road
+        ruralMat, ruralthickness = list(roadMat), list(newthickness)
+        if soilindex is not None:
+            self.soilindex2 = soilindex
 
         self.road = Element(self.road.albedo, self.road.emissivity, newthickness, roadMat,
                             self.road.vegCoverage, self.road.layerTemp[0], self.road.horizontal, self.road._name)
-
-        # Define Rural Element
-        ruralMat, newthickness = procMat(self.rural, self.MAXTHICKNESS, self.MINTHICKNESS)
-
-        for i in range(self.nSoil):
-            # if soil depth is greater then the thickness of the road
-            # we add new slices of soil at max thickness until road is greater or equal
-
-            is_soildepth_equal = self.is_near_zero(self.depth_soil[i][0] - sum(newthickness), 1e-15)
-
-            if is_soildepth_equal or (self.depth_soil[i][0] > sum(newthickness)):
-                while self.depth_soil[i][0] > sum(newthickness):
-                    newthickness.append(self.MAXTHICKNESS)
-                    ruralMat.append(self.SOIL)
-
-                self.soilindex2 = i
-                break
-
-        self.rural = Element(self.rural.albedo, self.rural.emissivity, newthickness,
-                             ruralMat, self.rural.vegCoverage, self.rural.layerTemp[0], self.rural.horizontal, self.rural._name)
+        self.rural = Element(self.road.albedo, self.road.emissivity, ruralthickness, ruralMat,
+                             self.rurVegCover, road_T_init, road_horizontal, name="rural_road")
 
     def hvac_autosize(self):
         """ Section 6 - HVAC Autosizing (unlimited cooling & heating) """
@@ -734,154 +620,133 @@ class uwg(object):
                 self.BEM[i].building.coolCap = 9999.
                 self.BEM[i].building.heatCap = 9999.
 
-    def simulate(self):
+    def forcing_rows(self):
+        """Forcing.StepRows of the run, shared by the runs of the same period."""
+        key = (self.simTime.nt, self.simTime.dt/3600., self.geoParam.windMin, self.forcingMode)
+        rows = self._period[2].get(key)
+        if rows is None:
+            rows = self._period[2][key] = self.forcIP.StepRows(*key)
+        return rows
+
+    def solar_calcs(self, BEM):
+        """
+        SolarCalcs of the run, with the solar geometry of the whole run. The
+        geometry is shared by the runs of the same period and site (see
+        SolarCalcs.reuse).
+        """
+        solar = SolarCalcs(self.UCM, BEM, self.simTime,
+                           self.RSM, self.forc, self.geoParam, self.rural)
+        previous = self._period[3]
+        if previous is None or not solar.reuse(previous):
+            solar.precompute(self.simTime.nt - 1)
+            self._period = self._period[:3] + (solar,)
+        return solar
+
+    def simulate(self, checkpoint=None):
         """ Section 7 - uwg main section
 
+        args:
+            checkpoint: Optional Checkpoint of this run to continue from (see resume).
+
             self.N                  # Total hours in simulation
             self.ph                 # per hour
             self.dayType            # 3=Sun, 2=Sat, 1=Weekday
-            self.ceil_time_step     # simulation timestep (dt) fitted to weather file timestep
-
-            # Output of object instance vector
-            self.WeatherData        # Nx1 vector of forc instance
-            self.UCMData            # Nx1 vector of UCM instance
-            self.UBLData            # Nx1 vector of UBL instance
-            self.RSMData            # Nx1 vector of RSM instance
+            self.forcRows           # forcing at each simulation timestep (see Forcing.StepRows)
+
+            # Output
+            self.recorder           # Recorder with a column of N values per recorded channel
+            self.WeatherData        # Nx1 lazy view of the recorded forc channels
+            self.UCMData            # Nx1 lazy view of the recorded UCM channels
+            self.UBLData            # Nx1 lazy view of the recorded UBL channels
+            self.RSMData            # Nx1 lazy view of the recorded RSM channels
             self.USMData            # Nx1 vector of USM instance
         """
 
+        if self.spinUpDays and checkpoint is None:
+            self.warm_start()
+
+        if self.backend == "numpy":
+            if checkpoint is not None or self.checkpointDays:
+                raise Exception(self.CHECKPOINT_BACKEND_MSG)
+            return NumpyBackend(self).simulate()
+
         self.N = int(self.simTime.days * 24)       # total number of hours in simulation
         n = 0                                      # weather time step counter
         self.ph = self.simTime.dt/3600.            # dt (simulation time step) in hours
 
         # Data dump variables
-        time = range(self.N)
-
-        self.WeatherData = [None for x in range(self.N)]
-        self.UCMData = [None for x in range(self.N)]
-        self.UBLData = [None for x in range(self.N)]
-        self.RSMData = [None for x in range(self.N)]
-        self.USMData = [None for x in range(self.N)]
+        self.init_recorder()
+
+        lastSchRow = None                          # (day type, hour) of the applied schedules
+
+        # Weather forcing at the simulation time step
+        self.forcRows = self.forcing_rows()
+
+        # Solar calculation, with the solar geometry of the whole run (self.solar.geometry)
+        self.solar = self.solar_calcs(self.BEM)
+
+        # First time step, from the start or after the checkpoint
+        start = 1
+        if checkpoint is not None:
+            if checkpoint.key != self.checkpoint_key():
+                raise Exception(self.CHECKPOINT_MSG)
+            checkpoint.restore(self)
+            start, n = checkpoint.step + 1, checkpoint.n
+
+        # Time steps between checkpoints (0 for none)
+        checkpointSteps = int(round(self.checkpointDays*24*3600/self.simTime.dt)) if self.checkpointDays else 0
+
+        # Rural reference model replayed from, or recorded for, the runs with the
+        # same rural inputs. The rural element is not updated when replayed, so
+        # that runs with checkpoints do not replay.
+        ruralReplay = ruralRecord = None
+        if self.ruralReuse and checkpoint is None:
+            ruralKey = self.rural_key()
+            if not checkpointSteps:
+                ruralReplay = ruralrun.lookup(ruralKey)
+            if ruralReplay is None:
+                ruralRecord = RuralRun(self.simTime.nt, self.RSM.nzref)
 
         print('\nSimulating new temperature and humidity values for {} days from {}/{}.\n'.format(
             int(self.nDay), int(self.Month), int(self.Day)))
         self.logger.info("Start simulation")
 
-        for it in range(1, self.simTime.nt, 1):  # for every simulation time-step (i.e 5 min) defined by uwg
-            # Update water temperature (estimated)
-            if self.nSoil < 3: # correction to original matlab code
-                # for BUBBLE/CAPITOUL/Singapore only
-                self.forc.deepTemp = sum(self.forcIP.temp)/float(len(self.forcIP.temp))
-                self.forc.waterTemp = sum(
-                    self.forcIP.temp)/float(len(self.forcIP.temp)) - 10.      # for BUBBLE/CAPITOUL/Singapore only
-            else:
-                # soil temperature by depth, by month
-                self.forc.deepTemp = self.Tsoil[self.soilindex1][self.simTime.month-1]
-                self.forc.waterTemp = self.Tsoil[2][self.simTime.month-1]
-
-            # There's probably a better way to update the weather...
-            self.simTime.UpdateDate()
-
-            self.logger.info("\n{0} m={1}, d={2}, h={3}, s={4}".format(
-                __name__, self.simTime.month, self.simTime.day, self.simTime.secDay/3600., self.simTime.secDay))
-
-            # simulation time increment raised to weather time step
-            self.ceil_time_step = int(math.ceil(it * self.ph))-1
-            # minus one to be consistent with forcIP list index
-            # Updating forcing instance
-            # horizontal Infrared Radiation Intensity (W m-2)
-            self.forc.infra = self.forcIP.infra[self.ceil_time_step]
-            # wind speed (m s-1)
-            self.forc.wind = max(self.forcIP.wind[self.ceil_time_step], self.geoParam.windMin)
-            self.forc.uDir = self.forcIP.uDir[self.ceil_time_step]          # wind direction
-            # specific humidty (kg kg-1)
-            self.forc.hum = self.forcIP.hum[self.ceil_time_step]
-            self.forc.pres = self.forcIP.pres[self.ceil_time_step]          # Pressure (Pa)
-            self.forc.temp = self.forcIP.temp[self.ceil_time_step]          # air temperature (C)
-            self.forc.rHum = self.forcIP.rHum[self.ceil_time_step]          # Relative humidity (%)
-            self.forc.prec = self.forcIP.prec[self.ceil_time_step]          # Precipitation (mm h-1)
-            # horizontal solar diffuse radiation (W m-2)
-            self.forc.dif = self.forcIP.dif[self.ceil_time_step]
-            # normal solar direct radiation (W m-2)
-            self.forc.dir = self.forcIP.dir[self.ceil_time_step]
+        for it in range(start, self.simTime.nt, 1):  # for every simulation time-step (i.e 5 min) defined by uwg
+            self.forcing_step(it)
+
             # Canyon humidity (absolute) same as rural
-            self.UCM.canHum = copy.copy(self.forc.hum)
+            self.UCM.canHum = self.forc.hum
 
             # Update solar flux
-            self.solar = SolarCalcs(self.UCM, self.BEM, self.simTime,
-                                    self.RSM, self.forc, self.geoParam, self.rural)
             self.rural, self.UCM, self.BEM = self.solar.solarcalcs()
 
             # Update building & traffic schedule
-            # Assign day type (1 = weekday, 2 = sat, 3 = sun/other)
-            if self.is_near_zero(self.simTime.julian % 7):
-                self.dayType = 3                                        # Sunday
-            elif self.is_near_zero(self.simTime.julian % 7 - 6.):
-                self.dayType = 2                                        # Saturday
-            else:
-                self.dayType = 1                                        # Weekday
+            # Day type (1 = weekday, 2 = sat, 3 = sun/other)
+            self.dayType = self.simTime.dayType
 
             # Update anthropogenic heat load for each hour (building & UCM)
             self.UCM.sensAnthrop = self.sensAnth * (self.SchTraffic[self.dayType-1][self.simTime.hourDay])
 
-            # Update the energy components for building types defined in initialize.uwg
-            for i in range(len(self.BEM)):
-                # Set temperature
-                self.BEM[i].building.coolSetpointDay = self.Sch[i].Cool[self.dayType -
-                                                                        1][self.simTime.hourDay] + 273.15  # add from temperature schedule for cooling
-                self.BEM[i].building.coolSetpointNight = self.BEM[i].building.coolSetpointDay
-                self.BEM[i].building.heatSetpointDay = self.Sch[i].Heat[self.dayType -
-                                                                        1][self.simTime.hourDay] + 273.15  # add from temperature schedule for heating
-                self.BEM[i].building.heatSetpointNight = self.BEM[i].building.heatSetpointDay
-
-                # Internal Heat Load Schedule (W/m^2 of floor area for Q)
-                self.BEM[i].Elec = self.Sch[i].Qelec * self.Sch[i].Elec[self.dayType -
-                                                                        1][self.simTime.hourDay]      # Qelec x elec fraction for day
-                self.BEM[i].Light = self.Sch[i].Qlight * self.Sch[i].Light[self.dayType -
-                                                                           1][self.simTime.hourDay]    # Qlight x light fraction for day
-                self.BEM[i].Nocc = self.Sch[i].Nocc * self.Sch[i].Occ[self.dayType -
-                                                                      1][self.simTime.hourDay]        # Number of occupants x occ fraction for day
-                # Sensible Q occupant * fraction occupant sensible Q * number of occupants
-                self.BEM[i].Qocc = self.sensOcc * (1 - self.LatFOcc) * self.BEM[i].Nocc
-
-                # SWH and ventilation schedule
-                self.BEM[i].SWH = self.Sch[i].Vswh * self.Sch[i].SWH[self.dayType -
-                                                                     1][self.simTime.hourDay]          # litres per hour x SWH fraction for day
-                # m^3/s/m^2 of floor
-                self.BEM[i].building.vent = self.Sch[i].Vent
-                self.BEM[i].Gas = self.Sch[i].Qgas * self.Sch[i].Gas[self.dayType -
-                                                                     1][self.simTime.hourDay]          # Gas Equip Schedule, per m^2 of floor
-
-                # This is quite messy, should update
-                # Update internal heat and corresponding fractional loads
-                intHeat = self.BEM[i].Light + self.BEM[i].Elec + self.BEM[i].Qocc
-                # W/m2 from light, electricity, occupants
-                self.BEM[i].building.intHeatDay = intHeat
-                self.BEM[i].building.intHeatNight = intHeat
-                # fraction of radiant heat from light and equipment of whole internal heat
-                self.BEM[i].building.intHeatFRad = (
-                    self.RadFLight * self.BEM[i].Light + self.RadFEquip * self.BEM[i].Elec) / intHeat
-                # fraction of latent heat (from occupants) of whole internal heat
-                self.BEM[i].building.intHeatFLat = self.LatFOcc * \
-                    self.sensOcc * self.BEM[i].Nocc/intHeat
-
-                # Update envelope temperature layers
-                self.BEM[i].T_wallex = self.BEM[i].wall.layerTemp[0]
-                self.BEM[i].T_wallin = self.BEM[i].wall.layerTemp[-1]
-                self.BEM[i].T_roofex = self.BEM[i].roof.layerTemp[0]
-                self.BEM[i].T_roofin = self.BEM[i].roof.layerTemp[-1]
-
-            # Update rural heat fluxes & update vertical diffusion model (VDM)
-            self.rural.infra = self.forc.infra - self.rural.emissivity * self.SIGMA * \
-                self.rural.layerTemp[0]**4.    # Infrared radiation from rural road
-
-            self.rural.SurfFlux(self.forc, self.geoParam, self.simTime,
-                                self.forc.hum, self.forc.temp, self.forc.wind, 2., 0.)
-            self.RSM.VDM(self.forc, self.rural, self.geoParam, self.simTime)
+            # Update the energy components for building types defined in initialize.uwg.
+            # Schedules only change with the day type and hour.
+            schRow = (self.dayType - 1, self.simTime.hourDay)
+            updateSch = schRow != lastSchRow
+            lastSchRow = schRow
+            self.building_step(schRow, updateSch)
+
+            if ruralReplay is not None:
+                # Rural heat flux & VDM profiles of the recorded run
+                ruralReplay.replay(it, self.rural, self.RSM)
+            else:
+                # (rural layer temperatures are updated with the urban elements in urbflux)
+                self.rural_step()
+                if ruralRecord is not None:
+                    ruralRecord.record(it, self.rural, self.RSM)
 
             # Calculate urban heat fluxes, update UCM & UBL
             self.UCM, self.UBL, self.BEM = urbflux(
-                self.UCM, self.UBL, self.BEM, self.forc, self.geoParam, self.simTime, self.RSM)
+                self.UCM, self.UBL, self.BEM, self.forc, self.geoParam, self.simTime, self.RSM,
+                rural=self.rural if ruralReplay is None else None)
             self.UCM.UCModel(self.BEM, self.UBL.ublTemp, self.forc, self.geoParam)
             self.UBL.UBLModel(self.UCM, self.RSM, self.rural,
                               self.forc, self.geoParam, self.simTime)
@@ -905,62 +770,302 @@ class uwg(object):
                 logging.info("dpT = {}".format(self.UCM.Tdp))
                 logging.info("RH  = {}".format(self.UCM.canRHum))
 
-            if self.is_near_zero(self.simTime.secDay % self.simTime.timePrint) and n < self.N:
+            if self.simTime.IsPrintStep() and n < self.N:
 
                 self.logger.info("{0} ----sim time step = {1}----\n\n".format(__name__, n))
 
-                self.WeatherData[n] = copy.copy(self.forc)
                 _Tdb, _w, self.UCM.canRHum, _h, self.UCM.Tdp, _v = psychrometrics(
                     self.UCM.canTemp, self.UCM.canHum, self.forc.pres)
 
-                self.UBLData[n] = copy.copy(self.UBL)
-                self.UCMData[n] = copy.copy(self.UCM)
-                self.RSMData[n] = copy.copy(self.RSM)
+                self.recorder.record(self.forc, self.UCM, self.UBL, self.RSM)
 
-                self.logger.info("dbT = {}".format(self.UCMData[n].canTemp-273.15))
-                self.logger.info("dpT = {}".format(self.UCMData[n].Tdp))
-                self.logger.info("RH  = {}".format(self.UCMData[n].canRHum))
+                self.logger.info("dbT = {}".format(self.UCM.canTemp-273.15))
+                self.logger.info("dpT = {}".format(self.UCM.Tdp))
+                self.logger.info("RH  = {}".format(self.UCM.canRHum))
 
                 n += 1
 
-    def write_epw(self):
+            if checkpointSteps and it % checkpointSteps == 0 and it < self.simTime.nt - 1:
+                self.save_checkpoint(it, n)
+
+        if ruralRecord is not None:
+            ruralrun.store(ruralKey, ruralRecord)
+
+    def forcing_step(self, it):
+        """Advance the calendar and the forcing to time step it."""
+        # Update water temperature (estimated)
+        if self.nSoil < 3: # correction to original matlab code
+            # for BUBBLE/CAPITOUL/Singapore only
+            self.forc.deepTemp = sum(self.forcIP.temp)/float(len(self.forcIP.temp))
+            self.forc.waterTemp = sum(
+                self.forcIP.temp)/float(len(self.forcIP.temp)) - 10.      # for BUBBLE/CAPITOUL/Singapore only
+        else:
+            # soil temperature by depth, by month
+            self.forc.deepTemp = self.Tsoil[self.soilindex1][self.simTime.month-1]
+            self.forc.waterTemp = self.Tsoil[2][self.simTime.month-1]
+
+        # Date of this time step, from the precomputed calendar
+        self.simTime.SetStep(it)
+
+        self.logger.info("\n{0} m={1}, d={2}, h={3}, s={4}".format(
+            __name__, self.simTime.month, self.simTime.day, self.simTime.secDay/3600., self.simTime.secDay))
+
+        # Updating forcing instance from the row of this time step: horizontal
+        # Infrared Radiation Intensity (W m-2), wind speed (m s-1), wind direction,
+        # specific humidty (kg kg-1), Pressure (Pa), air temperature (C),
+        # Relative humidity (%), Precipitation (mm h-1), horizontal solar diffuse
+        # radiation (W m-2) and normal solar direct radiation (W m-2)
+        (self.forc.infra, self.forc.wind, self.forc.uDir, self.forc.hum, self.forc.pres,
+         self.forc.temp, self.forc.rHum, self.forc.prec, self.forc.dif,
+         self.forc.dir) = self.forcRows[it-1]
+
+    def building_step(self, schRow, updateSch):
+        """
+        Set the loads of the schedule row (day type - 1, hour) if updateSch, and
+        the envelope temperatures of the buildings.
+        """
+        for i in range(len(self.BEM)):
+            if updateSch:
+                (coolSetpoint, heatSetpoint, self.BEM[i].Elec, self.BEM[i].Light, self.BEM[i].Nocc,
+                 self.BEM[i].Qocc, self.BEM[i].SWH, self.BEM[i].Gas, vent, intHeat, intHeatFRad,
+                 intHeatFLat) = self.SchTable[i][schRow[0]][schRow[1]]
+
+                # Set temperature
+                self.BEM[i].building.coolSetpointDay = coolSetpoint
+                self.BEM[i].building.coolSetpointNight = coolSetpoint
+                self.BEM[i].building.heatSetpointDay = heatSetpoint
+                self.BEM[i].building.heatSetpointNight = heatSetpoint
+
+                # Internal heat and corresponding fractional loads
+                self.BEM[i].building.vent = vent
+                self.BEM[i].building.intHeatDay = intHeat
+                self.BEM[i].building.intHeatNight = intHeat
+                self.BEM[i].building.intHeatFRad = intHeatFRad
+                self.BEM[i].building.intHeatFLat = intHeatFLat
+
+            # Update envelope temperature layers
+            self.BEM[i].T_wallex = self.BEM[i].wall.layerTemp[0]
+            self.BEM[i].T_wallin = self.BEM[i].wall.layerTemp[-1]
+            self.BEM[i].T_roofex = self.BEM[i].roof.layerTemp[0]
+            self.BEM[i].T_roofin = self.BEM[i].roof.layerTemp[-1]
+
+    def rural_step(self):
+        """
+        Update the rural heat fluxes & the vertical diffusion model (VDM). The
+        rural layer temperatures are updated by the conduction of urbflux.
+        """
+        self.rural.infra = self.forc.infra - self.rural.emissivity * self.SIGMA * \
+            self.rural.layerTemp[0]**4.    # Infrared radiation from rural road
+
+        self.rural.SurfHeatBalance(self.forc, self.geoParam, self.simTime,
+                                   self.forc.hum, self.forc.temp, self.forc.wind)
+        self.RSM.VDM(self.forc, self.rural, self.geoParam, self.simTime)
+
+    def warm_start(self):
+        """
+        Set the state of the model objects to the state spun up at the start date,
+        from the spin-up cache or by simulating the spinUpDays before the start
+        date (see spinup).
+        """
+        days = min(int(self.spinUpDays), self.simTime.julian)
+        if days < 1:
+            self.logger.warning(self.SPINUP_MSG.format(int(self.Month), int(self.Day)))
+            return
+
+        names = [name for group, names in self.RERUN_GROUPS if group in ("buildings", "urban")
+                 for name in names]
+        params = dict((name, getattr(self, name)) for name in names)
+        # forcingMode is the only option that changes the spun-up state
+        fixed = (self.dtSim, self.dtWeather, self.forcingMode, days, structure(self))
+        epw = file_digest(os.path.join(self.epwDir, self.epwFileName))
+        start = (self.Month, self.Day)
+
+        cache = SpinUpCache(self.spinUpDir)
+        found = cache.lookup(epw, start, params, fixed, self.spinUpTolerance)
+        if found is not None:
+            state, distance = found
+            self.logger.info("Spun-up state from {}, parameter distance {}".format(cache, distance))
+        else:
+            state = self.spin_up(days)
+            try:
+                cache.store(epw, start, params, fixed, state)
+            except EnvironmentError as e:
+                self.logger.warning("Could not write spin-up state to '{}': {}".format(cache.directory, e))
+        spinup.apply(self, state)
+
+    def spin_up(self, days):
+        """State of the model objects after simulating the days before the start date."""
+        julian = self.simTime.julian - days
+        month = max(m for m in range(1, 13) if self.simTime.inobis[m-1] <= julian)
+
+        spin = copy.copy(self)
+        spin.Month, spin.Day, spin.nDay = month, julian - self.simTime.inobis[month-1] + 1, days
+        spin.spinUpDays = None
+        spin.checkpointDays = None
+        spin.ruralReuse = False
+        spin.recordChannels = None
+        spin._period = None
+        spin.init_BEM_obj()
+        spin.init_input_obj()
+        spin.hvac_autosize()
+        spin.simulate()
+        return spinup.capture(spin)
+
+    def rural_key(self):
+        """
+        Digest of the inputs of the rural reference model of the run: the period,
+        RURAL_PARAMS and the initial state of the rural element and RSM (which a
+        warm start can change).
+        """
+        return digest((self._period[0], self.simTime.nt, [getattr(self, name) for name in self.RURAL_PARAMS],
+                       self.rural.layerTemp, self.rural.waterStorage, self.RSM.tempProf, self.RSM.presProf))
+
+    def checkpoint_key(self):
+        """Digest of the inputs of the run, which a checkpoint can only be resumed with."""
+        names = [name for group, names in self.RERUN_GROUPS for name in names]
+        return digest((self._period[0], self.simTime.nt, [getattr(self, name) for name in names]))
+
+    def save_checkpoint(self, step, n):
+        """Take a checkpoint of the run after time step `step`, with n print steps recorded."""
+        self.checkpoint = Checkpoint.capture(self, step, n)
+        if self.checkpointPath is not None:
+            self.checkpoint.save(self.checkpointPath)
+        self.logger.info("Checkpoint at time step {}".format(step))
+
+    def resume(self, checkpoint):
+        """
+        Continue a run from a checkpoint (a Checkpoint or the path of a checkpoint
+        file) taken by simulate. The uwg must have the inputs of the run, and is
+        initialized as by run if it was not simulated before. The results are
+        the results of the uninterrupted run.
+
+        The morphed EPW is not written; call write_epw to write it.
+        """
+        if not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint.load(checkpoint)
+        if self._period is None:
+            self.read_epw()
+            self.set_input()
+            self.init_BEM_obj()
+            self.init_input_obj()
+            self.hvac_autosize()
+        self.simulate(checkpoint)
+
+    def init_recorder(self):
+        """Create the output recorder of simulate and the lazy *Data views on it."""
+        channels = self.recordChannels
+        if channels is not None:
+            # The EPW channels are always recorded for write_epw
+            channels = list(DEFAULT_CHANNELS) + list(channels)
+
+        self.recorder = Recorder(self.N, channels)
+        self.WeatherData = self.recorder.view("forc")
+        self.UCMData = self.recorder.view("UCM")
+        self.UBLData = self.recorder.view("UBL")
+        self.RSMData = self.recorder.view("RSM")
+        self.USMData = [None for x in range(self.N)]
+
+    def write_epw(self, target=None):
         """ Section 8 - Writing new EPW file
+
+        The rural EPW rows are streamed to the new file with the simulated dry bulb
+        temperature, dew point temperature, relative humidity and wind speed
+        (columns 6, 7, 8 and 21) patched in.
+
+        args:
+            target: Optional file-like object (with a write method) that receives the
+                new EPW text instead of the file at self.newPathName.
         """
-        epw_prec = self.epw_precision  # precision of epw file input
-
-        for iJ in range(len(self.UCMData)):
-            # [iJ+self.simTime.timeInitial-8] = increments along every weather timestep in epw
-            # [6 to 21]                       = column data of epw
-            self.epwinput[iJ+self.simTime.timeInitial-8][6] = "{0:.{1}f}".format(
-                self.UCMData[iJ].canTemp - 273.15, epw_prec)  # dry bulb temperature  [?C]
-            # dew point temperature [?C]
-            self.epwinput[iJ+self.simTime.timeInitial -
-                          8][7] = "{0:.{1}f}".format(self.UCMData[iJ].Tdp, epw_prec)
-            # relative humidity     [%]
-            self.epwinput[iJ+self.simTime.timeInitial -
-                          8][8] = "{0:.{1}f}".format(self.UCMData[iJ].canRHum, epw_prec)
-            self.epwinput[iJ+self.simTime.timeInitial-8][21] = "{0:.{1}f}".format(
-                self.WeatherData[iJ].wind, epw_prec)        # wind speed [m/s]
-
-        # Writing new EPW file
-        epw_new_id = open(self.newPathName, "w")
+        if target is None:
+            with open(self.newPathName, "w") as epw_new_id:
+                self._write_epw_lines(epw_new_id)
+
+            print("New climate file '{}' is generated at {}.".format(
+                self.destinationFileName, self.destinationDir))
+        else:
+            self._write_epw_lines(target)
+
+    def _write_epw_lines(self, epw_new_id, chunk=1024):
+        # Write the lines of the new EPW, chunk lines at a time
+        lines = []
+        for line in self._epw_lines():
+            lines.append(line)
+            if len(lines) == chunk:
+                epw_new_id.writelines(lines)
+                lines = []
+        epw_new_id.writelines(lines)
+
+    def _epw_lines(self):
+        # Lines of the new EPW file: header, then weather rows with patched columns
+        fmt = "{{0:.{0}f}}".format(self.epw_precision).format  # precision of epw file input
+
+        canTemp = self.recorder["UCM.canTemp"]
+        Tdp = self.recorder["UCM.Tdp"]
+        canRHum = self.recorder["UCM.canRHum"]
+        wind = self.recorder["forc.wind"]
+
+        # [iJ+self.simTime.timeInitial-8] = increments along every weather timestep in epw
+        first = self.simTime.timeInitial - 8
+        last = first + self.recorder.N
+        join = ",".join
 
         for i in range(8):
-            new_epw_line = '{}\n'.format(reduce(lambda x, y: x+","+y, self._header[i]))
-            epw_new_id.write(new_epw_line)
+            yield join(self._header[i]) + "\n"
+
+        for i, row in enumerate(self._epw_rows()):
+            if first <= i < last:
+                iJ = i - first
+                row = list(row)
+                row[6] = fmt(canTemp[iJ] - 273.15)   # dry bulb temperature  [?C]
+                row[7] = fmt(Tdp[iJ])                # dew point temperature [?C]
+                row[8] = fmt(canRHum[iJ])            # relative humidity     [%]
+                row[21] = fmt(wind[iJ])              # wind speed [m/s]
+            yield join(row) + "\n"
+
+    def _epw_rows(self):
+        # Weather rows of the rural EPW split by comma. Streamed from the file
+        # unless epwinput has been loaded.
+        if self._epwinput is not None:
+            for row in self._epwinput:
+                yield row
+            return
+
+        if sys.version_info[0] >= 3:
+            epw_file = open(self.climateDataPath, "r", errors='ignore')
+        else:
+            epw_file = open(self.climateDataPath, "r")
+        with epw_file:
+            for i, line in enumerate(epw_file):
+                if i >= 8:
+                    yield line.rstrip("\r\n").split(",")
 
-        for i in range(len(self.epwinput)):
-            printme = ""
-            for ei in range(34):
-                printme += "{}".format(self.epwinput[i][ei]) + ','
-            printme = printme + "{}".format(self.epwinput[i][ei])
-            new_epw_line = "{0}\n".format(printme)
-            epw_new_id.write(new_epw_line)
+    def rerun(self, **overrides):
+        """
+        Simulate again with some parameters changed, i.e. rerun(bldDensity=0.4).
+        The EPW, the DOE templates and the objects of the simulation period are
+        reused, and only the model state is initialized again (see RERUN_GROUPS).
+        zone is the climate zone number (1-16), as in the .uwg file.
 
-        epw_new_id.close()
+        The morphed EPW is not written; call write_epw to write it.
+        """
+        if self._period is None:
+            raise Exception(self.RERUN_MSG)
+        names = [name for group, names in self.RERUN_GROUPS for name in names]
+        for name in overrides:
+            if name not in names:
+                raise Exception(self.RERUN_PARAM_MSG.format(name))
+
+        for name, value in overrides.items():
+            setattr(self, name, value)
+        if "zone" in overrides:
+            # Modify zone to be used as python index
+            self.zone = int(self.zone)-1
+        self.check_required_inputs()
 
-        print("New climate file '{}' is generated at {}.".format(
-            self.destinationFileName, self.destinationDir))
+        self.init_BEM_obj()
+        self.init_input_obj()
+        self.hvac_autosize()
+        self.simulate()
 
     def run(self):
 
@@ -974,6 +1079,53 @@ class uwg(object):
         self.write_epw()
 
 
+# Layers of discretize, keyed by material stack, thickness limits and soil depths,
+# most recently used last
+_layers = OrderedDict()
+MAX_LAYERS_CACHED = 256
+
+
+def discretize(element, max_thickness, min_thickness, soil_depths=(), soil=None):
+    """ Memoized procMat of an element, followed by the soil padding of the
+    ground elements: soil layers of max_thickness are added below the layers
+    until they reach the first of the soil_depths that is not above them.
+
+    args:
+        element: Element whose layers are processed
+        max_thickness: maximum layer thickness (m)
+        min_thickness: minimum layer thickness (m)
+        soil_depths: list of soil depths (m) of the EPW ground temperatures
+        soil: Material of the soil padding
+    returns:
+        (materials, thicknesses, soil index) where soil index is the index of
+        the soil depth reached by the layers, None if they are deeper than every
+        soil depth. The lists are new and can be modified.
+    """
+    key = (element._name, tuple(element.layerThickness), tuple(element.layerThermalCond),
+           tuple(element.layerVolHeat), max_thickness, min_thickness, tuple(soil_depths),
+           (soil.thermalCond, soil.volHeat) if soil is not None else None)
+    layers = _layers.pop(key, None)
+    if layers is None:
+        newmat, newthickness = procMat(element, max_thickness, min_thickness)
+        soilindex = None
+        for i in range(len(soil_depths)):
+            # if soil depth is greater then the thickness of the road
+            # we add new slices of soil at max thickness until road is greater or equal
+            is_soildepth_equal = abs(soil_depths[i] - sum(newthickness)) < 1e-15
+
+            if is_soildepth_equal or (soil_depths[i] > sum(newthickness)):
+                while soil_depths[i] > sum(newthickness):
+                    newthickness.append(max_thickness)
+                    newmat.append(soil)
+                soilindex = i
+                break
+        layers = (tuple(newmat), tuple(newthickness), soilindex)
+    _layers[key] = layers
+    while len(_layers) > MAX_LAYERS_CACHED:
+        _layers.popitem(last=False)
+    return list(layers[0]), list(layers[1]), layers[2]
+
+
 def procMat(materials, max_thickness, min_thickness):
     """ Processes material layer so that a material with single
     layer thickness is divided into two and material layer that is too
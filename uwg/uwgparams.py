@@ -0,0 +1,235 @@
+"""Typed, cached reader of .uwg parameter files.
+
+A .uwg file is parsed in one pass into a UWGParams record, following SCHEMA.
+Records are cached by the md5 digest of the file content, so a file read again
+(or another file with the same content) is not parsed again. Records are shared
+and read only: use copy to derive a variant with some parameters overridden.
+"""
+import os
+import hashlib
+from csv import reader as csv_reader
+from collections import OrderedDict
+
+from .utilities import str2fl
+
+try:
+    range = xrange
+except NameError:
+    pass
+
+
+# Kinds of parameters
+NUMBER = "number"       # float or int
+FLOAT = "float"
+OPTIONAL = "optional"   # float, or None if left empty in the .uwg file
+MATRIX = "matrix"       # rows of floats following the key line
+
+# (key in the .uwg file, uwg attribute, kind, number of matrix rows, columns)
+SCHEMA = (
+    # Simulation and Weather parameters
+    ("Month", "Month", NUMBER, 0, 0),
+    ("Day", "Day", NUMBER, 0, 0),
+    ("nDay", "nDay", NUMBER, 0, 0),
+    ("dtSim", "dtSim", FLOAT, 0, 0),
+    ("dtWeather", "dtWeather", FLOAT, 0, 0),
+    # HVAC system and internal laod
+    ("autosize", "autosize", NUMBER, 0, 0),
+    ("sensOcc", "sensOcc", FLOAT, 0, 0),
+    ("LatFOcc", "LatFOcc", FLOAT, 0, 0),
+    ("RadFOcc", "RadFOcc", FLOAT, 0, 0),
+    ("RadFEquip", "RadFEquip", FLOAT, 0, 0),
+    ("RadFLight", "RadFLight", FLOAT, 0, 0),
+    # Urban microclimate parameters
+    ("h_ubl1", "h_ubl1", FLOAT, 0, 0),
+    ("h_ubl2", "h_ubl2", FLOAT, 0, 0),
+    ("h_ref", "h_ref", FLOAT, 0, 0),
+    ("h_temp", "h_temp", FLOAT, 0, 0),
+    ("h_wind", "h_wind", FLOAT, 0, 0),
+    ("c_circ", "c_circ", FLOAT, 0, 0),
+    ("c_exch", "c_exch", FLOAT, 0, 0),
+    ("maxDay", "maxDay", FLOAT, 0, 0),
+    ("maxNight", "maxNight", FLOAT, 0, 0),
+    ("windMin", "windMin", FLOAT, 0, 0),
+    ("h_obs", "h_obs", FLOAT, 0, 0),
+    # Urban characteristics
+    ("bldHeight", "bldHeight", FLOAT, 0, 0),
+    ("h_mix", "h_mix", FLOAT, 0, 0),
+    ("bldDensity", "bldDensity", FLOAT, 0, 0),
+    ("verToHor", "verToHor", FLOAT, 0, 0),
+    ("charLength", "charLength", FLOAT, 0, 0),
+    ("albRoad", "alb_road", FLOAT, 0, 0),
+    ("dRoad", "d_road", FLOAT, 0, 0),
+    ("sensAnth", "sensAnth", FLOAT, 0, 0),
+    # climate Zone
+    ("zone", "zone", NUMBER, 0, 0),
+    # Vegetation parameters
+    ("vegCover", "vegCover", FLOAT, 0, 0),
+    ("treeCoverage", "treeCoverage", FLOAT, 0, 0),
+    ("vegStart", "vegStart", NUMBER, 0, 0),
+    ("vegEnd", "vegEnd", NUMBER, 0, 0),
+    ("albVeg", "albVeg", FLOAT, 0, 0),
+    ("rurVegCover", "rurVegCover", FLOAT, 0, 0),
+    ("latGrss", "latGrss", FLOAT, 0, 0),
+    ("latTree", "latTree", FLOAT, 0, 0),
+    # Traffic schedule: weekday, Saturday, Sunday x 24 hours
+    ("SchTraffic", "SchTraffic", MATRIX, 3, 24),
+    # Road
+    ("kRoad", "kRoad", FLOAT, 0, 0),
+    ("cRoad", "cRoad", FLOAT, 0, 0),
+    # Building stock fraction: 16 building types x 3 built eras
+    ("bld", "bld", MATRIX, 16, 3),
+    # Optional building characteristics
+    ("albRoof", "albRoof", OPTIONAL, 0, 0),
+    ("vegRoof", "vegRoof", OPTIONAL, 0, 0),
+    ("glzR", "glzR", OPTIONAL, 0, 0),
+    ("hvac", None, OPTIONAL, 0, 0),
+    ("albWall", "albWall", OPTIONAL, 0, 0),
+    ("SHGC", "SHGC", OPTIONAL, 0, 0),
+    )
+
+# Schema entries by .uwg key and by uwg attribute
+KEYS = dict((s[0], s) for s in SCHEMA)
+ATTRIBUTES = dict((s[1], s) for s in SCHEMA if s[1] is not None)
+
+
+def check(attr, value):
+    """Assert that value is valid for uwg attribute attr (see SCHEMA)."""
+    key, attr, kind, nrows, ncols = ATTRIBUTES[attr]
+    if kind == NUMBER:
+        assert isinstance(value, (float, int)), \
+            '{} must be a number. Got {}'.format(attr, type(value))
+    elif kind == FLOAT:
+        assert isinstance(value, float), \
+            '{} must be a float. Got {}'.format(attr, type(value))
+    elif kind == MATRIX:
+        assert isinstance(value, list), \
+            '{} must be a list. Got {}'.format(attr, type(value))
+        assert len(value) == nrows, \
+            'length of {} must be {}. Got {}'.format(attr, nrows, len(value))
+    elif value is not None:
+        assert isinstance(value, (float, int)), \
+            '{} must be a number or None. Got {}'.format(attr, type(value))
+
+
+class UWGParams(object):
+    """
+    Parameters of a .uwg file, read in one pass.
+
+    args:
+        values: dictionary of .uwg key to value
+
+    properties
+        values      # dictionary of .uwg key to value. Keys that are not in
+                    # SCHEMA are kept as floats.
+        digest      # md5 digest of the file content (None for derived records)
+
+    Records returned by load_params are shared by every reader of the same
+    content and must not be modified: use copy.
+    """
+
+    KEY_MSG = "'{}' is not a parameter of the .uwg file."
+
+    def __init__(self, values, digest=None):
+        self.values = values
+        self.digest = digest
+
+    def __repr__(self):
+        return "UWGParams: {} parameters".format(len(self.values))
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    @classmethod
+    def parse(cls, text, digest=None):
+        """Parse the text of a .uwg file."""
+        rows = list(csv_reader(text.splitlines(), delimiter=","))
+        values = {}
+        count = 0
+        while count < len(rows):
+            row = [cell.replace(" ", "") for cell in rows[count]]  # strip white spaces
+            count += 1
+            if row == [] or "#" in row[0]:
+                continue
+            spec = KEYS.get(row[0])
+            kind = spec[2] if spec is not None else FLOAT
+            try:
+                if kind == MATRIX:
+                    nrows, ncols = spec[3], spec[4]
+                    values[row[0]] = [str2fl(r[:ncols]) for r in rows[count:count + nrows]]
+                    count += nrows
+                elif kind == OPTIONAL:
+                    values[row[0]] = float(row[1]) if row[1] != "" else None
+                else:
+                    values[row[0]] = float(row[1])
+            except (ValueError, IndexError):
+                print("Error while reading parameter at {} {}".format(count - 1, row))
+
+        # Validate the record once; readers can then use its values as they are
+        for key, value in values.items():
+            if key in KEYS and KEYS[key][1] is not None:
+                check(KEYS[key][1], value)
+        return cls(values, digest)
+
+    def copy(self, **overrides):
+        """
+        New record with the given parameters (.uwg keys) overridden. Matrices
+        are copied, so the new record can be modified.
+        """
+        for key, value in overrides.items():
+            if key not in KEYS:
+                raise Exception(self.KEY_MSG.format(key))
+            if KEYS[key][1] is not None:
+                check(KEYS[key][1], value)
+        values = dict((key, [list(r) for r in value] if isinstance(value, list) else value)
+                      for key, value in self.values.items())
+        values.update(overrides)
+        return UWGParams(values)
+
+    def apply(self, model):
+        """
+        Set the attributes of a uwg object from the record, for the attributes
+        that are not already set (not None). Matrices are copied.
+        """
+        for key, attr, kind, nrows, ncols in SCHEMA:
+            if attr is None or getattr(model, attr) is not None:
+                continue
+            value = self.values[key]
+            if kind == MATRIX:
+                value = [list(r) for r in value]
+            setattr(model, attr, value)
+
+
+# Parsed records, keyed by md5 digest of the file content, most recently used last
+_cache = OrderedDict()
+MAX_CACHED = 64
+
+
+def load_params(path):
+    """
+    UWGParams of a .uwg file. Contents are parsed once per process, and the
+    MAX_CACHED most recently used records are kept.
+    """
+    if not os.path.exists(path):
+        raise Exception("Param file: '{}' does not exist.".format(path))
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.md5(data).hexdigest()
+
+    params = _cache.pop(digest, None)
+    if params is None:
+        params = UWGParams.parse(data.decode("utf-8", "ignore"), digest)
+    _cache[digest] = params
+    while len(_cache) > MAX_CACHED:
+        _cache.popitem(last=False)
+    return params
+
+
+def clear_cache():
+    """Forget all parsed .uwg files."""
+    _cache.clear()
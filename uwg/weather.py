@@ -1,4 +1,5 @@
-from .utilities import read_csv, str2fl
+from .epw import load_epw, load_epw_columns
+from . import sharedforcing
 from math import pow, log, exp
 from .psychrometrics import HumFromRHumTemp
 
@@ -27,6 +28,7 @@ class Weather(object):
         staUmod   % wind speed (m s-1)
         staRobs   % Precipitation (mm h-1)
         staHum    % specific humidty (kg kg-1)
+        climate_data  # all lines of the .epw file split by comma, read on first use
     """
 
     def __init__(self,climate_file,HI,HF):
@@ -34,31 +36,52 @@ class Weather(object):
         #HF: Julian final date
         #H1 and HF define the row we want
 
-        # Open .epw file and feed csv data to self.climate_data
+        start = HI - 8          # weather rows follow the 8 header lines
+        stop = HF + 1 - 8
+
+        self._climate_file = climate_file
+        self._climate_data = None
+
+        # Read-only views of the columns published by a batch (see sharedforcing)
+        shared = sharedforcing.lookup(climate_file)
+        if shared is not None:
+            self.location = shared.location
+            for field in sharedforcing.FIELDS:
+                setattr(self, field, shared.column(field, start, stop))
+            return
+
+        # Columns of the .epw file, read from its binary sidecar for rows HI to HF only
         try:
-            self.climate_data = read_csv(climate_file)
+            epw = load_epw_columns(climate_file)
         except Exception as e:
-            raise Exception("Failed to read .epw file! {}".format(e.message))
+            raise Exception("Failed to read .epw file! {}".format(e))
 
-        self.location = self.climate_data[0][1]
-        cd = self.climate_data[HI:HF+1]
-        self.staTemp = str2fl([cd[i][6] for i in range(len(cd))])           # drybulb [C]
-        self.staTdp = str2fl([cd[i][7] for i in range(len(cd))])            # dewpoint [C]
-        self.staRhum = str2fl([cd[i][8] for i in range(len(cd))])           # air relative humidity (%)
-        self.staPres = str2fl([cd[i][9] for i in range(len(cd))])           # air pressure (Pa)
-        self.staInfra = str2fl([cd[i][12] for i in range(len(cd))])         # horizontal Infrared Radiation Intensity (W m-2)
-        self.staHor = str2fl([cd[i][13] for i in range(len(cd))])           # horizontal radiation [W m-2]
-        self.staDir = str2fl([cd[i][14] for i in range(len(cd))])           # normal solar direct radiation (W m-2)
-        self.staDif = str2fl([cd[i][15] for i in range(len(cd))])           # horizontal solar diffuse radiation (W m-2)
-        self.staUdir = str2fl([cd[i][20] for i in range(len(cd))])          # wind direction ()
-        self.staUmod = str2fl([cd[i][21] for i in range(len(cd))])          # wind speed (m s-1)
-        self.staRobs = str2fl([cd[i][33] for i in range(len(cd))])          # Precipitation (mm h-1)
+        self.location = epw.location
+        self.staTemp = epw.column(6, start, stop)          # drybulb [C]
+        self.staTdp = epw.column(7, start, stop)           # dewpoint [C]
+        self.staRhum = epw.column(8, start, stop)          # air relative humidity (%)
+        self.staPres = epw.column(9, start, stop)          # air pressure (Pa)
+        self.staInfra = epw.column(12, start, stop)        # horizontal Infrared Radiation Intensity (W m-2)
+        self.staHor = epw.column(13, start, stop)          # horizontal radiation [W m-2]
+        self.staDir = epw.column(14, start, stop)          # normal solar direct radiation (W m-2)
+        self.staDif = epw.column(15, start, stop)          # horizontal solar diffuse radiation (W m-2)
+        self.staUdir = epw.column(20, start, stop)         # wind direction ()
+        self.staUmod = epw.column(21, start, stop)         # wind speed (m s-1)
+        self.staRobs = epw.column(33, start, stop)         # Precipitation (mm h-1)
         self.staHum = [0.0] * len(self.staTemp)                                     # specific humidty (kgH20 kgN202-1)
         for i in range(len(self.staTemp)):
             self.staHum[i] = HumFromRHumTemp(self.staRhum[i], self.staTemp[i], self.staPres[i])
 
         self.staTemp = [s+273.15 for s in self.staTemp]                             # air temperature (K)
 
+    @property
+    def climate_data(self):
+        """All lines of the .epw file split by comma: the 8 header lines, then the weather rows."""
+        if self._climate_data is None:
+            epw = load_epw(self._climate_file)
+            self._climate_data = [list(row) for row in epw.header + epw.rows]
+        return self._climate_data
+
     def __repr__(self):
         return "Weather: City = {}, Max Tdb = {}C, Min Tdb = {}C".format(
             self.location,